@@ -0,0 +1,97 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/KeysightDCSupply/Models.py                       #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+from naqslab_devices.KeysightDCSupply.labscript_device import KeysightDCSupply
+from labscript import LabscriptError, set_passed_properties
+from labscript_utils import dedent
+
+__version__ = '0.1.0'
+__author__ = ['dihm']
+
+# Multiple output supplies select an output with INST:NSEL n, 
+# so output n is connected as 'channel n'.
+
+class E3631A(KeysightDCSupply):
+    description = 'Keysight E3631A Triple Output DC Power Supply'
+    allowed_outputs = [1,2,3]
+    # ranges of the +6V, +25V and -25V outputs
+    volt_ranges = [(0,6), (0,25), (-25,0)]
+    current_ranges = [(0,5), (0,1), (0,1)]
+
+    @set_passed_properties(property_names = {
+        'connection_table_properties': ['output_volt_limits','output_current_limits']
+        })
+    def __init__(self, name, VISA_name, 
+                volt_limits=None, current_limits=None, limited='volt'):
+        '''Keysight E3631A DC Power Supply
+
+        Outputs 1, 2 and 3 are the +6V, +25V and -25V outputs. 
+        These have fixed ranges, so there is no range setting.
+        Each output has its own limits, which default to its range.
+
+        Args:
+            name (str): labscript name to assign to device.
+            VISA_name (str): VISA connection string to device.
+            volt_limits (list, optional): (lower, upper) voltage limits of
+                outputs 1, 2 and 3, in volts
+            current_limits (list, optional): (lower, upper) current limits of
+                outputs 1, 2 and 3, in amps
+            limited (str): Sets whether outputs are voltage or current limited.
+        '''
+        self.output_volt_limits = self.output_limits(name, 'volt_limits',
+                                                     volt_limits, self.volt_ranges)
+        self.output_current_limits = self.output_limits(name, 'current_limits',
+                                                        current_limits, self.current_ranges)
+        # overall limits, the outputs are checked against their own
+        KeysightDCSupply.__init__(self, name, VISA_name, range=None,
+                                  volt_limits=(-25,25), 
+                                  current_limits=(0,5),
+                                  limited=limited)
+
+    def output_limits(self, name, kind, limits, ranges):
+        '''Checks the limits given for each output against its range'''
+        if limits is None:
+            return list(ranges)
+        try:
+            pairs = [tuple(pair) for pair in limits]
+            valid = len(pairs) == len(ranges) and all(len(pair) == 2 for pair in pairs)
+        except TypeError:
+            valid = False
+        if not valid:
+            msg = f'''{name} {kind} must be a (lower,upper) pair for each of
+                outputs {self.allowed_outputs}, not {limits}'''
+            raise LabscriptError(dedent(msg))
+        limits = pairs
+        for output, pair, allowed in zip(self.allowed_outputs, limits, ranges):
+            if pair[0] < allowed[0] or pair[1] > allowed[1] or pair[0] > pair[1]:
+                msg = f'''{name} {kind} {pair} of output {output} are
+                    outside of its range {allowed}'''
+                raise LabscriptError(dedent(msg))
+        return limits
+
+    def get_volt_limits(self, channel):
+        return self.output_volt_limits[self.allowed_outputs.index(channel)]
+
+    def get_current_limits(self, channel):
+        return self.output_current_limits[self.allowed_outputs.index(channel)]
+
+class E3646A(KeysightDCSupply):
+    description = 'Keysight E3646A Dual Output DC Power Supply'
+    allowed_outputs = [1,2]
+
+class E3647A(E3646A):
+    description = 'Keysight E3647A Dual Output DC Power Supply'
+
+class E3648A(E3646A):
+    description = 'Keysight E3648A Dual Output DC Power Supply'
+
+class E3649A(E3646A):
+    description = 'Keysight E3649A Dual Output DC Power Supply'
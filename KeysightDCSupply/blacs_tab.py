@@ -38,15 +38,18 @@ class KeysightDCSupplyTab(VISATab):
 
         if properties['limited'] == 'volt':
             base_units = 'V'
-            base_min = properties['volt_limits'][0]
-            base_max = properties['volt_limits'][1]
+            limits = properties['volt_limits']
+            output_limits = properties.get('output_volt_limits')
         else:
             base_units = 'A'
-            base_min = properties['current_limits'][0]
-            base_max = properties['current_limits'][1]                                
+            limits = properties['current_limits']
+            output_limits = properties.get('output_current_limits')
+        # supplies whose outputs have different limits list them per output
+        if output_limits is None:
+            output_limits = [limits]*len(properties['allowed_outputs'])
         
         AO_prop = {} 
-        for i in properties['allowed_outputs']:
+        for i, (base_min, base_max) in zip(properties['allowed_outputs'], output_limits):
             AO_prop['channel %d'%i] = {
                     'base_unit':base_units,
                     'min':base_min,
@@ -9,10 +9,14 @@
 #                                                                   #
 #                                                                   #
 #####################################################################
+import time
+
 import numpy as np
 
 from naqslab_devices.VISA.blacs_worker import VISAWorker
-from labscript import LabscriptError 
+from naqslab_devices.smart_cache_store import SmartCacheStore
+from naqslab_devices import labscript_error
+from labscript_utils import dedent
 
 import labscript_utils.h5_lock, h5py
 
@@ -24,20 +28,30 @@ class KeysightDCSupplyWorker(VISAWorker):
 
     # define the initialisation string
     init_string = f'*ESE {esr_mask};STAT:QUES:ENAB {qsr_mask};*CLS'
-    ident_string = 'E364'
+    ident_string = 'E36'
     
     # define instrument specific read and write strings
     write_both_string = 'APPL %.5f, %.5f'
     write_volt_string = 'VOLT %.5f'
     write_current_string = 'CURR %.5f'
     read_string = 'APPL?'
+    # multiple output supplies prefix commands with the output selection
+    select_string = 'INST:NSEL %d;:'
+    # ramps preload the next setpoint as the triggered level,
+    # then apply it with a bus trigger at the step time
+    write_volt_trig_string = 'VOLT:TRIG %.5f;:INIT'
+    write_current_trig_string = 'CURR:TRIG %.5f;:INIT'
+    bus_trigger_setup_string = 'TRIG:SOUR BUS;DEL 0'
+    trigger_string = '*TRG'
+    # restored setpoints within this of the read back value are kept, in V or A
+    restore_tolerance = 1e-4
 
     def read_parser(self,response):
         '''Parses the Voltage & Amplitude response string
 
         Args:
             response (str): Instrument response to current voltage/current query.
-                            Has format of "d.ddddd, d.ddddd"
+                            Has format of '"d.ddddd,d.ddddd"'
 
         Returns:
             (tuple): containing
@@ -45,9 +59,16 @@ class KeysightDCSupplyWorker(VISAWorker):
                 V (float): Current Voltage Setting
                 A (float): Current Current Setting
         '''
-        V, A = response[1:-3].split(',')
+        V, A = response.strip().strip('"').split(',')
         return float(V), float(A) 
     
+    def output_prefix(self, output):
+        '''Returns the command prefix selecting an output.
+
+        Single output supplies have only channel 0, which needs no selection.'''
+        channel = int(output.split(' ')[-1])
+        return self.select_string%(channel) if channel else ''
+
     def init(self):
         # Call the VISA init to initialise the VISA connection
         VISAWorker.init(self)
@@ -55,72 +76,148 @@ class KeysightDCSupplyWorker(VISAWorker):
         response = self.connection.query('*IDN?')
         if self.ident_string not in response:
             msg = f'''KeysightDCSupply does not support:\t{response}'''
-            raise LabscriptError(msg)
+            raise labscript_error(msg)
 
         self.connection.write(self.init_string)
         
         if self.limited == 'volt':
             self.write_string = self.write_volt_string
+            self.write_trig_string = self.write_volt_trig_string
         else:
             self.write_string = self.write_current_string
+            self.write_trig_string = self.write_current_trig_string
+
+        self.outputs = ['channel %d'%i for i in self.allowed_outputs]
+        # read all outputs back with one compound query
+        self.remote_query = ';:'.join(self.output_prefix(output)+self.read_string
+                                      for output in self.outputs)
 
         # set voltage range
-        self.connection.write('VOLT:RANG '+self.range)
+        if self.range is not None:
+            for output in self.outputs:
+                self.connection.write(self.output_prefix(output)+'VOLT:RANG '+self.range)
         
         # initialize the smart cache
         self.smart_cache = {'CURRENT_DATA': 
                                 {'channel %d'%i:None for i in self.allowed_outputs}
                             }
+        # restore programmed values from the last session, keeping only those
+        # the supply still reports, e.g. not after a power cycle
+        self.cache_store = SmartCacheStore(self.device_name, response)
+        saved = self.cache_store.load().get('CURRENT_DATA')
+        if saved:
+            current = self.check_remote_values()
+            cache = self.smart_cache['CURRENT_DATA']
+            for output, value in saved.items():
+                if (output in cache and value is not None
+                        and abs(value - current[output]) <= self.restore_tolerance):
+                    cache[output] = value
+        # values written this session, used to skip unchanged manual writes
+        self.output_values = {output:None for output in self.outputs}
     
     def check_remote_values(self):
         # Get the currently output values:
         results = {}
         
-        # these query strings and parsers depend heavily on device
-        for i in self.allowed_outputs:
-            response = self.connection.query(self.read_string)
+        # replies to the compound query are separated by semicolons
+        responses = self.connection.query(self.remote_query).split(';')
+        for output, response in zip(self.outputs, responses):
             V, A = self.read_parser(response)
-            results['channel %d'%i] = V if self.limited == 'volt' else A
+            results[output] = V if self.limited == 'volt' else A
 
         return results
     
+    def write_output(self, output, value):
+        self.connection.write(self.output_prefix(output)+self.write_string%(value))
+        self.output_values[output] = value
+
     def program_manual(self,front_panel_values):
         
+        cache = self.smart_cache['CURRENT_DATA']
+        changed = False
         for output, val in front_panel_values.items():
-            self.connection.write(self.write_string%(val))
-            # invalidate smart cache after manual update
-            self.smart_cache['CURRENT_DATA'][output] = None
+            val = round(float(val),5)
+            # only write outputs changed since the last call
+            if val == self.output_values[output]:
+                continue
+            self.write_output(output,val)
+            cache[output] = val
+            changed = True
+        if changed:
+            self.cache_store.save({'CURRENT_DATA': cache})
         
         return self.check_remote_values()        
 
     def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
         # call parent method to do basic preamble
         VISAWorker.transition_to_buffered(self,device_name,h5file,initial_values,fresh)
-        data = None
-        final_values = initial_values
-        # Program static values
-        with h5py.File(h5file,'r') as hdf5_file:
-            group = hdf5_file['/devices/'+device_name]
-            # If there are values to set the unbuffered outputs to, set them now:
-            if 'STATIC_DATA' in group:
-                data = group['STATIC_DATA'][:][0]
-                
-        if data is not None:
-            if fresh or data != self.smart_cache['CURRENT_DATA']:
-                
-                # only program channels as needed
-                channels = [int(name[-1]) for name in data.dtype.names]
-                for i in channels:
-                    if data[i] != self.smart_cache['CURRENT_DATA']['channel %d'%i]:
-                        self.connection.write(self.write_string%(data[i]))
-                        final_values['channel %d'%i] = data[i]
-                        self.smart_cache['CURRENT_DATA']['channel %d'%i] = data[i]                
-   
+        with self.profiler.phase('h5_read'):
+            with h5py.File(h5file,'r') as hdf5_file:
+                data = self.read_static_data(hdf5_file['/devices/'+device_name])
+
+        return self.program_static_data(data,fresh)
+
+    def read_static_data(self, group):
+        '''Reads STATIC_DATA and any RAMP_DATA from the device group'''
+        # If there are values to set the unbuffered outputs to, set them now:
+        if 'STATIC_DATA' not in group:
+            return None
+        ramps = {}
+        if 'RAMP_DATA' in group:
+            for name, dset in group['RAMP_DATA'].items():
+                ramps[name] = (dset[:], dset.attrs['initial'])
+        return group['STATIC_DATA'][:][0], ramps
+
+    def program_static_data(self, data, fresh):
+        final_values = dict(self.initial_values)
+        if data is None:
+            return final_values
+        static, ramps = data
+        cache = self.smart_cache['CURRENT_DATA']
+
+        # only program channels as needed
+        with self.profiler.phase('diff'):
+            changed = [name for name in static.dtype.names
+                       if fresh or static[name] != cache[name]]
+        for name in changed:
+            value = static[name]
+            if name in ramps:
+                table, initial = ramps[name]
+                if np.isnan(initial):
+                    # ramp from where the output is
+                    initial = cache[name]
+                    if initial is None:
+                        initial = self.initial_values[name]
+                else:
+                    self.write_output(name,initial)
+                self.run_ramp(initial + table['fraction']*(value - initial),
+                              table['t'], self.output_prefix(name))
             else:
-                final_values = self.initial_values
-                
+                self.write_output(name,value)
+            cache[name] = float(value)
+            self.output_values[name] = float(value)
+        for name in static.dtype.names:
+            final_values[name] = static[name]
+        if changed:
+            self.cache_store.save({'CURRENT_DATA': cache})
+
         return final_values
 
+    def run_ramp(self, values, times, prefix=''):
+        '''Steps the output through values at times after the call, in s.
+        
+        Each setpoint is loaded as the triggered level ahead of its step
+        time, so only the short bus trigger falls on the step itself.
+        prefix selects the output on multiple output supplies.'''
+        self.connection.write(self.bus_trigger_setup_string)
+        start = time.perf_counter()
+        for value, t in zip(values, times):
+            self.connection.write(prefix+self.write_trig_string%(value))
+            delay = start + t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.connection.write(self.trigger_string)
+
     def check_status(self):
         '''Customised check status for Keysight DC supplies.
 
@@ -140,7 +237,7 @@ class KeysightDCSupplyWorker(VISAWorker):
                 else:
                     break
             msg = f'{self.VISA_name} has errors\n\t{err_list}'
-            raise LabscriptError(dedent(msg))
+            raise labscript_error(dedent(msg))
         
         return self.merge_registers(esr,qsr,cond)
 
@@ -13,6 +13,7 @@ import numpy as np
 
 from naqslab_devices.VISA.labscript_device import VISA
 from labscript import StaticAnalogOut, LabscriptError, set_passed_properties, config
+from labscript_utils import dedent
 
 __version__ = '0.1.0'
 __author__ = ['dihm']
@@ -35,23 +36,25 @@ class KeysightDCSupply(VISA):
         '''Keysight DC Power Supply
 
         The labscript_device for Keysight DC Power supplies. Currently only tested
-        for E364xA single output series devices.
+        for E364xA single output series devices. Multiple output models are
+        in Models.py.
 
         Args:
             name (str): labscript name to assign to device. Must be an allowed python variable name.
             VISA_name (str): VISA connection string to device. Can be alias configured in NI-MAX.
             range (str): configures which voltage range to use. Default is 'LOW'.
+                None leaves the range unset, for supplies without range settings.
             volt_limits (iterable): voltage limits, in volts
             current_limits (iterable): current limits, in amps
             limited (str): Sets whether output is configured to be voltage or current limited. Default is 'volt'
         '''
         
         # validate and save configuration parameters
-        if range in ('LOW','HIGH'):
+        if range in ('LOW','HIGH',None):
             self.range = range
         else:
             msg = f'''Invalid value {range} for range.
-                Must be either \'LOW\' or \'HIGH\'.'''
+                Must be either \'LOW\', \'HIGH\' or None.'''
             raise LabscriptError(msg)
 
         try:
@@ -76,6 +79,8 @@ class KeysightDCSupply(VISA):
 
         self.volt_limits = volt_limits
         self.current_limits = current_limits
+        # ramp settings of each ramped output
+        self.ramps = {}
 
         if limited in ('volt','current'):
             self.limited = limited
@@ -86,30 +91,70 @@ class KeysightDCSupply(VISA):
         # DC Power Supplies do not have a parent device
         VISA.__init__(self,name,None,VISA_name)
         
+    def get_volt_limits(self, channel):
+        '''Voltage limits of an output, in volts.
+
+        Over-ride for supplies whose outputs have different limits.'''
+        return self.volt_limits
+
+    def get_current_limits(self, channel):
+        '''Current limits of an output, in amps.
+
+        Over-ride for supplies whose outputs have different limits.'''
+        return self.current_limits
+
     def quantise_volt(self,data,output):
         '''Quantize the currents in units of V and check it's within bounds'''                       
 
         # Ensure that amplitudes are within bounds:        
-        if data < self.volt_limits[0]  or data > self.volt_limits[1]:
+        volt_limits = self.get_volt_limits(int(output.connection.split(' ')[-1]))
+        if data < volt_limits[0]  or data > volt_limits[1]:
             msg = '''{:s} {:s} can only have volts between 
                 {:.5f} V and {:.5f} V, {} given'''.format(output.description, 
-                                                output.name,*self.amp_limits,
+                                                output.name,*volt_limits,
                                                 data)
             raise LabscriptError(dedent(msg))
-        return data
+        # setpoints are written with 5 decimals
+        return round(data,5)
 
     def quantise_current(self,data,output):
         '''Quantize the currents in units of A and check it's within bounds'''                       
 
         # Ensure that amplitudes are within bounds:        
-        if data < self.current_limits[0]  or data > self.current_limits[1]:
+        current_limits = self.get_current_limits(int(output.connection.split(' ')[-1]))
+        if data < current_limits[0]  or data > current_limits[1]:
             msg = '''{:s} {:s} can only have currents between 
                 {:.5f} A and {:.5f} A, {} given'''.format(output.description, 
-                                                output.name,*self.current_limits,
+                                                output.name,*current_limits,
                                                 data)
             raise LabscriptError(dedent(msg))
-        return data
+        return round(data,5)
     
+    def ramp(self, output, duration, initial=None, step_time=20e-3):
+        '''Ramp an output linearly to its static value before the shot starts.
+
+        The worker steps the supply through the ramp using bus triggers
+        while the shot is being programmed, so the shot starts once the
+        setpoint is reached. The ramp only runs when the setpoint changes
+        (or the device is refreshed).
+
+        Args:
+            output (StaticAnalogOut): Output of this supply to ramp.
+            duration (float): Length of the ramp, in seconds.
+            initial (float, optional): Value to start the ramp from. 
+                Defaults to the value the output is at.
+            step_time (float, optional): Time between setpoints, in seconds.
+                Each step is a bus transaction, so steps much shorter than
+                10 ms are not reliable.
+        '''
+        if output not in self.child_devices:
+            msg = '''{:s} is not an output of {:s}.'''
+            raise LabscriptError(dedent(msg.format(output.name,self.name)))
+        if duration <= 0 or step_time <= 0:
+            msg = '''{:s} ramp duration and step_time must be positive.'''
+            raise LabscriptError(dedent(msg.format(output.name)))
+        self.ramps[output] = (duration, initial, step_time)
+
     def generate_code(self, hdf5_file):
 
         chan_num = len(self.child_devices)
@@ -131,24 +176,34 @@ class KeysightDCSupply(VISA):
 
         # create static table and populate
         static_dtypes = np.dtype({'names':['channel %d'%i for i in outputs.keys()],
-                                'formats':[np.float16 for i in outputs.keys()]})
-        static_table = np.zeros(1, dtype=static_dtypes)
+                                'formats':[np.float64 for i in outputs.keys()]})
+        if self.limited == 'volt':
+            quantise = self.quantise_volt
+        else:
+            quantise = self.quantise_current
+        row = []
         for channel, output in outputs.items(): 
             if channel not in self.allowed_outputs:
                 msg = '''channel {} not in {}.'''
                 raise LabscriptError(dedent(msg.format(channel,self.allowed_outputs)))
 
-            _ = output.get_change_times()
-            _ = output.make_timeseries([])
-            _ = output.expand_timeseries()
-
-            if self.limited == 'volt':
-                raw_output = self.quantise_volt(output.static_value,output)
-            else:
-                raw_output = self.quantise_current(output.static_value,output)
-
-            static_table['channel %d'%channel] = raw_output
+            # static outputs need no timeseries expansion
+            row.append(quantise(output.static_value,output))
+        static_table = np.array([tuple(row)], dtype=static_dtypes)
         
         grp = hdf5_file.create_group('/devices/'+self.name)
         grp.create_dataset('STATIC_DATA',compression=config.compression,data=static_table) 
 
+        # ramps are stored as the fraction of the step to the static value,
+        # so a ramp from the present value can be scaled by the worker
+        ramp_dtypes = np.dtype({'names':['t','fraction'],'formats':[np.float64,np.float64]})
+        for channel, output in outputs.items():
+            if output not in self.ramps:
+                continue
+            duration, initial, step_time = self.ramps[output]
+            steps = max(int(np.ceil(duration/step_time)),1)
+            ramp_table = np.empty(steps,dtype=ramp_dtypes)
+            ramp_table['t'] = np.arange(1,steps+1)*duration/steps
+            ramp_table['fraction'] = np.arange(1,steps+1)/steps
+            dset = grp.create_dataset('RAMP_DATA/channel %d'%channel,data=ramp_table)
+            dset.attrs['initial'] = np.nan if initial is None else quantise(initial,output)
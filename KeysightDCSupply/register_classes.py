@@ -15,4 +15,29 @@ import labscript_devices
 labscript_devices.register_classes(
     'KeysightDCSupply',
     BLACS_tab='naqslab_devices.KeysightDCSupply.blacs_tab.KeysightDCSupplyTab',
-    runviewer_parser='')
\ No newline at end of file
+    runviewer_parser='naqslab_devices.KeysightDCSupply.runviewer_parser.KeysightDCSupplyParser')
+
+labscript_devices.register_classes(
+    'E3631A',
+    BLACS_tab='naqslab_devices.KeysightDCSupply.blacs_tab.KeysightDCSupplyTab',
+    runviewer_parser='naqslab_devices.KeysightDCSupply.runviewer_parser.KeysightDCSupplyParser')
+
+labscript_devices.register_classes(
+    'E3646A',
+    BLACS_tab='naqslab_devices.KeysightDCSupply.blacs_tab.KeysightDCSupplyTab',
+    runviewer_parser='naqslab_devices.KeysightDCSupply.runviewer_parser.KeysightDCSupplyParser')
+
+labscript_devices.register_classes(
+    'E3647A',
+    BLACS_tab='naqslab_devices.KeysightDCSupply.blacs_tab.KeysightDCSupplyTab',
+    runviewer_parser='naqslab_devices.KeysightDCSupply.runviewer_parser.KeysightDCSupplyParser')
+
+labscript_devices.register_classes(
+    'E3648A',
+    BLACS_tab='naqslab_devices.KeysightDCSupply.blacs_tab.KeysightDCSupplyTab',
+    runviewer_parser='naqslab_devices.KeysightDCSupply.runviewer_parser.KeysightDCSupplyParser')
+
+labscript_devices.register_classes(
+    'E3649A',
+    BLACS_tab='naqslab_devices.KeysightDCSupply.blacs_tab.KeysightDCSupplyTab',
+    runviewer_parser='naqslab_devices.KeysightDCSupply.runviewer_parser.KeysightDCSupplyParser')
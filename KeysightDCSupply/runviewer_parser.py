@@ -0,0 +1,27 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/KeysightDCSupply/runviewer_parser.py             #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+from naqslab_devices.VISA.runviewer_parser import VISAParser
+
+
+class KeysightDCSupplyParser(VISAParser):
+    """Shows the static setpoint of each output, in V or A."""
+
+    def get_traces(self, add_trace, clock=None):
+        static_data, _, stop_time = self.get_static_data()
+        if static_data is None:
+            return {}
+        for output in self.device.child_list.values():
+            if output.parent_port in static_data.dtype.names:
+                add_trace(output.name,
+                          self.step(static_data[output.parent_port], stop_time),
+                          self.name, output.parent_port)
+        return {}
@@ -11,7 +11,7 @@
 #####################################################################
 import numpy as np
 from naqslab_devices.VISA.blacs_worker import VISAWorker
-from labscript import LabscriptError
+from naqslab_devices import labscript_error
 import labscript_utils.properties
 
 import labscript_utils.h5_lock, h5py
@@ -39,6 +39,12 @@ class KeysightXScopeWorker(VISAWorker):
         '''Unpacks the bits for a pod array
         Columns returned are in bit order [7,6,5,4,3,2,1,0]'''
         return np.unpackbits(raw_pod_array.astype(np.uint8),axis=0).reshape((-1,8),order='C')
+
+    def digital_edge_parser(self,trace):
+        '''Returns the sample indices where a digital trace changes level,
+        starting with sample 0, and the level from each index on.'''
+        index = np.concatenate(([0],np.flatnonzero(np.diff(trace))+1))
+        return index, trace[index]
         
     def error_parser(self,error_return_string):
         '''Parses the strings returned by :SYST:ERR?
@@ -59,12 +65,14 @@ class KeysightXScopeWorker(VISAWorker):
             if 'DSO-X 1' in ident_string:
                 self.dig_command = ':SING'
         else:
-            raise LabscriptError('Device {0:s} with VISA name {0:s} not supported!'.format(ident_string,self.VISA_name))  
+            raise labscript_error('Device {0:s} with VISA name {0:s} not supported!'.format(ident_string,self.VISA_name))  
         
         # initialization stuff
         self.connection.write(self.setup_string)
         # initialize smart cache
-        self.smart_cache = {'COUNTERS': None}            
+        # the counter setup cannot be read back to check it, so it is sent
+        # again on the first shot rather than restored from the last session
+        self.smart_cache = {'COUNTERS': None}
         
     def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
         '''This configures counters, if any are defined, 
@@ -74,7 +82,7 @@ class KeysightXScopeWorker(VISAWorker):
         data = None
         refresh = False
         send_trigger = False
-        with h5py.File(h5file,'r') as hdf5_file:
+        with self.profiler.phase('h5_read'), h5py.File(h5file,'r') as hdf5_file:
             group = hdf5_file['/devices/'+device_name]
             device_props = labscript_utils.properties.get(hdf5_file,device_name,'device_properties')
             if 'COUNTERS' in group:
@@ -85,6 +93,8 @@ class KeysightXScopeWorker(VISAWorker):
             self.comp_settings = {'compression':device_props['compression'],
                             'compression_opts':device_props['compression_opts'],
                             'shuffle':device_props['shuffle']}
+            # save digital traces as transitions instead of samples
+            self.digital_edges = device_props.get('digital_edges',False)
 
         if data is not None:
             #check if refresh needed
@@ -111,7 +121,7 @@ class KeysightXScopeWorker(VISAWorker):
             
     def transition_to_manual(self,abort = False):
         if not abort:         
-            with h5py.File(self.h5_file,'r') as hdf5_file:
+            with self.profiler.phase('h5_read'), h5py.File(self.h5_file,'r') as hdf5_file:
                 # get acquisitions table values so we can close the file
                 try:
                     location = '/devices/'+self.device_name+'/ANALOG_ACQUISITIONS'
@@ -141,9 +151,10 @@ class KeysightXScopeWorker(VISAWorker):
                 except:
                     # no counters
                     counters = np.empty(0)
-                # return if no acquisitions at all
-                if not len(analog_acquisitions) and not len(pod1_acquisitions) and not len(pod2_acquisitions) and not len(counters):
-                    return True
+            # return if no acquisitions at all
+            if not len(analog_acquisitions) and not len(pod1_acquisitions) and not len(pod2_acquisitions) and not len(counters):
+                self.save_timing()
+                return True
             # close lock on h5 to read from scope, it takes a while
             
             data = {}
@@ -213,7 +224,7 @@ class KeysightXScopeWorker(VISAWorker):
             dtypes_digital = np.dtype({'names':['t','values'],'formats':[np.float64,np.uint8]})      
             
             # re-open lock on h5file to save data
-            with h5py.File(self.h5_file,'r+') as hdf5_file:
+            with self.profiler.phase('h5_write'), h5py.File(self.h5_file,'r+') as hdf5_file:
                 try:
                     measurements = hdf5_file['/data/traces']
                 except:
@@ -229,19 +240,13 @@ class KeysightXScopeWorker(VISAWorker):
                     # and save some timing info for reference to labscript time
                     measurements[label].attrs['trigger_time'] = trigger_time
                 for connection,label in pod1_acquisitions:
-                    values = np.empty(len(data[connection]),dtype=dtypes_digital)
-                    values['t'] = data['Digital Time']
-                    values['values'] = data[connection]
-                    measurements.create_dataset(label, data=values, 
-                                                **self.comp_settings)
+                    self.save_digital_trace(measurements,label,data[connection],
+                                            data['Digital Time'],Dxinc,dtypes_digital)
                     # and save some timing info for reference to labscript time
                     measurements[label].attrs['trigger_time'] = trigger_time  
                 for connection,label in pod2_acquisitions:
-                    values = np.empty(len(data[connection]),dtype=dtypes_digital)
-                    values['t'] = data['Digital Time']
-                    values['values'] = data[connection]
-                    measurements.create_dataset(label, data=values, 
-                                                **self.comp_settings)
+                    self.save_digital_trace(measurements,label,data[connection],
+                                            data['Digital Time'],Dxinc,dtypes_digital)
                     # and save some timing info for reference to labscript time
                     measurements[label].attrs['trigger_time'] = trigger_time   
             
@@ -255,8 +260,33 @@ class KeysightXScopeWorker(VISAWorker):
                     for connection,typ,pol in counters:
                         counts.attrs['{0:s}:{1:s}{2:s}'.format(connection,pol,typ)] = count_data[connection]
                         counts.attrs['trigger_time'] = trigger_time                                 
+                
+                self.profiler.save(hdf5_file['/devices/'+self.device_name])
             
         return True
+
+    def save_digital_trace(self,measurements,label,trace,times,dt,dtype):
+        '''Saves a digital trace, either every sample or, with `digital_edges`,
+        only the samples where the level changes.
+
+        Edge lists hold the sample index, time and new level of each change,
+        starting with the first sample. The sample period and the number of
+        samples are saved as attributes so the full trace can be rebuilt.'''
+        if self.digital_edges:
+            index, levels = self.digital_edge_parser(trace)
+            dtype = np.dtype([('index',np.int64)] + dtype.descr)
+            values = np.empty(len(index),dtype=dtype)
+            values['index'] = index
+            values['t'] = times[index]
+            values['values'] = levels
+        else:
+            values = np.empty(len(trace),dtype=dtype)
+            values['t'] = times
+            values['values'] = trace
+        measurements.create_dataset(label, data=values, **self.comp_settings)
+        if self.digital_edges:
+            measurements[label].attrs['sample_period'] = dt
+            measurements[label].attrs['num_samples'] = len(trace)
         
     def check_status(self):
         '''Periodically called by BLACS to check to status of the scope.'''
@@ -275,6 +305,6 @@ class KeysightXScopeWorker(VISAWorker):
                 else:
                     break
                 
-            raise LabscriptError('Keysight Scope VISA device {0:s} has Errors in Queue: \n{1:s}'.format(self.VISA_name,err_string)) 
+            raise labscript_error('Keysight Scope VISA device {0:s} has Errors in Queue: \n{1:s}'.format(self.VISA_name,err_string)) 
         return self.convert_register(esr)
 
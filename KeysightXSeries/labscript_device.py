@@ -23,11 +23,13 @@ class KeysightXScope(TriggerableDevice):
     
     @set_passed_properties(property_names = {
         "device_properties":["VISA_name",
-                            "compression","compression_opts","shuffle"]}
+                            "compression","compression_opts","shuffle",
+                            "digital_edges"]}
         )
     def __init__(self, name, VISA_name, trigger_device, trigger_connection, 
         num_AI=4, DI=True, trigger_duration=1e-3,
-        compression=None, compression_opts=None, shuffle=False, **kwargs):
+        compression=None, compression_opts=None, shuffle=False,
+        digital_edges=False, **kwargs):
         '''VISA_name can be full VISA connection string or NI-MAX alias.
         Trigger Device should be fast clocked device. 
         num_AI sets number of analog input channels, default 4
@@ -36,7 +38,9 @@ class KeysightXScope(TriggerableDevice):
         Compression of traces in h5 file controlled by:
         compression: \'lzf\', \'gzip\', None 
         compression_opts: 0-9 for gzip
-        shuffle: True/False '''
+        shuffle: True/False
+        digital_edges: save digital traces as lists of transitions
+        instead of every sample '''
         self.VISA_name = VISA_name
         self.BLACS_connection = VISA_name
         TriggerableDevice.__init__(self,name,trigger_device,trigger_connection,**kwargs)
@@ -48,6 +52,7 @@ class KeysightXScope(TriggerableDevice):
         else:
             self.compression_opts = compression_opts
         self.shuffle = shuffle
+        self.digital_edges = digital_edges
         
         self.trigger_duration = trigger_duration
         self.allowed_analog_chan = ['Channel {0:d}'.format(i) for i in range(1,num_AI+1)]
@@ -15,4 +15,4 @@ import labscript_devices
 labscript_devices.register_classes(
     'KeysightXScope',
     BLACS_tab='naqslab_devices.KeysightXSeries.blacs_tab.KeysightXScopeTab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.KeysightXSeries.runviewer_parser.KeysightXScopeParser')
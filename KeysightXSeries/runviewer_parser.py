@@ -0,0 +1,19 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/KeysightXSeries/runviewer_parser.py              #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+from naqslab_devices.VISA.runviewer_parser import ScopeParser
+
+
+class KeysightXScopeParser(ScopeParser):
+    """Marks the scope trigger on channels with analog, digital or counter
+    acquisitions."""
+    acquisition_tables = ('ANALOG_ACQUISITIONS', 'POD1_ACQUISITIONS',
+                          'POD2_ACQUISITIONS', 'COUNTERS')
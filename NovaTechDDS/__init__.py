@@ -10,15 +10,12 @@
 # the project for the full license.                                 #
 #                                                                   #
 #####################################################################
-from labscript_devices import deprecated_import_alias
+from naqslab_devices import lazy_deprecated_aliases
 
 
 # For backwards compatibility with old experiment scripts:
-NovaTech409B = deprecated_import_alias(
-    "naqslab_devices.NovaTechDDS.labscript_device.NovaTech409B")
-    
-NovaTech409B_AC = deprecated_import_alias(
-    "naqslab_devices.NovaTechDDS.labscript_device.NovaTech409B_AC")
-    
-NovaTech440A = deprecated_import_alias(
-    "naqslab_devices.NovaTechDDS.labscript_device.NovaTech440A")
+__getattr__ = lazy_deprecated_aliases(__name__, {
+    'NovaTech409B': 'naqslab_devices.NovaTechDDS.labscript_device.NovaTech409B',
+    'NovaTech409B_AC': 'naqslab_devices.NovaTechDDS.labscript_device.NovaTech409B_AC',
+    'NovaTech440A': 'naqslab_devices.NovaTechDDS.labscript_device.NovaTech440A'
+    })
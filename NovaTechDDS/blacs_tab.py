@@ -11,7 +11,11 @@
 # Source borrows heavily from labscript_devices/NovaTechDDS9m       #
 #                                                                   #
 #####################################################################
+from blacs.tab_base_classes import define_state
+from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED
 from blacs.device_base_class import DeviceTab
+from naqslab_devices.instrumentation import format_statistics
+from qtutils.qt import QtWidgets
 
 class NovaTech409B_ACTab(DeviceTab):
 
@@ -84,6 +88,22 @@ class NovaTech409B_ACTab(DeviceTab):
         # Set the capabilities of this device
         self.supports_remote_value_check(True)
         self.supports_smart_programming(True) 
+        self.create_timing_label()
+
+    def create_timing_label(self):
+        '''Adds a label showing the shot timing statistics on hover, and
+        starts polling the worker for them.'''
+        self.timing_label = QtWidgets.QLabel('Shot timing: no shots yet')
+        self.get_tab_layout().addWidget(self.timing_label)
+        self.statemachine_timeout_add(10000, self.status_monitor)
+
+    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True)
+    def status_monitor(self):
+        # the worker returns the statistics once after each shot
+        stats = yield(self.queue_work(self._primary_worker,'check_timing'))
+        if stats:
+            self.timing_label.setText('Shot timing: {:.1f} ms'.format(stats['total'][0]*1e3))
+            self.timing_label.setToolTip(format_statistics(stats))
 
 
 class NovaTech409BTab(NovaTech409B_ACTab):
@@ -155,3 +175,4 @@ class NovaTech440ATab(NovaTech409B_ACTab):
         # Set the capabilities of this device
         self.supports_remote_value_check(True)
         self.supports_smart_programming(True)
+        self.create_timing_label()
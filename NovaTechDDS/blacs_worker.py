@@ -11,8 +11,11 @@
 # Source borrows heavily from labscript_devices/NovaTechDDS9m       #
 #                                                                   #
 #####################################################################
-from labscript import LabscriptError
+from naqslab_devices import labscript_error
 from blacs.tab_base_classes import Worker
+from naqslab_devices.smart_cache_store import SmartCacheStore
+from naqslab_devices.instrumentation import ShotProfiler, BusTracer
+from naqslab_devices.instrumentation import bus_trace_enabled, default_trace_path
 
 import time
 import numpy as np
@@ -22,6 +25,11 @@ import labscript_utils.h5_lock, h5py
 
        
 class NovaTech409B_ACWorker(Worker):
+    # BusTracer of the serial connection, set by init if tracing is enabled
+    tracer = None
+    # profiler shot count at the last call to check_timing
+    reported_shots = 0
+
     def init(self):
         """Initialization command run automatically by the BLACS tab on 
         startup. It establishes communication and sends initial default 
@@ -60,18 +68,24 @@ class NovaTech409B_ACWorker(Worker):
         self.phase_mode_command = phase_mode_commands[self.phase_mode]
         
         self.connection = serial.Serial(self.com_port, baudrate = self.baud_rate, timeout=0.1)
+        self.profiler = ShotProfiler()
+        self.profiler.attach_serial(self.connection)
+        self.attach_tracer()
         self.connection.readlines()
         
         # to configure baud rate, must determine current device baud rate
         # first check desired, since it's most likely
         connected, response = self.check_connection()
+        # the device powers up with echo on and its default baud rate, which
+        # shows that the table has been lost since the last session
+        power_cycled = not connected
         if not connected:
             # not already set
             bauds = list(self.baud_dict)
             if self.baud_rate in bauds:
                 bauds.remove(self.baud_rate)
             else:
-                raise LabscriptError('%d baud rate not supported by Novatech 409B' % self.baud_rate)
+                raise labscript_error('%d baud rate not supported by Novatech 409B' % self.baud_rate)
                 
             # iterate through other baud-rates to find current
             for rate in bauds:
@@ -81,7 +95,7 @@ class NovaTech409B_ACWorker(Worker):
                     # found it!
                     break
             else:
-                raise LabscriptError('Error: Baud rate not found! Is Novatech DDS connected?')
+                raise labscript_error('Error: Baud rate not found! Is Novatech DDS connected?')
             
             # now we can set the desired baud rate
             baud_string = b'Kb %s\r\n' % (self.baud_dict[self.baud_rate])
@@ -91,13 +105,14 @@ class NovaTech409B_ACWorker(Worker):
             self.connection.baudrate = self.baud_rate
             connected, response = self.check_connection()
             if not connected:
-                raise LabscriptError('Error: Failed to execute command "%s"' % baud_string.decode('utf8'))           
+                raise labscript_error('Error: Failed to execute command "%s"' % baud_string.decode('utf8'))           
         
         self.connection.write(b'e d\r\n')
         response = self.connection.readline()
         if response == b'e d\r\n':
             # if echo was enabled, then the command to disable it echos back at us!
             response = self.connection.readline()
+            power_cycled = True
         if response != b'OK\r\n':
             raise Exception('Error: Failed to execute command: "e d". Cannot connect to the device.')
         
@@ -124,7 +139,41 @@ class NovaTech409B_ACWorker(Worker):
         
         # populate the 'CURRENT_DATA' dictionary    
         self.check_remote_values()
+        
+        # restore the table, which cannot be read back, from the last session
+        # the 409B has no identification query, so the saved table is keyed on
+        # the port and dropped if the device has been power cycled since
+        identity = '%s %s' % (type(self).__name__, self.com_port)
+        self.cache_store = SmartCacheStore(self.device_name, identity)
+        if power_cycled:
+            self.cache_store.clear()
+        else:
+            self.smart_cache.update(self.cache_store.load())
      
+    def attach_tracer(self):
+        '''Starts tracing the serial connection if enabled in the labconfig.'''
+        if bus_trace_enabled():
+            self.tracer = BusTracer()
+            self.tracer.attach_serial(self.connection)
+            
+    def dump_bus_trace(self, path=None):
+        '''Writes the bus trace to `path`, defaulting to the saved configs.
+        Returns the path written, or None if tracing is disabled.'''
+        if self.tracer is None:
+            return None
+        if path is None:
+            path = default_trace_path(self.device_name)
+        self.tracer.dump(path)
+        return path
+
+    def check_timing(self):
+        '''Returns the shot timing statistics once after each shot, or None
+        if no shot has finished since the last call.'''
+        if self.profiler.shots == self.reported_shots:
+            return None
+        self.reported_shots = self.profiler.shots
+        return self.profiler.statistics()
+
     def check_connection(self):
         '''Sends non-command and tests for correct response
         returns tuple of connection state and reponse string'''
@@ -232,9 +281,12 @@ class NovaTech409B_ACWorker(Worker):
         self.initial_values = initial_values
         # Store the final values for use during transition_to_static:
         self.final_values = initial_values
+        self.h5_file = h5file
+        self.device_name = device_name
+        self.profiler.start_shot()
         static_data = None
         table_data = None
-        with h5py.File(h5file,'r') as hdf5_file:
+        with self.profiler.phase('h5_read'), h5py.File(h5file,'r') as hdf5_file:
             group = hdf5_file['/devices/'+device_name]
             # If there are values to set the unbuffered outputs to, set them now:
             if 'STATIC_DATA' in group:
@@ -278,16 +330,20 @@ class NovaTech409B_ACWorker(Worker):
         # Now program the buffered outputs:
         if table_data is not None:
             data = table_data
-            for i, line in enumerate(data):
-                st = time.time()
+            # find the lines of each DDS that differ from the cached table
+            with self.profiler.phase('diff'):
                 oldtable = self.smart_cache['TABLE_DATA']
-                for ddsno in range(2):
-                    if fresh or i >= len(oldtable) or (line['freq%d'%ddsno],line['phase%d'%ddsno],line['amp%d'%ddsno]) != (oldtable[i]['freq%d'%ddsno],oldtable[i]['phase%d'%ddsno],oldtable[i]['amp%d'%ddsno]):
-                        self.connection.write(b't%d %04x %08x,%04x,%04x,ff\r\n'%(ddsno, i,line['freq%d'%ddsno],line['phase%d'%ddsno],line['amp%d'%ddsno]))
-                        self.check_error(self.connection.readline()) # speed this up by block writing and reading and don't check errors
-                et = time.time()
-                tt=et-st
-                self.logger.debug('Time spent on line %s: %s' % (i,tt))
+                changed = np.ones((len(data),2), dtype=bool)
+                n = 0 if fresh else min(len(data), len(oldtable))
+                if n:
+                    for ddsno in range(2):
+                        names = ['%s%d' % (subchnl, ddsno) for subchnl in ('freq','phase','amp')]
+                        changed[:n,ddsno] = np.any([data[name][:n] != oldtable[name][:n]
+                                                    for name in names], axis=0)
+            for i, line in enumerate(data):
+                for ddsno in np.flatnonzero(changed[i]):
+                    self.connection.write(b't%d %04x %08x,%04x,%04x,ff\r\n'%(ddsno, i,line['freq%d'%ddsno],line['phase%d'%ddsno],line['amp%d'%ddsno]))
+                    self.check_error(self.connection.readline()) # speed this up by block writing and reading and don't check errors
             # Store the table for future smart programming comparisons:
             try:
                 self.smart_cache['TABLE_DATA'][:len(data)] = data
@@ -295,6 +351,7 @@ class NovaTech409B_ACWorker(Worker):
             except: # new table is longer than old table
                 self.smart_cache['TABLE_DATA'] = data
                 self.logger.debug('New table is longer than old table and has replaced it.')
+            self.cache_store.save({'TABLE_DATA': self.smart_cache['TABLE_DATA']})
                 
             # Get the final values of table mode so that the GUI can
             # reflect them after the run:
@@ -354,11 +411,15 @@ class NovaTech409B_ACWorker(Worker):
                 continue
             for subchnl in self.subchnls:            
                 self.program_static(ddsnum,subchnl,values[channel][subchnl]*self.conv[subchnl])
+        
+        if not abort:
+            self.profiler.write_record(self.h5_file, self.device_name)
             
         # return True to indicate we successfully transitioned back to manual mode
         return True
                      
     def shutdown(self):
+        self.dump_bus_trace()
         self.connection.close()        
     
 class NovaTech409BWorker(NovaTech409B_ACWorker):
@@ -373,8 +434,8 @@ class NovaTech409BWorker(NovaTech409B_ACWorker):
                 for subchnl in self.subchnls:
                     self.program_static(ddsnum,subchnl,self.initial_values[channel][subchnl]*self.conv[subchnl])
         else:
-            # if not aborting, final values already set so do nothing
-            pass
+            # if not aborting, final values already set so only save the timing
+            self.profiler.write_record(self.h5_file, self.device_name)
         # return True to indicate we successfully transitioned back to manual mode
         return True
 
@@ -397,6 +458,9 @@ class NovaTech440AWorker(NovaTech409BWorker):
         self.read_conv = {'freq':1/4.0,'phase':360.0/16384.0}
         
         self.connection = serial.Serial(self.com_port, baudrate = self.baud_rate, timeout=0.1)
+        self.profiler = ShotProfiler()
+        self.profiler.attach_serial(self.connection)
+        self.attach_tracer()
         self.connection.readlines()
         
         self.connection.write(b'e d\r\n')
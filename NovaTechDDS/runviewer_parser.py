@@ -12,8 +12,17 @@
 #                                                                   #
 #####################################################################
 import numpy as np
+from numpy.lib import recfunctions
 import labscript_utils.h5_lock, h5py
+import labscript_utils.properties
        
+# device properties holding the instrument units per physical unit
+scale_factor_names = {'freq': 'frequency_scale_factor',
+                      'amp': 'amplitude_scale_factor',
+                      'phase': 'phase_scale_factor'}
+# for shots without stored scale factors, assumes the internal clock
+default_scale_factors = {'freq': 10.0, 'amp': 1023.0, 'phase': 16384/360.0}
+
         
 class NovaTech409B_ACParser(object):    
     def __init__(self, path, device):
@@ -22,12 +31,9 @@ class NovaTech409B_ACParser(object):
         self.device = device
         self.dyn_chan = [0,1]
         self.static_chan = [2,3]
-            
-    def get_traces(self, add_trace, clock=None):
-        if clock is None:
-            # we're the master pseudoclock, software triggered. So we don't have to worry about trigger delays, etc
-            raise Exception('No clock passed to %s. A NovaTechDDS must be clocked by another device.' % self.name)
         
+    def get_clock_ticks(self, clock):
+        """Returns the times of the rising edges of the clock."""
         times, clock_value = clock[0], clock[1]
         
         clock_indices = np.where((clock_value[1:]-clock_value[:-1])==1)[0]+1
@@ -35,40 +41,57 @@ class NovaTech409B_ACParser(object):
         # but this is not picked up by the above code. So we insert it!
         if clock_value[0] == 1:
             clock_indices = np.insert(clock_indices, 0, 0)
-        clock_ticks = times[clock_indices]
+        return times[clock_indices]
         
-        # get the data out of the H5 file
-        data = {}
+    def get_stop_time(self, hdf5_file):
+        """Returns the stop time of the shot from the master pseudoclock."""
+        master = hdf5_file['connection table'].attrs['master_pseudoclock']
+        return hdf5_file['devices'][master].attrs['stop_time']
+            
+    def get_traces(self, add_trace, clock=None):
+        """Static channels are returned as two point traces spanning the shot,
+        table channels as one point per clock tick. Values are in Hz, 
+        fractions of full amplitude and degrees."""
+        traces = {}
         with h5py.File(self.path, 'r') as hdf5_file:
-            if 'TABLE_DATA' in hdf5_file['devices/%s' % self.name]:
-                table_data = hdf5_file['devices/%s/TABLE_DATA' % self.name][:]
+            group = hdf5_file['devices/%s' % self.name]
+            device_properties = labscript_utils.properties.get(hdf5_file, self.name, 'device_properties')
+            scale = {sub_chnl: device_properties.get(name, default_scale_factors[sub_chnl])
+                     for sub_chnl, name in scale_factor_names.items()}
+            
+            if 'TABLE_DATA' in group:
+                if clock is None:
+                    # we're the master pseudoclock, software triggered. So we don't have to worry about trigger delays, etc
+                    raise Exception('No clock passed to %s. A NovaTechDDS must be clocked by another device.' % self.name)
+                clock_ticks = self.get_clock_ticks(clock)
+                table_data = group['TABLE_DATA'][:]
                 connection_table_properties = labscript_utils.properties.get(hdf5_file, self.name, 'connection_table_properties')
-                update_mode = getattr(connection_table_properties, 'update_mode', 'synchronous')
-                synchronous_first_line_repeat = getattr(connection_table_properties, 'synchronous_first_line_repeat', False)
+                update_mode = connection_table_properties.get('update_mode', 'synchronous')
+                synchronous_first_line_repeat = connection_table_properties.get('synchronous_first_line_repeat', False)
                 if update_mode == 'asynchronous' or synchronous_first_line_repeat:
                     table_data = table_data[1:]
-                for i in self.dyn_chan:
-                    for sub_chnl in ['freq', 'amp', 'phase']:
-                        data['channel %d_%s' % (i,sub_chnl)] = table_data['%s%d' % (sub_chnl,i)][:]
+                # convert every table column to physical units at once
+                columns = [(i, sub_chnl) for i in self.dyn_chan for sub_chnl in scale]
+                values = recfunctions.structured_to_unstructured(
+                            table_data[['%s%d' % (sub_chnl,i) for i, sub_chnl in columns]],
+                            dtype=np.float64)
+                values /= [scale[sub_chnl] for i, sub_chnl in columns]
+                for j, (i, sub_chnl) in enumerate(columns):
+                    traces['channel %d_%s' % (i,sub_chnl)] = (clock_ticks, values[:,j])
                                 
-            if 'STATIC_DATA' in hdf5_file['devices/%s' % self.name]:
-                static_data = hdf5_file['devices/%s/STATIC_DATA' % self.name][:]
-                num_chan = len(static_data)//3
-                channels = [int(name[-1]) for name in static_data.dtype.names[0:num_chan]]
-                for i in channels:
-                    for sub_chnl in ['freq', 'amp', 'phase']:
-                        data['channel %d_%s' % (i,sub_chnl)] = np.empty((len(clock_ticks),))
-                        data['channel %d_%s' % (i,sub_chnl)].fill(static_data['%s%d' % (sub_chnl,i)][0])
-            
-        
-        for channel, channel_data in data.items():
-            data[channel] = (clock_ticks, channel_data)
+            if 'STATIC_DATA' in group:
+                static_data = group['STATIC_DATA'][0]
+                span = np.array([0, self.get_stop_time(hdf5_file)])
+                for name in static_data.dtype.names:
+                    sub_chnl, i = name[:-1], int(name[-1])
+                    value = static_data[name]/scale[sub_chnl]
+                    traces['channel %d_%s' % (i,sub_chnl)] = (span, np.array([value, value]))
         
-        for channel_name, channel in self.device.child_list.items():
-            for subchnl_name, subchnl in channel.child_list.items():
+        for channel in self.device.child_list.values():
+            for subchnl in channel.child_list.values():
                 connection = '%s_%s' % (channel.parent_port, subchnl.parent_port)
-                if connection in data:
-                    add_trace(subchnl.name, data[connection], self.name, connection)
+                if connection in traces:
+                    add_trace(subchnl.name, traces[connection], self.name, connection)
         
         return {}
     
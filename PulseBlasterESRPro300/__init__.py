@@ -4,9 +4,10 @@
 #                                                                   #
 #                                                                   #
 #####################################################################
-from labscript_devices import deprecated_import_alias
+from naqslab_devices import lazy_deprecated_aliases
 
 
 # For backwards compatibility with old experiment scripts:
-PulseBlasterESRPro300 = deprecated_import_alias(
-    "naqslab_devices.PulseBlasterESRPro300.labscript_device.PulseBlasterESRPro300")
+__getattr__ = lazy_deprecated_aliases(__name__, {
+    'PulseBlasterESRPro300': 'naqslab_devices.PulseBlasterESRPro300.labscript_device.PulseBlasterESRPro300'
+    })
@@ -10,7 +10,7 @@
 # the project for the full license.                                 #
 #                                                                   #
 #####################################################################
-from labscript_devices.PulseBlaster_No_DDS import PulseblasterNoDDSWorker
+from naqslab_devices.pulse_program_cache import CachedPulseblasterWorker
 
 # note that ESR-Pro boards only have 21 channels
 # bits 21-23 are short pulse control bits
@@ -24,7 +24,7 @@ from labscript_devices.PulseBlaster_No_DDS import PulseblasterNoDDSWorker
 # SIX_PERIOD   |    110  not defined in manual, defined in spinapi.h
 # ON           |    111    
     
-class PulseBlasterESRPro300Worker(PulseblasterNoDDSWorker):
+class PulseBlasterESRPro300Worker(CachedPulseblasterWorker):
     core_clock_freq = 300.0
     ESRPro = True
     
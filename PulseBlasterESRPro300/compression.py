@@ -0,0 +1,297 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/PulseBlasterESRPro300/compression.py             #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Loop and subroutine compression of ESR-Pro pulse programs.
+
+The stock PulseBlaster compiler writes one instruction per state change,
+so a pulse train uses an instruction per edge. :func:`compress` rewrites a
+`PULSE_PROGRAM` table so that
+
+* consecutive repeats of a block of instructions become one LOOP/END_LOOP
+  block, nested up to the depth the board supports, and
+* blocks that recur elsewhere in the sequence are moved to subroutines,
+  placed after the final instruction, and called with JSR/RTS.
+
+The LOOP (or JSR) and END_LOOP (or RTS) opcodes take the place of CONTINUE
+instructions at the ends of a block, keeping their flags and length, so
+the output is unchanged to the clock cycle.
+
+Internally the program is a list of nodes: a row `(flags, inst, data,
+length)`, a loop `('loop', count, body)` or a subroutine call
+`('call', row, index)`. Nodes are compared by their length in whole core
+clock cycles, since lengths computed from labscript times differ in the
+last bits of the float for the same number of cycles.
+"""
+import numpy as np
+
+CONTINUE = 0
+STOP = 1
+LOOP = 2
+END_LOOP = 3
+JSR = 4
+RTS = 5
+BRANCH = 6
+LONG_DELAY = 7
+WAIT = 8
+
+# lines 0 and 1 are written by BLACS
+header_length = 2
+max_loop_depth = 8
+max_loop_count = 2**20
+# longest block searched for, in nodes
+max_block = 32
+max_subroutine_block = 16
+
+
+def is_row(node):
+    return not isinstance(node[0], str)
+
+
+def is_continue(node):
+    return is_row(node) and node[1] == CONTINUE
+
+
+def n_rows(node):
+    """Number of instructions a node is assembled to."""
+    if is_row(node) or node[0] == 'call':
+        return 1
+    return sum(n_rows(child) for child in node[2])
+
+
+def depth(node):
+    """Loop nesting depth of a node."""
+    if node[0] == 'loop':
+        return 1 + max(depth(child) for child in node[2])
+    return 0
+
+
+def parse(rows, start=0, stop=None, offset=header_length):
+    """Splits table rows into nodes, with loops of count 1 unrolled."""
+    stop = len(rows) if stop is None else stop
+    nodes = []
+    i = start
+    while i < stop:
+        flags, inst, data, length = rows[i]
+        if inst == LOOP:
+            end = next(j for j in range(i+1, stop)
+                       if rows[j][1] == END_LOOP and rows[j][2] == i + offset)
+            end_flags, _, _, end_length = rows[end]
+            body = ([(flags, CONTINUE, 0, length)]
+                    + parse(rows, i+1, end, offset)
+                    + [(end_flags, CONTINUE, 0, end_length)])
+            if data > 1:
+                nodes.append(('loop', data, tuple(body)))
+            else:
+                nodes.extend(body)
+            i = end + 1
+        else:
+            nodes.append(rows[i])
+            i += 1
+    return nodes
+
+
+def node_key(node, core_clock_freq):
+    """Hashable form of a node with lengths in core clock cycles."""
+    if is_row(node):
+        flags, inst, data, length = node
+        return flags, inst, data, round(length*core_clock_freq/1e3)
+    if node[0] == 'call':
+        return 'call', node_key(node[1], core_clock_freq), node[2]
+    return 'loop', node[1], tuple(node_key(child, core_clock_freq) for child in node[2])
+
+
+def node_ids(nodes, core_clock_freq):
+    """Integer id per node, equal for nodes of the same clock cycles.
+
+    Waits and the final instruction are never repeated.
+    """
+    ids = {}
+    result = np.empty(len(nodes), dtype=np.int64)
+    for i, node in enumerate(nodes):
+        if is_row(node) and node[1] in (WAIT, STOP, BRANCH):
+            result[i] = -i - 1
+        else:
+            result[i] = ids.setdefault(node_key(node, core_clock_freq), len(ids))
+    return result
+
+
+def repeat_runs(ids, period):
+    """Number of consecutive positions from each position p where
+    `ids[q] == ids[q + period]`."""
+    n = len(ids) - period
+    if n <= 0:
+        return np.zeros(0, dtype=np.int64)
+    index = np.arange(n)
+    next_mismatch = np.where(ids[:-period] == ids[period:], n, index)
+    next_mismatch = np.minimum.accumulate(next_mismatch[::-1])[::-1]
+    return next_mismatch - index
+
+
+def block_ends(continues, length):
+    """Boolean array, True where a block of `length` nodes starts and ends on
+    CONTINUE instructions, given whether each node is one."""
+    return continues[:len(continues)-length+1] & continues[length-1:]
+
+
+def fold_loops(nodes, core_clock_freq):
+    """Replaces consecutive repeats of blocks of nodes with loops.
+
+    Each loop runs the first repeat of its block. Later repeats only differ
+    from it below a clock cycle.
+
+    Returns:
+        tuple: New list of nodes and whether any loop was made.
+    """
+    ids = node_ids(nodes, core_clock_freq)
+    continues = np.array([is_continue(node) for node in nodes], dtype=bool)
+    sizes = np.array([n_rows(node) for node in nodes], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    periods = np.arange(2, min(max_block, len(nodes)//2) + 1)
+    # instructions saved by looping the block of each period at each position
+    savings = np.zeros((len(periods) + 1, len(nodes)), dtype=np.int64)
+    counts = np.zeros_like(savings)
+    for i, period in enumerate(periods, 1):
+        run = repeat_runs(ids, period)
+        count = np.minimum(1 + run//period, max_loop_count)
+        count[~block_ends(continues, period)[:len(run)]] = 1
+        counts[i, :len(run)] = count
+        savings[i, :len(run)] = (offsets[period:period+len(run)] - offsets[:len(run)])*(count - 1)
+    best = savings.argmax(axis=0)
+
+    folded = []
+    changed = False
+    p = 0
+    while p < len(nodes):
+        if best[p]:
+            period, count = periods[best[p]-1], counts[best[p], p]
+            block = tuple(nodes[p:p+period])
+            if 1 + max(depth(node) for node in block) <= max_loop_depth:
+                folded.append(('loop', int(count), block))
+                p += period*count
+                changed = True
+                continue
+        folded.append(nodes[p])
+        p += 1
+    return folded, changed
+
+
+def extract_subroutines(nodes, core_clock_freq):
+    """Moves blocks of nodes that occur more than once into subroutines.
+
+    Returns:
+        tuple: New list of nodes, with calls in place of the blocks, and
+        the list of subroutine bodies.
+    """
+    ids = node_ids(nodes, core_clock_freq)
+    continues = np.array([is_continue(node) for node in nodes], dtype=bool)
+    consumed = np.zeros(len(nodes), dtype=bool)
+    calls = {}
+    subroutines = []
+    for length in range(min(max_subroutine_block, len(nodes)//2), 1, -1):
+        used = np.concatenate(([0], np.cumsum(consumed)))
+        candidates = np.flatnonzero(block_ends(continues, length)
+                                    & (used[length:] == used[:-length]))
+        if len(candidates) < 2:
+            continue
+        windows = np.lib.stride_tricks.sliding_window_view(ids, length)[candidates]
+        _, groups, group_sizes = np.unique(windows, axis=0, return_inverse=True,
+                                           return_counts=True)
+        groups = groups.ravel()
+        for group in np.flatnonzero(group_sizes > 1):
+            chosen = []
+            for p in candidates[groups == group]:
+                if (not chosen or p >= chosen[-1] + length) and not consumed[p:p+length].any():
+                    chosen.append(p)
+            if len(chosen) < 2:
+                continue
+            # a call saves all but one instruction of each repeat of the block
+            block = nodes[chosen[0]:chosen[0]+length]
+            for p in chosen:
+                consumed[p:p+length] = True
+                calls[p] = (('call', block[0], len(subroutines)), length)
+            subroutines.append(tuple(block[1:]))
+
+    result = []
+    p = 0
+    while p < len(nodes):
+        if p in calls:
+            call, length = calls[p]
+            result.append(call)
+            p += length
+        else:
+            result.append(nodes[p])
+            p += 1
+    return result, subroutines
+
+
+def assemble(nodes, subroutines):
+    """Builds the table rows, starting at the first line after the header."""
+    rows = []
+    fixups = []
+
+    def emit(node):
+        if is_row(node):
+            rows.append(node)
+        elif node[0] == 'call':
+            flags, _, _, length = node[1]
+            fixups.append((len(rows), node[2]))
+            rows.append((flags, JSR, 0, length))
+        else:
+            _, count, body = node
+            address = len(rows) + header_length
+            flags, _, _, length = body[0]
+            rows.append((flags, LOOP, count, length))
+            for child in body[1:-1]:
+                emit(child)
+            flags, _, _, length = body[-1]
+            rows.append((flags, END_LOOP, address, length))
+
+    for node in nodes:
+        emit(node)
+    addresses = []
+    for body in subroutines:
+        addresses.append(len(rows) + header_length)
+        for node in body:
+            emit(node)
+        flags, _, _, length = rows[-1]
+        rows[-1] = (flags, RTS, 0, length)
+    for index, subroutine in fixups:
+        flags, inst, _, length = rows[index]
+        rows[index] = (flags, inst, addresses[subroutine], length)
+    return rows
+
+
+def compress(pulse_program, core_clock_freq):
+    """Compresses a pulse program with loops and subroutines.
+
+    Args:
+        pulse_program (:obj:`numpy:numpy.ndarray`): `PULSE_PROGRAM` table,
+            including the two header lines.
+        core_clock_freq (float): Core clock frequency of the board, in MHz.
+
+    Returns:
+        :obj:`numpy:numpy.ndarray`: Compressed table, or the original one if
+        it is not made shorter.
+    """
+    rows = pulse_program[header_length:].tolist()
+    nodes = parse(rows)
+    changed = True
+    while changed:
+        nodes, changed = fold_loops(nodes, core_clock_freq)
+    nodes, subroutines = extract_subroutines(nodes, core_clock_freq)
+    rows = assemble(nodes, subroutines)
+    if len(rows) + header_length >= len(pulse_program):
+        return pulse_program
+    table = np.empty(len(rows) + header_length, dtype=pulse_program.dtype)
+    table[:header_length] = pulse_program[:header_length]
+    table[header_length:] = rows
+    return table
@@ -10,7 +10,13 @@
 # the project for the full license.                                 #
 #                                                                   #
 #####################################################################
+import numpy as np
+
 from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS
+from labscript import DigitalOut, LabscriptError, config
+from labscript_utils import dedent
+
+from naqslab_devices.PulseBlasterESRPro300.compression import compress
 
 # note that ESR-Pro boards only have 21 channels
 # bits 21-23 are short pulse control bits
@@ -29,5 +35,130 @@ class PulseBlasterESRPro300(PulseBlaster_No_DDS):
     clock_limit = 30.0e6 # can probably go faster
     clock_resolution = 4e-9
     n_flags = 24
-    
-     
+    core_clock_freq = 300 # MHz, ensure that the BLACS worker class has the same
+    pb_instructions = dict(PulseBlaster_No_DDS.pb_instructions, JSR=4, RTS=5)
+    # first of the short pulse control bits, see the table above
+    short_pulse_bit = 21
+    max_short_pulse = 5
+    # compress the pulse program with loops and subroutines
+    compress_program = True
+
+    def __init__(self, *args, **kwargs):
+        PulseBlaster_No_DDS.__init__(self, *args, **kwargs)
+        # (time, flag, periods) of each short pulse
+        self.short_pulses = []
+
+    def short_pulse(self, output, t, periods):
+        """Pulses a digital output high for a few core clock periods.
+
+        Instructions are at least five core clock periods long. The short pulse
+        bits hold the flags of an instruction high for only the first `periods`
+        clock periods of it, so this output must be the only flag high at `t`.
+
+        Args:
+            output (:obj:`labscript:labscript.DigitalOut`): Output connected
+                to one of flags 0 to 20 of this board.
+            t (float): Start of the pulse, in seconds.
+            periods (int): Pulse width, in clock periods of 1/core_clock_freq.
+        """
+        if not (isinstance(output, DigitalOut) and output.parent_device is self.direct_outputs):
+            raise LabscriptError(f'{output.name} is not a digital output of {self.name}')
+        flag = int(output.connection.split()[1])
+        if flag >= self.short_pulse_bit:
+            msg = f'''{output.name} is connected to flag {flag}, which is a
+                short pulse control bit.'''
+            raise LabscriptError(dedent(msg))
+        if periods not in range(1, self.max_short_pulse+1):
+            msg = f'''Short pulses are 1 to {self.max_short_pulse} clock periods long,
+                {periods} requested for {output.name} at t = {t}.'''
+            raise LabscriptError(dedent(msg))
+        # the pulse gets an instruction of its own, held for as long as the
+        # direct outputs need between updates and cut short in hardware
+        t = round(t/self.clock_resolution)*self.clock_resolution
+        output.go_high(t)
+        output.go_low(t + self.short_pulse_hold())
+        self.short_pulses.append((t, flag, periods))
+
+    def short_pulse_hold(self):
+        """Length of the instruction holding a short pulse, in seconds.
+
+        This is the minimum update time of the direct outputs clock line,
+        rounded up to the clock resolution.
+        """
+        minimum = 1/self.direct_outputs.parent_device.clock_limit
+        return np.ceil(round(minimum/self.clock_resolution, 6))*self.clock_resolution
+
+    def apply_short_pulses(self, pb_inst_table):
+        """Sets the short pulse bits of the instructions holding short pulses."""
+        if not self.short_pulses:
+            return
+        table = pb_inst_table[2:]
+        # LONG_DELAY instructions last inst_data times their length
+        lengths = table['length'].copy()
+        long_delays = table['inst'] == self.pb_instructions['LONG_DELAY']
+        lengths[long_delays] *= table['inst_data'][long_delays]
+        # start of each instruction in ns, with loops of the stock compiler
+        # (which are never nested) counted in full
+        starts = np.empty(len(table))
+        t = self.pseudoclock.clock[0]['start']*1e9 if self.pseudoclock.clock else 0
+        i = 0
+        while i < len(table):
+            if table['inst'][i] == self.pb_instructions['LOOP']:
+                end = i + np.flatnonzero(table['inst'][i:] == self.pb_instructions['END_LOOP'])[0]
+                starts[i:end+1] = t + np.cumsum(lengths[i:end+1]) - lengths[i:end+1]
+                t += table['inst_data'][i]*lengths[i:end+1].sum()
+                i = end + 1
+            else:
+                starts[i] = t
+                t += lengths[i]
+                i += 1
+
+        tolerance = 0.5e3/self.core_clock_freq
+        bits = table['flags'] & ((1 << self.short_pulse_bit) - 1)
+        codes = {}
+        for t, flag, periods in self.short_pulses:
+            index = np.flatnonzero((np.abs(starts - t*1e9) < tolerance)
+                                   & (table['inst'] == self.pb_instructions['CONTINUE'])
+                                   & (bits >> flag & 1).astype(bool))
+            if not len(index):
+                raise LabscriptError(f'No instruction found for the short pulse on flag {flag} at t = {t}')
+            index = index[0]
+            if codes.setdefault(index, periods) != periods:
+                raise LabscriptError(f'Short pulses at t = {t} have different lengths')
+        for index, periods in codes.items():
+            pulsed = [flag for t, flag, _ in self.short_pulses
+                      if np.abs(starts[index] - t*1e9) < tolerance]
+            if bits[index] & ~sum(1 << flag for flag in pulsed):
+                msg = f'''Other flags are high during the short pulse at
+                    t = {starts[index]*1e-9}, they would be cut short with it.'''
+                raise LabscriptError(dedent(msg))
+            table['flags'][index] = bits[index] | periods << self.short_pulse_bit
+
+    def convert_to_pb_inst(self, *args, **kwargs):
+        # the memory limit applies to the compressed program
+        max_instructions = self.max_instructions
+        self.max_instructions = np.inf
+        try:
+            return PulseBlaster_No_DDS.convert_to_pb_inst(self, *args, **kwargs)
+        finally:
+            self.max_instructions = max_instructions
+
+    def write_pb_inst_to_h5(self, pb_inst, hdf5_file):
+        pb_dtype = [('flags',np.int32), ('inst',np.int32), ('inst_data',np.int32), ('length',np.float64)]
+        pb_inst_table = np.empty(len(pb_inst),dtype = pb_dtype)
+        for i,inst in enumerate(pb_inst):
+            flagint = int(inst['flags'][::-1],2)
+            instructionint = self.pb_instructions[inst['instruction']]
+            pb_inst_table[i] = (flagint, instructionint, inst['data'], inst['delay'])
+
+        self.apply_short_pulses(pb_inst_table)
+        if self.compress_program:
+            pb_inst_table = compress(pb_inst_table, self.core_clock_freq)
+        if len(pb_inst_table) > self.max_instructions:
+            msg = f'''The Pulseblaster memory cannot store more than {self.max_instructions}
+                instructions, but the compressed pulse program contains {len(pb_inst_table)}.'''
+            raise LabscriptError(dedent(msg))
+
+        group = hdf5_file['/devices/'+self.name]
+        group.create_dataset('PULSE_PROGRAM', compression=config.compression, data=pb_inst_table)
+        self.set_property('stop_time', self.stop_time, location='device_properties')
@@ -10,7 +10,11 @@
 # the project for the full license.                                 #
 #                                                                   #
 #####################################################################
-from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS_Parser
+import numpy as np
+import labscript_utils.h5_lock, h5py
+
+from naqslab_devices.PulseBlasterESRPro300.compression import (
+    header_length, STOP, LOOP, END_LOOP, JSR, RTS, BRANCH, LONG_DELAY, WAIT)
 
 # note that ESR-Pro boards only have 21 channels
 # bits 21-23 are short pulse control bits
@@ -24,5 +28,136 @@ from labscript_devices.PulseBlaster_No_DDS import PulseBlaster_No_DDS_Parser
 # SIX_PERIOD   |    110  not defined in manual, defined in spinapi.h
 # ON           |    111
 
-class PulseBlasterESRPro300Parser(PulseBlaster_No_DDS_Parser):
+
+def unroll(pulse_program):
+    """Returns the rows of a pulse program in the order they are executed.
+
+    Loops are expanded with :func:`numpy:numpy.tile` and subroutines are
+    expanded once and reused at each call.
+    """
+    inst = pulse_program['inst']
+    data = pulse_program['inst_data']
+    # END_LOOP of each LOOP, by address of the LOOP
+    loop_ends = {int(data[j]): j for j in np.flatnonzero(inst == END_LOOP)}
+    control = np.flatnonzero(np.isin(inst, (STOP, LOOP, END_LOOP, JSR, RTS, BRANCH)))
+    subroutines = {}
+
+    def block(start, stop):
+        """Rows executed from start, until stop or the end of the program."""
+        parts = []
+        i = start
+        while i < stop:
+            # rows up to the next control instruction run in order
+            following = control[np.searchsorted(control, i):]
+            j = min(following[0] if len(following) else stop, stop)
+            parts.append(np.arange(i, j))
+            if j == stop:
+                break
+            if inst[j] == LOOP:
+                end = loop_ends[j]
+                body = np.concatenate(([j], block(j+1, end), [end]))
+                parts.append(np.tile(body, max(int(data[j]), 1)))
+                i = end + 1
+            elif inst[j] == JSR:
+                address = int(data[j])
+                if address not in subroutines:
+                    subroutines[address] = block(address, len(inst))
+                parts += [[j], subroutines[address]]
+                i = j + 1
+            else:
+                # STOP, RTS or BRANCH end the block
+                parts.append([j])
+                break
+        return np.concatenate(parts or [[]]).astype(np.int64)
+
+    return block(header_length, len(inst))
+
+
+class PulseBlasterESRPro300Parser(object):
+    """Shows the flags of an ESR-Pro pulse program as edge lists.
+
+    Flags 0-20 are shown as output, i.e. cut short by the short pulse
+    bits, flags 21-23 as programmed. Each trace holds only the times the
+    flag changes, plus the end of the program.
+    """
     num_flags = 24 # only 21 usable, flags 21-23 used for short pulses
+    short_pulse_bit = 21
+    # ensure these match the labscript_device and the PulseBlaster class
+    core_clock_freq = 300 # MHz
+    trigger_delay = 250e-9
+
+    def __init__(self, path, device):
+        self.path = path
+        self.name = device.name
+        self.device = device
+
+    def get_flags(self, parent=None):
+        """Times and flags of each change of the outputs.
+
+        Returns:
+            tuple: Event times in s, flags after each event and the stop time.
+        """
+        with h5py.File(self.path, 'r') as f:
+            pulse_program = f['devices/%s/PULSE_PROGRAM' % self.name][:]
+
+        order = unroll(pulse_program)
+        rows = pulse_program[order]
+        lengths = rows['length']*1e-9
+        long_delays = rows['inst'] == LONG_DELAY
+        lengths[long_delays] *= rows['inst_data'][long_delays]
+        starts = np.concatenate(([0.], np.cumsum(lengths)))
+        if parent is not None:
+            # offset by the trigger from the parent and after each wait
+            waits = np.cumsum(rows['inst'] == WAIT)
+            starts += self.trigger_delay*(1 + np.concatenate(([0], waits)))
+        stop_time = starts[-1]
+        starts = starts[:-1]
+
+        flags = rows['flags'].astype(np.int64)
+        outputs = flags & ((1 << self.short_pulse_bit) - 1)
+        controls = flags & ~((1 << self.short_pulse_bit) - 1)
+        codes = flags >> self.short_pulse_bit & 7
+        # outputs are held for the instruction when ON, not at all when OFF
+        # and otherwise for the first `code` clock periods
+        held = np.where(codes == 7, outputs, 0) | controls
+        short = (codes > 0) & (codes < 7)
+        held[short] = outputs[short] | controls[short]
+
+        # each instruction is an event at its start, and one at the end of
+        # its short pulse, which repeats the start for other instructions
+        ends = starts + np.where(short, codes*1e-6/self.core_clock_freq, 0)
+        after = np.where(short, controls, held)
+        times = np.column_stack((starts, ends)).ravel()
+        values = np.column_stack((held, after)).ravel()
+        return times, values, stop_time
+
+    def get_traces(self, add_trace, parent=None):
+        times, values, stop_time = self.get_flags(parent)
+        changed = np.concatenate(([True], values[1:] != values[:-1]))
+        times = times[changed]
+        values = values[changed]
+
+        to_return = {}
+        for i in range(self.num_flags):
+            bit = (values >> i & 1).astype(np.uint8)
+            edges = np.concatenate(([0], np.flatnonzero(np.diff(bit)) + 1))
+            to_return['flag %d' % i] = (np.append(times[edges], stop_time),
+                                        np.append(bit[edges], bit[-1]))
+
+        clocklines_and_triggers = {}
+        for pseudoclock_name, pseudoclock in self.device.child_list.items():
+            for clock_line_name, clock_line in pseudoclock.child_list.items():
+                if clock_line.parent_port == 'internal':
+                    parent_device_name = '%s.direct_outputs' % self.name
+                    for internal_device_name, internal_device in clock_line.child_list.items():
+                        for channel_name, channel in internal_device.child_list.items():
+                            trace = to_return[channel.parent_port]
+                            if channel.device_class == 'Trigger':
+                                clocklines_and_triggers[channel_name] = trace
+                            add_trace(channel_name, trace, parent_device_name, channel.parent_port)
+                else:
+                    clocklines_and_triggers[clock_line_name] = to_return[clock_line.parent_port]
+                    add_trace(clock_line_name, to_return[clock_line.parent_port],
+                              self.name, clock_line.parent_port)
+
+        return clocklines_and_triggers
@@ -10,9 +10,9 @@
 # the project for the full license.                                 #
 #                                                                   #
 #####################################################################
-from labscript_devices.PulseBlaster_No_DDS import PulseblasterNoDDSWorker    
+from naqslab_devices.pulse_program_cache import CachedPulseblasterWorker
     
-class PulseblasterNoDDS200Worker(PulseblasterNoDDSWorker):
+class PulseblasterNoDDS200Worker(CachedPulseblasterWorker):
     core_clock_freq = 200.0
     
      
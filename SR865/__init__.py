@@ -10,8 +10,10 @@
 # the project for the full license.                                 #
 #                                                                   #
 #####################################################################
-from labscript_devices import deprecated_import_alias
+from naqslab_devices import lazy_deprecated_aliases
 
 
 # For backwards compatibility with old experiment scripts:
-SR865 = deprecated_import_alias("naqslab_devices.SR865.labscript_device.SR865")
+__getattr__ = lazy_deprecated_aliases(__name__, {
+    'SR865': 'naqslab_devices.SR865.labscript_device.SR865'
+    })
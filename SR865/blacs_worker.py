@@ -9,18 +9,46 @@
 #                                                                   #
 #                                                                   #
 #####################################################################
+import time
+
 import numpy as np
 from naqslab_devices.VISA.blacs_worker import VISAWorker
-from labscript import LabscriptError
+from naqslab_devices.smart_cache_store import SmartCacheStore
+import labscript_utils.properties
 
 import labscript_utils.h5_lock, h5py
 
-# import sensitivity and tau settings from labscript device
-from naqslab_devices.SR865.labscript_device import sens, tau
+# import sensitivity and tau settings
+from naqslab_devices.SR865.settings import sens, tau, capture_fields
+from naqslab_devices.SR865.settings import tau_code, sens_code
+from naqslab_devices.SR865.streaming import StreamReceiver, packet_sizes
 
 class SR865Worker(VISAWorker):
     program_string = 'OFLT {:d};SCAL {:d};PHAS {:.6f}'
     read_string = 'OFLT?;SCAL?;PHAS?'   
+    # parts of the compound command sent at the start of a shot
+    tau_string = 'OFLT {:d}'
+    sens_string = 'SCAL {:d}'
+    phase_string = 'PHAS {:.6f}'
+    capture_config_string = 'CAPTURECFG {:d};CAPTURERATE {:d};CAPTURELEN {:d}'
+    capture_start_string = 'CAPTURESTART ONE, TRIG'
+    capture_stop_string = 'CAPTURESTOP'
+    capture_max_rate_string = 'CAPTURERATEMAX?'
+    capture_bytes_string = 'CAPTUREBYTES?'
+    capture_get_string = 'CAPTUREGET? {:d}, {:d}'
+    # largest block returned by CAPTUREGET?, in kB
+    capture_block = 64
+    # time allowed for the capture to complete after the shot, in s
+    capture_timeout = 1.0
+    capture = None
+    stream_config_string = 'STREAMCH {:d};STREAMFMT 0;STREAMPCKT {:d};STREAMRATE {:d};STREAMPORT {:d}'
+    stream_max_rate_string = 'STREAMRATEMAX?'
+    stream_on_string = 'STREAM ON'
+    stream_off_string = 'STREAM OFF'
+    # STREAMPCKT code, 0 for 1024 byte packets
+    stream_packet_code = 0
+    stream = None
+    receiver = None
     
     def phase_parser(self,phase_string):
         '''Phase Query string parser'''
@@ -29,8 +57,11 @@ class SR865Worker(VISAWorker):
         
     def coerce_tau(self,tau_constant):
         '''Returns coerced, valid integer setting. 
-        Tau value rounds up.
+        Allowed settings are looked up directly, others round up.
         Returns max or min valid setting if out of bound.'''
+        coerced_i = tau_code(tau_constant)
+        if coerced_i is not None:
+            return coerced_i
         coerced_i = int(np.digitize(tau_constant,tau,right=True))
         if coerced_i >= len(tau):
             coerced_i -= 1
@@ -38,8 +69,11 @@ class SR865Worker(VISAWorker):
         
     def coerce_sens(self,sensitivity):
         '''Returns coerced, valid integer setting. 
-        Sens value rounds down.
+        Allowed settings are looked up directly, others round down.
         Returns max or min valid setting if out of bound.'''
+        coerced_i = sens_code(sensitivity)
+        if coerced_i is not None:
+            return coerced_i
         coerced_i = int(np.digitize(sensitivity,sens))
         if coerced_i >= len(sens):
             coerced_i -= 1
@@ -51,6 +85,18 @@ class SR865Worker(VISAWorker):
         
         # initial configure of the instrument
         self.connection.write('*ESE 122;*CLS;')
+        
+        # integer codes of the settings last programmed, None if unknown
+        self.smart_cache = {'STATIC_DATA': {'tau_i':None,'sens_i':None,'phase':None}}
+        # settings saved in the last session are only kept if the instrument
+        # still reports them
+        self.cache_store = SmartCacheStore(self.device_name, self.connection.query('*IDN?'))
+        saved = self.cache_store.load().get('STATIC_DATA')
+        if saved:
+            [tau_i, sens_i, phase] = self.connection.query_ascii_values(self.read_string,separator=';')
+            remote = {'tau_i':int(tau_i),'sens_i':int(sens_i),'phase':round(phase,6)}
+            self.smart_cache['STATIC_DATA'] = {key:(value if value == remote[key] else None)
+                                               for key, value in saved.items()}
     
     def check_remote_values(self):
         '''Queries the current settings for all three parameters.
@@ -74,53 +120,242 @@ class SR865Worker(VISAWorker):
         phase = front_panel_values['phase']
         
         self.connection.write(self.program_string.format(tau_i,sens_i,phase))
+        self.smart_cache['STATIC_DATA'] = {'tau_i':tau_i,'sens_i':sens_i,
+                                           'phase':round(phase,6)}
+        self.cache_store.save(self.smart_cache)
                 
         return self.check_remote_values()        
 
     def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
         # call parent method to do basic preamble
         VISAWorker.transition_to_buffered(self,device_name,h5file,initial_values,fresh)
+        with self.profiler.phase('h5_read'):
+            with h5py.File(h5file,'r') as hdf5_file:
+                data = self.read_static_data(hdf5_file['/devices/'+device_name])
+
+        return self.program_static_data(data,fresh)
         
-        data = None
-        with h5py.File(h5file,'r') as hdf5_file:
-            group = hdf5_file['/devices/'+device_name]
-            # If there are values to set the unbuffered outputs to, set them now:
-            if 'STATIC_DATA' in group:
-                data = group['STATIC_DATA'][:][0]
-                
+    def read_static_data(self, group):
+        '''Reads the static settings and any capture or stream requests
+        from the device group.'''
+        data = {'STATIC_DATA':None,'CAPTURE':None,'STREAM':None}
+        for name in data:
+            if name in group:
+                data[name] = group[name][0]
+        if data['CAPTURE'] is not None:
+            data['trigger_time'] = group['CAPTURE'].attrs['trigger_time']
+        if data['CAPTURE'] is not None or data['STREAM'] is not None:
+            device_props = labscript_utils.properties.get(group.file,self.device_name,
+                                                          'device_properties')
+            data['comp_settings'] = {'compression':device_props.get('compression'),
+                            'compression_opts':device_props.get('compression_opts'),
+                            'shuffle':device_props.get('shuffle',False)}
+        return data
+        
+    def program_static_data(self, data, fresh):
+        '''Sends the settings that differ from the smart cache as a single
+        compound command, then arms any capture or stream.'''
         # Save these values into final_values so the GUI can
         # be updated at the end of the run to reflect them:
         # assume initial values in case something isn't programmed
-        self.final_values = initial_values
-        
-        if data is not None:
-            # since static instrument, smart_cache replaced with initial vals
-            cur = self.initial_values               
-            if (data['tau_i'] != -1) and (fresh or (data['tau'] != cur['tau'])):
-                self.connection.write('OFLT {:d}'.format(data['tau_i']))
-                self.final_values['tau'] = tau[data['tau_i']]
-            else:
-                self.final_values['tau'] = initial_values['tau']
-            if (data['sens_i'] != -1) and (fresh or (data['tau'] != cur['tau'])):
-                self.connection.write('SCAL {:d}'.format(data['sens_i']))
-                self.final_values['sens'] = sens[data['sens_i']]
-            else:
-                self.final_values['sens'] = initial_values['sens']
-            if not np.isnan(data['phase']) and (fresh or (data['phase'] != cur['phase'])):
-                self.connection.write('PHAS {:.6f}'.format(data['phase']))
-                self.final_values['phase'] = data['phase']
-            else:
-                self.final_values['phase'] = initial_values['phase']
-                    
-        # write the final_values to h5file for later lookup
-        with h5py.File(h5file, 'r+') as hdf5_file:
-            group = hdf5_file['/devices/'+device_name]
-            group.attrs.create('sensitivity',self.final_values['sens'])
-            group.attrs.create('tau',self.final_values['tau'])
-            group.attrs.create('phase',round(self.final_values['phase'],6))
+        self.final_values = dict(self.initial_values)
+        static = data['STATIC_DATA']
+        
+        if static is not None:
+            cache = self.smart_cache['STATIC_DATA']
+            commands = []
+            with self.profiler.phase('diff'):
+                if static['tau_i'] != -1:
+                    tau_i = int(static['tau_i'])
+                    if fresh or tau_i != cache['tau_i']:
+                        commands.append(self.tau_string.format(tau_i))
+                        cache['tau_i'] = tau_i
+                    self.final_values['tau'] = tau[tau_i]
+                if static['sens_i'] != -1:
+                    sens_i = int(static['sens_i'])
+                    if fresh or sens_i != cache['sens_i']:
+                        commands.append(self.sens_string.format(sens_i))
+                        cache['sens_i'] = sens_i
+                    self.final_values['sens'] = sens[sens_i]
+                if not np.isnan(static['phase']):
+                    phase = round(float(static['phase']),6)
+                    if fresh or phase != cache['phase']:
+                        commands.append(self.phase_string.format(phase))
+                        cache['phase'] = phase
+                    self.final_values['phase'] = phase
+            if commands:
+                self.connection.write(';'.join(commands))
+                self.cache_store.save(self.smart_cache)
+        
+        self.capture = data['CAPTURE']
+        self.stream = data['STREAM']
+        if 'comp_settings' in data:
+            self.comp_settings = data['comp_settings']
+        if self.capture is not None:
+            self.trigger_time = data['trigger_time']
+            # arm after the time constant is set, since it limits the rate
+            self.connection.write(self.capture_config_string.format(
+                                    int(self.capture['config']),
+                                    int(self.capture['rate_exp']),
+                                    int(self.capture['length'])))
+            max_rate = float(self.connection.query(self.capture_max_rate_string))
+            self.capture_rate = max_rate/2**int(self.capture['rate_exp'])
+            self.connection.write(self.capture_start_string)
+        if self.stream is not None:
+            self.start_stream()
                 
         return self.final_values
         
+    def transition_to_manual(self,abort = False):
+        if abort:
+            if self.stream is not None:
+                self.stop_stream()
+                self.close_stream()
+            if self.capture is not None:
+                self.connection.write(self.capture_stop_string)
+                self.capture = None
+            return VISAWorker.transition_to_manual(self,abort)
+        
+        traces = {}
+        if self.stream is not None:
+            self.stop_stream()
+            traces.update(self.read_stream())
+            self.close_stream()
+        if self.capture is not None:
+            traces.update(self.read_capture())
+            self.capture = None
+        
+        # settings, data and timing record in a single write
+        with h5py.File(self.h5_file,'r+') as hdf5_file:
+            group = hdf5_file['/devices/'+self.device_name]
+            with self.profiler.phase('h5_write'):
+                group.attrs.create('sensitivity',self.final_values['sens'])
+                group.attrs.create('tau',self.final_values['tau'])
+                group.attrs.create('phase',round(self.final_values['phase'],6))
+                if traces:
+                    measurements = hdf5_file.require_group('/data/traces')
+                for label, (values, attrs) in traces.items():
+                    measurements.create_dataset(label,data=values,chunks=True,
+                                                **self.comp_settings)
+                    measurements[label].attrs.update(attrs)
+            self.profiler.save(group)
+        return True
+        
+    def to_trace(self,values,fields,rate):
+        '''Packs samples into a table with a time column.'''
+        dtypes = np.dtype({'names':['t']+list(fields),
+                           'formats':[np.float64]+[np.float32]*len(fields)})
+        data = np.empty(len(values),dtype=dtypes)
+        data['t'] = np.arange(len(values))/rate
+        for i, field in enumerate(fields):
+            data[field] = values[:,i]
+        return data
+        
+    def start_stream(self):
+        '''Opens a receiver sized for the requested stream, then starts 
+        the instrument streaming to it.'''
+        config = int(self.stream['config'])
+        rate_exp = int(self.stream['rate_exp'])
+        port = int(self.stream['port'])
+        self.connection.write(self.stream_config_string.format(config,
+                                self.stream_packet_code,rate_exp,port))
+        max_rate = float(self.connection.query(self.stream_max_rate_string))
+        self.stream_rate = max_rate/2**rate_exp
+        
+        packet_size = packet_sizes[self.stream_packet_code]
+        sample_size = 4*len(capture_fields[config])
+        nbytes = self.stream['duration']*self.stream_rate*sample_size
+        capacity = max(int(np.ceil(nbytes/packet_size)),1)
+        packet_rate = self.stream_rate*sample_size/packet_size
+        self.receiver = StreamReceiver(port,packet_size,capacity,packet_rate)
+        self.receiver.start()
+        self.stream_start = time.time()
+        self.connection.write(self.stream_on_string)
+        
+    def stop_stream(self):
+        '''Stops the instrument streaming and waits for the last packets.'''
+        self.connection.write(self.stream_off_string)
+        if self.receiver is not None:
+            self.receiver.stop()
+            
+    def close_stream(self):
+        if self.receiver is not None:
+            self.receiver.close()
+            self.receiver = None
+        self.stream = None
+        
+    def read_stream(self):
+        '''Unpacks the received stream.
+        Returns a dict of the trace and its attributes, keyed by label.'''
+        fields = capture_fields[int(self.stream['config'])]
+        values, lost = self.receiver.unpack(len(fields))
+        if lost:
+            print('{:s} stream lost {:d} packets'.format(self.VISA_name,lost))
+        if self.receiver.overflowed:
+            print('{:s} stream overran its buffer, last {:d} packets dropped'.format(
+                    self.VISA_name,self.receiver.overflowed))
+        if not len(values):
+            return {}
+        # stream_start is the wall clock time the stream was started
+        attrs = {'rate':self.stream_rate,'lost_packets':lost,
+                 'overflowed_packets':self.receiver.overflowed,
+                 'stream_start':self.stream_start}
+        label = self.stream['label'].decode('UTF-8')
+        return {label: (self.to_trace(values,fields,self.stream_rate),attrs)}
+        
+    def download_capture(self,nbytes):
+        '''Reads the start of the capture buffer in binary blocks.
+        Returns nbytes of data as an array of float32.'''
+        values = np.empty(nbytes//4,dtype=np.float32)
+        length = int(np.ceil(nbytes/1024))
+        # read whole blocks without pyvisa splitting them up
+        default_chunk = self.connection.chunk_size
+        self.connection.chunk_size = self.capture_block*1024 + 16
+        try:
+            for offset in range(0,length,self.capture_block):
+                size = min(self.capture_block,length-offset)
+                block = self.connection.query_binary_values(
+                            self.capture_get_string.format(offset,size),
+                            datatype='f',is_big_endian=False,container=np.array)
+                start = offset*256
+                n = min(len(block),len(values)-start)
+                values[start:start+n] = block[:n]
+        finally:
+            self.connection.chunk_size = default_chunk
+        return values
+        
+    def read_capture(self):
+        '''Waits for the capture to finish, then downloads the buffer.
+        Returns a dict of the trace and its attributes, keyed by label.'''
+        nbytes = int(self.capture['nbytes'])
+        deadline = time.monotonic() + self.capture_timeout
+        captured = int(self.connection.query(self.capture_bytes_string))
+        while captured < nbytes and time.monotonic() < deadline:
+            time.sleep(0.05)
+            captured = int(self.connection.query(self.capture_bytes_string))
+        self.connection.write(self.capture_stop_string)
+        if captured < nbytes:
+            print('{:s} capture incomplete: {:d} of {:d} bytes'.format(self.VISA_name,
+                                                                 captured,nbytes))
+            nbytes = captured
+        
+        fields = capture_fields[int(self.capture['config'])]
+        # keep whole samples only
+        nbytes -= nbytes % (4*len(fields))
+        if not nbytes:
+            return {}
+        values = self.download_capture(nbytes).reshape(-1,len(fields))
+        # time is relative to the trigger, as for scope traces
+        attrs = {'trigger_time':self.trigger_time,'rate':self.capture_rate}
+        label = self.capture['label'].decode('UTF-8')
+        return {label: (self.to_trace(values,fields,self.capture_rate),attrs)}
+        
+    def shutdown(self):
+        if self.receiver is not None:
+            self.stop_stream()
+            self.close_stream()
+        VISAWorker.shutdown(self)
+        
     def check_status(self):
         '''Queries device state using the ESR register.
         Bit definitions defined in blacs_tab'''
@@ -12,18 +12,16 @@
 import numpy as np
 
 from naqslab_devices.VISA.labscript_device import VISA
-from labscript import Device, AnalogOut, config, LabscriptError, set_passed_properties
+from labscript import Device, AnalogOut, Trigger, config, LabscriptError, set_passed_properties
+from labscript_utils import dedent
 
 __version__ = '0.1.1'
 __author__ = ['dihm']
 
-sens = np.array([1,500e-3,200e-3,100e-3,50e-3,20e-3,10e-3,5e-3,2e-3,1e-3,
-                    500e-6,200e-6,100e-6,50e-6,20e-6,10e-6,5e-6,2e-6,1e-6,
-                    500e-9,200e-9,100e-9,50e-9,20e-9,10e-9,5e-9,2e-9,1e-9])
-                    
-tau = np.array([1e-6,3e-6,10e-6,30e-6,100e-6,300e-6,
-                1e-3,3e-3,10e-3,30e-3,100e-3,300e-3,
-                1,3,10,30,100,300,1e3,3e3,10e3,30e3])
+# allowed settings, also imported from here by older scripts
+from naqslab_devices.SR865.settings import sens, tau
+from naqslab_devices.SR865.settings import capture_configs, capture_fields
+from naqslab_devices.SR865.settings import tau_code, sens_code
                      
 class SR865(VISA):
     description = 'SR865 Lock-In Amplifier'
@@ -33,36 +31,65 @@ class SR865(VISA):
     tau = None
     sens = None
     phase = None
+    # -1 leaves the setting unchanged
+    tau_i = -1
+    sens_i = -1
+    capture_settings = None
+    stream_settings = None
+    
+    # capture and stream rate with the shortest time constants, in Hz
+    max_capture_rate = 1.25e6
+    # CAPTURERATE and STREAMRATE divide the maximum rate by 2**n
+    max_rate_exponent = 20
+    # capture buffer size limits, in kB
+    min_capture_length = 1
+    max_capture_length = 4096
+    trigger_duration = 1e-3
 
-    @set_passed_properties()
-    def __init__(self, name, VISA_name):
-        '''VISA_name can be full VISA connection string or NI-MAX alias'''
+    @set_passed_properties(property_names = {
+        "device_properties":["compression","compression_opts","shuffle"]}
+        )
+    def __init__(self, name, VISA_name, trigger_device=None, trigger_connection=None,
+                 compression=None, compression_opts=None, shuffle=False):
+        '''VISA_name can be full VISA connection string or NI-MAX alias.
+        trigger_device and trigger_connection set the digital output wired to
+        the rear panel TRIG IN, needed to use the capture buffer.
+        Compression of captured data in h5 file controlled by:
+        compression: \'lzf\', \'gzip\', None 
+        compression_opts: 0-9 for gzip
+        shuffle: True/False '''
         # does not have a parent device
         VISA.__init__(self,name,None,VISA_name)
         
+        self.compression = compression
+        if (compression == 'gzip') and (compression_opts == None):
+            # set default compression level if needed
+            self.compression_opts = 4
+        else:
+            self.compression_opts = compression_opts
+        self.shuffle = shuffle
+        
+        if trigger_device is not None:
+            self.trigger_device = Trigger(self.name+'_trigger', trigger_device,
+                                          trigger_connection)
+        else:
+            self.trigger_device = None
+        
     def set_tau(self, tau_constant):
         '''Set the time constant in seconds.
-        Uses numpy digitize to translate to int values.
-        Using digitize corrects for round-off errors and coerces input to 
-        nearest allowed setting.'''
-        self.tau = tau_constant
-        # check that setting is valid
-        if tau_constant in tau:
-            self.tau_i = np.digitize(tau_constant,tau,right=True)
-        else:
-            raise LabscriptError('{:s}: tau cannot be set to {:f}'.format(self.VISA_name,self.tau))
+        Must match an allowed setting to within about 0.1%.'''
+        self.tau_i = tau_code(tau_constant)
+        if self.tau_i is None:
+            raise LabscriptError('{:s}: tau cannot be set to {:f}'.format(self.VISA_name,tau_constant))
+        self.tau = tau[self.tau_i]
         
     def set_sens(self, sensitivity):
-        '''Set the sensitivity in Volts
-        Uses numpy digitize to translate to int values.
-        Using digitize corrects for round-off errors and coerces input to
-        nearest allowed setting.'''
-        self.sens = sensitivity
-        # check that setting is valid
-        if sensitivity in sens:
-            self.sens_i = np.digitize(sensitivity,sens)
-        else:
-            raise LabscriptError('{:s}: sensitivity cannot be set to {:f}'.format(self.VISA_name,self.sens))
+        '''Set the sensitivity in Volts.
+        Must match an allowed setting to within about 0.1%.'''
+        self.sens_i = sens_code(sensitivity)
+        if self.sens_i is None:
+            raise LabscriptError('{:s}: sensitivity cannot be set to {:f}'.format(self.VISA_name,sensitivity))
+        self.sens = sens[self.sens_i]
             
     def set_phase(self, phase):
         '''Set the phase reference in degrees
@@ -70,38 +97,118 @@ class SR865(VISA):
         self.phase = phase
         
     
+    def check_config(self, config):
+        '''Returns the integer code of a capture or stream config.'''
+        if config not in capture_configs:
+            msg = '''{:s}: config must be one of {!s}, not {!s}'''
+            raise LabscriptError(dedent(msg.format(self.name,capture_configs,config)))
+        return capture_configs.index(config)
+        
+    def coerce_rate(self, rate):
+        '''Returns the rate exponent and sample rate for a requested rate.
+        The rate is coerced to the slowest available rate at or above it.'''
+        if rate is None:
+            rate = self.max_capture_rate
+        rate_exp = int(np.floor(np.log2(self.max_capture_rate/rate)))
+        rate_exp = min(max(rate_exp,0),self.max_rate_exponent)
+        return rate_exp, self.max_capture_rate/2**rate_exp
+    
+    def capture(self, label, start_time, duration, config='XY', rate=None):
+        '''Captures the lock-in outputs into the instrument buffer, starting
+        with a hardware trigger at start_time.
+        
+        The buffer is downloaded at the end of the shot and saved to
+        /data/traces/label. Only one capture per shot is supported.
+        
+        Args:
+            label (str): Name of the saved trace.
+            start_time (float): Time of the capture trigger, in seconds.
+            duration (float): Length of the capture, in seconds.
+            config (str, optional): Outputs to capture, one of 'X', 'XY',
+                'RT' or 'XYRT'.
+            rate (float, optional): Sample rate in Hz. Coerced to the slowest
+                available rate, the maximum divided by a power of 2, at or
+                above it. Defaults to the maximum rate.
+                
+        Note the instrument lowers its maximum capture rate for long time
+        constants. The capture then runs slower and lasts longer than
+        duration, which is truncated to what was captured by the end of
+        the shot.'''
+        if self.trigger_device is None:
+            msg = '''{:s}: a trigger_device and trigger_connection are
+                needed to capture data.'''
+            raise LabscriptError(dedent(msg.format(self.name)))
+        if self.capture_settings is not None:
+            raise LabscriptError('{:s}: only one capture per shot is supported'.format(self.name))
+        config_i = self.check_config(config)
+        rate_exp, rate = self.coerce_rate(rate)
+        
+        # each sample holds a 4 byte float per captured output
+        nbytes = int(np.ceil(duration*rate))*4*len(capture_fields[config_i])
+        length = int(np.ceil(nbytes/1024))
+        if not self.min_capture_length <= length <= self.max_capture_length:
+            msg = '''{:s}: capture of {:.6f} s at {:.1f} Hz needs {:d} kB,
+                the buffer holds {:d} kB.'''
+            raise LabscriptError(dedent(msg.format(self.name,duration,rate,
+                                        length,self.max_capture_length)))
+        
+        self.trigger_device.trigger(start_time,self.trigger_duration)
+        self.capture_settings = (label,config_i,rate_exp,length,nbytes)
+        self.trigger_time = start_time
+        
+    def stream(self, label, duration, config='XY', rate=None, port=1865):
+        '''Streams the lock-in outputs over UDP for the whole shot.
+        
+        For acquisitions longer than the capture buffer. The stream is
+        started when the shot is programmed and stopped at its end, so it is
+        not synchronised to the shot timing. It is saved to
+        /data/traces/label, with NaN in place of lost packets.
+        
+        Args:
+            label (str): Name of the saved trace.
+            duration (float): Longest expected stream, in seconds. Sets the
+                size of the receive buffer; data beyond it is dropped.
+            config (str, optional): Outputs to stream, one of 'X', 'XY',
+                'RT' or 'XYRT'.
+            rate (float, optional): Sample rate in Hz, coerced as for 
+                :obj:`capture`. Defaults to the maximum rate.
+            port (int, optional): UDP port the data is sent to.'''
+        if self.stream_settings is not None:
+            raise LabscriptError('{:s}: only one stream per shot is supported'.format(self.name))
+        config_i = self.check_config(config)
+        rate_exp, rate = self.coerce_rate(rate)
+        self.stream_settings = (label,config_i,rate_exp,duration,port)
+        
     def generate_code(self, hdf5_file):
         '''Generates the transition to buffered code in the h5 file.
-        If parameter is not specified in shot, NaN and -1 values are set
+        Tau and sensitivity are stored as their integer codes.
+        If parameter is not specified in shot, -1 and NaN values are set
         to tell worker not to change the value when programming.'''
         # type the static_table
-        static_dtypes = np.dtype({'names':['tau','tau_i','sens','sens_i','phase'],
-                            'formats':[np.float16,np.int8,np.float16,np.int8,np.float32]})
+        static_dtypes = np.dtype({'names':['tau_i','sens_i','phase'],
+                            'formats':[np.int8,np.int8,np.float32]})
         static_table = np.zeros(1,dtype=static_dtypes)
-        
-        # if tau is set, add tau value to table, else add NaN
-        if self.tau:
-            static_table['tau'] = self.tau
-            static_table['tau_i'] = self.tau_i
-        else:
-            static_table['tau'] = np.NaN
-            static_table['tau_i'] = -1
-        # if sensitivity is set, add sens to table, else add NaN
-        if self.sens:
-            static_table['sens'] = self.sens
-            static_table['sens_i'] = self.sens_i
-        else:
-            static_table['sens'] = np.NaN
-            static_table['sens_i'] = -1
+        static_table['tau_i'] = self.tau_i
+        static_table['sens_i'] = self.sens_i
         # if phase set, add to table, else NaN
-        if self.phase:
+        if self.phase is not None:
             static_table['phase'] = self.phase
         else:
-            static_table['phase'] = np.NaN
+            static_table['phase'] = np.nan
 
         grp = hdf5_file.create_group('/devices/'+self.name)
         grp.create_dataset('STATIC_DATA',compression=config.compression,data=static_table) 
+        if self.capture_settings is not None:
+            capture_dtypes = np.dtype({'names':['label','config','rate_exp','length','nbytes'],
+                                'formats':['a256',np.int8,np.int8,np.int16,np.int32]})
+            capture_table = np.array([self.capture_settings],dtype=capture_dtypes)
+            grp.create_dataset('CAPTURE',data=capture_table)
+            grp['CAPTURE'].attrs['trigger_time'] = self.trigger_time
+        if self.stream_settings is not None:
+            stream_dtypes = np.dtype({'names':['label','config','rate_exp','duration','port'],
+                                'formats':['a256',np.int8,np.int8,np.float64,np.uint16]})
+            grp.create_dataset('STREAM',data=np.array([self.stream_settings],dtype=stream_dtypes))
         # add these values to device properties for easy lookup
-        if self.tau: self.set_property('tau', self.tau, location='device_properties')
-        if self.sens: self.set_property('sensitivity', self.sens, location='device_properties')
-        if self.phase: self.set_property('phase',self.phase,location='device_properties')
+        if self.tau is not None: self.set_property('tau', self.tau, location='device_properties')
+        if self.sens is not None: self.set_property('sensitivity', self.sens, location='device_properties')
+        if self.phase is not None: self.set_property('phase',self.phase,location='device_properties')
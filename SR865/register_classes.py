@@ -15,4 +15,4 @@ import labscript_devices
 labscript_devices.register_classes(
     'SR865',
     BLACS_tab='naqslab_devices.SR865.blacs_tab.SR865Tab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SR865.runviewer_parser.SR865Parser')
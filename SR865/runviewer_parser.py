@@ -0,0 +1,38 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/SR865/runviewer_parser.py                        #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+import numpy as np
+
+from naqslab_devices.VISA.runviewer_parser import VISAParser
+from naqslab_devices.SR865.settings import sens, tau
+
+
+class SR865Parser(VISAParser):
+    """Shows the time constant, sensitivity and reference phase of the shot.
+
+    Settings the shot leaves unchanged are stored as -1 or NaN and not shown.
+    """
+    # setting: STATIC_DATA field holding its code and the allowed values
+    codes = {'tau': ('tau_i', tau), 'sens': ('sens_i', sens)}
+
+    def get_traces(self, add_trace, clock=None):
+        static_data, _, stop_time = self.get_static_data()
+        if static_data is None:
+            return {}
+        values = {'phase': static_data['phase']}
+        for setting, (field, allowed) in self.codes.items():
+            code = static_data[field]
+            values[setting] = allowed[code] if code != -1 else np.nan
+        for setting, value in values.items():
+            if not np.isnan(value):
+                add_trace('%s_%s' % (self.name, setting), self.step(value, stop_time),
+                          self.name, setting)
+        return {}
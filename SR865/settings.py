@@ -0,0 +1,58 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/SR865/settings.py                                #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Allowed SR865 sensitivity, time constant and capture settings.
+
+Indices into these arrays are the integer codes of the `SCAL` and `OFLT`
+commands; :func:`tau_code` and :func:`sens_code` look up the code of a
+value. Kept apart from the labscript device so that the BLACS worker does
+not need to import labscript.
+"""
+import numpy as np
+
+sens = np.array([1,500e-3,200e-3,100e-3,50e-3,20e-3,10e-3,5e-3,2e-3,1e-3,
+                    500e-6,200e-6,100e-6,50e-6,20e-6,10e-6,5e-6,2e-6,1e-6,
+                    500e-9,200e-9,100e-9,50e-9,20e-9,10e-9,5e-9,2e-9,1e-9])
+                    
+tau = np.array([1e-6,3e-6,10e-6,30e-6,100e-6,300e-6,
+                1e-3,3e-3,10e-3,30e-3,100e-3,300e-3,
+                1,3,10,30,100,300,1e3,3e3,10e3,30e3])
+
+# settings are matched on their log rounded to this many decimals,
+# a tolerance of about 0.1%
+_log_decimals = 3
+
+def _index(values):
+    return {round(float(np.log10(v)),_log_decimals): i for i, v in enumerate(values)}
+
+_tau_index = _index(tau)
+_sens_index = _index(sens)
+
+def _lookup(index, value):
+    if not value > 0:
+        return None
+    return index.get(round(float(np.log10(value)),_log_decimals))
+
+def tau_code(value):
+    '''Returns the OFLT code of a time constant in seconds, 
+    or None if it is not an allowed setting.'''
+    return _lookup(_tau_index, value)
+
+def sens_code(value):
+    '''Returns the SCAL code of a sensitivity in Volts, 
+    or None if it is not an allowed setting.'''
+    return _lookup(_sens_index, value)
+
+# capture buffer configurations, indexed by the `CAPTURECFG` code,
+# and the values stored per sample by each
+capture_configs = ('X', 'XY', 'RT', 'XYRT')
+capture_fields = (('X',), ('X','Y'), ('R','Theta'), ('X','Y','R','Theta'))
@@ -0,0 +1,187 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/SR865/streaming.py                               #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Receiver for the SR865 UDP data stream.
+
+With `STREAM ON` the instrument sends its outputs as UDP packets to the
+host that sent the command. Each packet holds a 4 byte big endian header,
+whose low byte counts packets modulo 256, followed by the samples as big
+endian float32.
+
+A :obj:`StreamReceiver` receives packets on a background thread directly
+into a preallocated buffer, one slot per packet, so no data is copied
+while the stream runs. Gaps in the packet count are filled with NaN when
+the data is unpacked.
+
+The 8 bit count alone cannot tell a gap of `n` packets from one of `n + 256`,
+so the receive time of each packet is kept as well. Given the packet rate,
+the time since the first packet bounds how many packets can have been sent,
+which resolves the whole multiples of 256 that were lost.
+"""
+import socket
+import threading
+import time
+
+import numpy as np
+
+# payload bytes per packet, indexed by the STREAMPCKT code
+packet_sizes = (1024, 512, 256, 128)
+header_size = 4
+
+
+class StreamReceiver(object):
+    """Receives SR865 stream packets into a buffer.
+
+    Once the buffer is full, further packets are dropped and counted in
+    `overflowed`, so the buffered data always starts with the stream.
+
+    Args:
+        port (int): UDP port to listen on, set on the instrument with
+            `STREAMPORT`.
+        packet_size (int): Payload bytes per packet, one of
+            :obj:`packet_sizes`.
+        capacity (int): Number of packets the buffer holds.
+        packet_rate (float, optional): Packets per second sent by the
+            instrument. Without it, lost runs of 256 or more packets
+            cannot be detected.
+        host (str, optional): Address to bind to. Defaults to all interfaces.
+    """
+
+    def __init__(self, port, packet_size, capacity, packet_rate=None, host=''):
+        if packet_size not in packet_sizes:
+            raise ValueError('packet_size must be one of {!s}'.format(packet_sizes))
+        self.packet_size = packet_size
+        self.slot_size = header_size + packet_size
+        self.capacity = int(capacity)
+        self.packet_rate = packet_rate
+        self._buffer = np.zeros(self.capacity*self.slot_size, dtype=np.uint8)
+        self._slots = memoryview(self._buffer)
+        # receive time of each buffered packet
+        self._times = np.zeros(self.capacity)
+        # spare slot that packets are received into once the buffer is full
+        self._spare = memoryview(bytearray(self.slot_size))
+        self.received = 0
+        # packets dropped because the buffer was full
+        self.overflowed = 0
+        # datagrams of the wrong size, e.g. from a different stream format
+        self.rejected = 0
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # room for bursts while the thread is not scheduled
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                min(self.capacity, 1024)*self.slot_size)
+        self._socket.bind((host, port))
+        self._socket.settimeout(0.1)
+        self.port = self._socket.getsockname()[1]
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Clears the buffer and starts receiving."""
+        self.received = 0
+        self.overflowed = 0
+        self.rejected = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._mainloop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops receiving, once any packets already queued are read."""
+        if self._thread is None:
+            return
+        self._running = False
+        self._thread.join()
+        self._thread = None
+
+    def close(self):
+        self.stop()
+        self._socket.close()
+
+    def _mainloop(self):
+        while True:
+            full = self.received == self.capacity
+            if full:
+                slot = self._spare
+            else:
+                start = self.received*self.slot_size
+                slot = self._slots[start:start+self.slot_size]
+            try:
+                nbytes = self._socket.recv_into(slot)
+            except socket.timeout:
+                if not self._running:
+                    break
+                continue
+            if nbytes != self.slot_size:
+                self.rejected += 1
+            elif full:
+                self.overflowed += 1
+            else:
+                self._times[self.received] = time.perf_counter()
+                self.received += 1
+
+    def packets(self):
+        """Returns the buffered packets, oldest first.
+
+        Returns:
+            :obj:`numpy:numpy.ndarray`: Array of shape (packets, slot size)
+            holding the raw packets.
+        """
+        slots = self._buffer.reshape(self.capacity, self.slot_size)
+        return slots[:self.received]
+
+    def packet_index(self):
+        """Returns the position of each buffered packet in the stream.
+
+        Each step in the 8 bit count is taken as the smallest gap it allows.
+        If the packet rate is known, the receive times then add the runs of
+        256 packets that must have been lost to account for the time between
+        packets. The receive time of a packet can lag its sending, e.g. when
+        the receiving thread is not scheduled, but the packets received
+        promptly after it bound its position from above.
+
+        Returns:
+            :obj:`numpy:numpy.ndarray`: Stream position of each packet,
+            counting from the first one received.
+        """
+        counter = self.packets()[:, header_size-1].astype(np.int64)
+        steps = (np.diff(counter) - 1) % 256 + 1
+        index = np.concatenate(([0], np.cumsum(steps)))
+        if self.packet_rate is None or len(index) < 2:
+            return index
+        elapsed = (self._times[:len(index)] - self._times[0])*self.packet_rate
+        # packets sent by each receive time, beyond the smallest position
+        surplus = np.minimum.accumulate((elapsed - index)[::-1])[::-1]
+        # allow half a count cycle of timing jitter either way
+        wraps = np.maximum(np.floor(surplus/256 + 0.5), 0).astype(np.int64)
+        return index + 256*wraps
+
+    def unpack(self, nvalues):
+        """Unpacks the buffered packets into samples.
+
+        Args:
+            nvalues (int): Number of values per sample, e.g. 2 for X and Y.
+
+        Returns:
+            tuple: Float32 array of shape (samples, `nvalues`), with rows
+            of NaN in place of lost packets, and the number of packets lost.
+        """
+        packets = self.packets()
+        if not len(packets):
+            return np.empty((0, nvalues), dtype=np.float32), 0
+        index = self.packet_index()
+        lost = int(index[-1] + 1 - len(packets))
+
+        per_packet = self.packet_size//4
+        values = np.full((index[-1] + 1, per_packet), np.nan, dtype=np.float32)
+        values[index] = packets[:, header_size:].copy().view('>f4')
+        return values.reshape(-1, nvalues), lost
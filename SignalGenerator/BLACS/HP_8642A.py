@@ -11,7 +11,7 @@
 #####################################################################
 from naqslab_devices.SignalGenerator.blacs_tab import SignalGeneratorTab
 from naqslab_devices.SignalGenerator.blacs_worker import SignalGeneratorWorker
-from labscript import LabscriptError
+from naqslab_devices import labscript_error
 import numpy as np
 
 
@@ -54,6 +54,8 @@ class HP_8642AWorker(SignalGeneratorWorker):
     # Writing: scale*desired_freq // Reading:desired_freq/scale
     scale_factor = 1.0e6
     amp_scale_factor = 1.0
+    # predates IEEE 488.2, so has no *IDN?
+    identity_query_string = ''
     
     # define instrument specific read and write strings for Freq & Amp control
     freq_write_string = 'FR {:.0f} HZ'  #HP8642A can only accept 10 digits, in Hz
@@ -76,19 +78,23 @@ class HP_8642AWorker(SignalGeneratorWorker):
         if amp == -201:
             return np.nan
         elif amp <= -200:
-            raise LabscriptError('HP8642A error code {:d} for VISA device: {:s}'.format(amp,self.VISA_name))
+            raise labscript_error('HP8642A error code {:d} for VISA device: {:s}'.format(amp,self.VISA_name))
         else:
             # No error on amp read
             return amp
     enable_write_string = enable_on_off_formatter('AP{:s}')
     enable_query_string = 'APOA'
+    # program codes can be chained in a single HP-IB message
+    batch_separator = ' '
+    # read-backs are slow, rely on measured settle times instead
+    verify_settle = True
     def enable_parser(self, enable_string):
         '''Query output status by checking for error codes.'''
         amp = float(enable_string.split()[1])
         if amp == -201:
             return False
         elif amp <= -200:
-            raise LabscriptError('HP8642A error code {:d} for VISA device: {:s}'.format(amp,self.VISA_name))
+            raise labscript_error('HP8642A error code {:d} for VISA device: {:s}'.format(amp,self.VISA_name))
         else:
             # No error on amp read, output enabled
             return True
\ No newline at end of file
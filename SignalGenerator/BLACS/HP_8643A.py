@@ -11,7 +11,7 @@
 #####################################################################
 from naqslab_devices.SignalGenerator.blacs_tab import SignalGeneratorTab
 from naqslab_devices.SignalGenerator.blacs_worker import SignalGeneratorWorker, enable_on_off_formatter
-from labscript import LabscriptError
+from naqslab_devices import labscript_error
 
 class HP_8643ATab(SignalGeneratorTab):
     # Capabilities
@@ -83,7 +83,7 @@ class HP_8643AWorker(SignalGeneratorWorker):
                 err_string = 'Event Status Register: {0:d}'.format(esr)
             
             msg = 'HP 8643A device {0:s} has \n{1:s}'
-            raise LabscriptError(dedent(msg.format(self.VISA_name,err_string))) 
+            raise labscript_error(dedent(msg.format(self.VISA_name,err_string))) 
         
         # note: HP 8643A has 16 bits in ESR, 
         # so need to ensure future use bits not present when passed
@@ -11,7 +11,7 @@
 #####################################################################
 from naqslab_devices.SignalGenerator.blacs_tab import SignalGeneratorTab
 from naqslab_devices.SignalGenerator.blacs_worker import SignalGeneratorWorker, enable_on_off_formatter
-from labscript import LabscriptError
+from naqslab_devices import labscript_error
 from labscript_utils import dedent
 
 class HP_8648ATab(SignalGeneratorTab):
@@ -59,15 +59,12 @@ class HP_8648Worker(SignalGeneratorWorker):
     def init(self):
         '''Calls parent init and sends device specific initialization commands'''        
         SignalGeneratorWorker.init(self)
-        try:
-            ident_string = self.connection.query('*IDN?')
-        except:
-            msg = '\'*IDN?\' command did not complete. Is %s connected?'
-            raise LabscriptError(dedent(msg%self.VISA_name)) from None
+        # the *IDN? response was read by the parent init
+        ident_string = self.cache_store.identity
         
         if '8648' not in ident_string:
             msg = '%s is not supported by the HP_8648 class.'
-            raise LabscriptError(dedent(msg%ident_string))
+            raise labscript_error(dedent(msg%ident_string))
         
         # enables ESR status reading
         self.connection.write('*ESE 60;*SRE 32;*CLS')
@@ -91,6 +88,8 @@ class HP_8648Worker(SignalGeneratorWorker):
         return float(amp_string)
     enable_write_string = enable_on_off_formatter('OUTP:STAT {:s}')
     enable_query_string = 'OUTP:STAT?'
+    batch_separator = ';:'
+    verify_settle = True
     def enable_parser(self,enable_string):
         '''Output Enable Query for HP 8648.'''
         return 'ON' in enable_string
@@ -109,7 +108,7 @@ class HP_8648Worker(SignalGeneratorWorker):
                 err_string = 'Event Status Register: {0:d}'.format(esr)
 
             msg = '{0:s} has \n{1:s}'
-            raise LabscriptError(dedent(msg.format(self.VISA_name,err_string))) 
+            raise labscript_error(dedent(msg.format(self.VISA_name,err_string))) 
         
         return self.convert_register(esr)
 
@@ -13,7 +13,9 @@ from naqslab_devices.SignalGenerator.blacs_tab import SignalGeneratorTab
 from naqslab_devices.SignalGenerator.blacs_worker import SignalGeneratorWorker
 
 from labscript_utils import check_version, dedent
-from labscript import LabscriptError
+from naqslab_devices import labscript_error
+
+from pyvisa.util import to_ieee_block
 
 # need this version to ensure labscript device properties are auto-passed to worker
 check_version('blacs','2.8.0','4')
@@ -46,6 +48,10 @@ class KeysightSigGenTab(SignalGeneratorTab):
 
 
 class E8257NTab(KeysightSigGenTab):
+    def __init__(self,*args,**kwargs):
+        self.device_worker_class = E8257NWorker
+        SignalGeneratorTab.__init__(self,*args,**kwargs)
+
     # Capabilities
     base_units = {'freq':'GHz', 'amp':'dBm'}
     base_min = {'freq':0.010,   'amp':-105}
@@ -71,14 +77,9 @@ class KeysightSigGenWorker(SignalGeneratorWorker):
     def init(self):
         '''Calls parent init and sends device specific initialization commands'''        
         SignalGeneratorWorker.init(self)
-        try:
-            ident_string = self.connection.query('*IDN?')
-        except:
-            msg = '\'*IDN?\' command did not complete. Is %s connected?'
-            raise LabscriptError(dedent(msg%self.VISA_name)) from None
         
         # log which device connected to worker terminal
-        print('Connected to \n',ident_string)
+        print('Connected to \n',self.cache_store.identity)
         
         # enables ESR status reading
         self.connection.write('*ESE 60;*SRE 32;*CLS')
@@ -102,6 +103,14 @@ class KeysightSigGenWorker(SignalGeneratorWorker):
         return float(amp_string)
     enable_write_string = 'OUTP:STAT {:d}'
     enable_query_string = 'OUTP:STAT?'
+    batch_separator = ';:'
+    # list sweep, values in Hz and dBm, one point per external trigger
+    list_freq_write_string = 'LIST:TYPE LIST;:LIST:FREQ {:s}'
+    list_amp_write_string = 'LIST:POW {:s}'
+    list_start_string = ('LIST:TRIG:SOUR EXT;:TRIG:SOUR IMM;'
+                         ':FREQ:MODE LIST;:POW:MODE LIST;:INIT')
+    list_stop_string = 'FREQ:MODE CW;:POW:MODE FIX'
+    list_length_query_string = 'LIST:FREQ:POIN?'
         
     def check_status(self):
         # no real info in stb use esr instead
@@ -117,7 +126,38 @@ class KeysightSigGenWorker(SignalGeneratorWorker):
                 err_string = 'Event Status Register: {0:d}'.format(esr)
 
             msg = '{0:s} has \n{1:s}'
-            raise LabscriptError(dedent(msg.format(self.VISA_name,err_string))) 
+            raise labscript_error(dedent(msg.format(self.VISA_name,err_string))) 
         
         return self.convert_register(esr)
 
+
+
+class E8257NWorker(KeysightSigGenWorker):
+    """BLACS worker for the Keysight E8257N PSG.
+
+    Both lists of a list sweep are sent in a single transfer, as ASCII
+    values with the data format set explicitly. Set `list_binary` to send
+    them as IEEE 488.2 binary blocks of big-endian 64 bit reals instead,
+    on firmware that accepts binary blocks for `LIST:FREQ` and `LIST:POW`.
+    """
+    list_binary = False
+    list_header = 'LIST:TYPE LIST;:FORM:DATA ASC'
+    list_binary_header = 'LIST:TYPE LIST;:FORM:DATA REAL,64;:FORM:BORD NORM'
+    # restores ASCII replies to queries after a binary upload
+    list_binary_footer = ';:FORM:DATA ASC'
+
+    def program_list(self, list_data):
+        if self.list_binary:
+            header, footer = self.list_binary_header, self.list_binary_footer
+            freqs = to_ieee_block(list_data['freq'].astype(float), 'd', True)
+            amps = to_ieee_block(list_data['amp'].astype(float), 'd', True)
+        else:
+            header, footer = self.list_header, ''
+            freqs = ','.join(self.list_freq_format.format(int(f))
+                             for f in list_data['freq']).encode()
+            amps = ','.join(self.list_amp_format.format(a)
+                            for a in list_data['amp']).encode()
+        message = (header.encode() + b';:LIST:FREQ ' + freqs +
+                   b';:LIST:POW ' + amps + footer.encode() +
+                   self.connection.write_termination.encode())
+        self.connection.write_raw(message)
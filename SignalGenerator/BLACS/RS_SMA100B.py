@@ -11,7 +11,7 @@
 #####################################################################
 from naqslab_devices.SignalGenerator.blacs_tab import SignalGeneratorTab
 from naqslab_devices.SignalGenerator.blacs_worker import SignalGeneratorWorker
-from labscript import LabscriptError      
+from naqslab_devices import labscript_error
 
 
 class RS_SMA100BTab(SignalGeneratorTab):
@@ -58,6 +58,13 @@ class RS_SMA100BWorker(SignalGeneratorWorker):
         return float(amp_string)
     enable_write_string = 'OUTP:STAT {:d}' # take a bool value
     enable_query_string = 'OUTP:STAT?' # returns 0 or 1
+    batch_separator = ';:' # joined SCPI commands
+    # list mode, values in Hz and dBm, one point per external trigger
+    list_freq_write_string = 'LIST:SEL "naqslab";:LIST:FREQ {:s}'
+    list_amp_write_string = 'LIST:POW {:s}'
+    list_start_string = 'LIST:MODE STEP;:LIST:TRIG:SOUR EXT;:LIST:RES;:FREQ:MODE LIST'
+    list_stop_string = 'FREQ:MODE CW'
+    list_length_query_string = 'LIST:FREQ:POIN?'
         
     def check_status(self):
         # call parent method to read status byte register
@@ -65,6 +72,6 @@ class RS_SMA100BWorker(SignalGeneratorWorker):
         # do some device specific error handling with status byte information
         if results['bit 2'] == True:
             errors = self.connection.query('SYST:ERR:ALL?')
-            raise LabscriptError('SMA100B VISA device {:s} has Errors in Queue: \n{:s}'.format(self.VISA_name,errors))
+            raise labscript_error('SMA100B VISA device {:s} has Errors in Queue: \n{:s}'.format(self.VISA_name,errors))
             
         return results
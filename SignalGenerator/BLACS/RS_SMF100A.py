@@ -11,7 +11,7 @@
 #####################################################################
 from naqslab_devices.SignalGenerator.blacs_tab import SignalGeneratorTab
 from naqslab_devices.SignalGenerator.blacs_worker import SignalGeneratorWorker
-from labscript import LabscriptError      
+from naqslab_devices import labscript_error
         
 class RS_SMF100ATab(SignalGeneratorTab):
     # Capabilities
@@ -56,6 +56,13 @@ class RS_SMF100AWorker(SignalGeneratorWorker):
         return float(amp_string)
     enable_write_string = 'OUTP:STAT {:d}' # take a bool value
     enable_query_string = 'OUTP:STAT?' # returns 0 or 1
+    batch_separator = ';:'
+    # list mode, values in Hz and dBm, one point per external trigger
+    list_freq_write_string = 'LIST:SEL "naqslab";:LIST:FREQ {:s}'
+    list_amp_write_string = 'LIST:POW {:s}'
+    list_start_string = 'LIST:MODE STEP;:LIST:TRIG:SOUR EXT;:LIST:RES;:FREQ:MODE LIST'
+    list_stop_string = 'FREQ:MODE CW'
+    list_length_query_string = 'LIST:FREQ:POIN?'
         
     def check_status(self):
         # call parent method to read status byte register
@@ -63,6 +70,6 @@ class RS_SMF100AWorker(SignalGeneratorWorker):
         # do some device specific error handling with status byte information
         if results['bit 2'] == True:
             errors = self.connection.query('SYST:ERR:ALL?')
-            raise LabscriptError('SMF100A VISA device {:s} has Errors in Queue: \n{:s}'.format(self.VISA_name,errors))
+            raise labscript_error('SMF100A VISA device {:s} has Errors in Queue: \n{:s}'.format(self.VISA_name,errors))
             
         return results
@@ -11,7 +11,7 @@
 #####################################################################
 from naqslab_devices.SignalGenerator.blacs_tab import SignalGeneratorTab
 from naqslab_devices.SignalGenerator.blacs_worker import SignalGeneratorWorker, enable_on_off_formatter
-from labscript import LabscriptError
+from naqslab_devices import labscript_error
 from labscript_utils import dedent
 
 
@@ -54,7 +54,7 @@ class RS_SMHUWorker(SignalGeneratorWorker):
             self.connection.write('HEADER:OFF;*ESE 60;*SRE 32;*CLS')
         except:
             msg = 'Initial command to %s did not succeed. Is it connected?'   
-            raise LabscriptError(dedent(msg%self.VISA_name)) from None
+            raise labscript_error(dedent(msg%self.VISA_name)) from None
         self.esr_mask = 60
     
     # define instrument specific read and write strings for Freq & Amp control
@@ -72,7 +72,7 @@ class RS_SMHUWorker(SignalGeneratorWorker):
         amp_string format is sddd.d
         Returns float in instrument units, dBm'''
         if amp_string == '\n':
-            raise LabscriptError('RS SMHU device {0:s} has RF OFF!'.format(self.VISA_name))
+            raise labscript_error('RS SMHU device {0:s} has RF OFF!'.format(self.VISA_name))
         return float(amp_string)
     enable_write_string = enable_on_off_formatter('LEV:RF {:s}')
     enable_query_string = 'LEV:RF?'
@@ -93,7 +93,7 @@ class RS_SMHUWorker(SignalGeneratorWorker):
             if err_string.endswith('0'):
                 err_string = 'Event Status Register: {0:d}'.format(esr)
             else:
-                raise LabscriptError('RS SMHU device {0:s} has \n{1:s}'.format(self.VISA_name,err_string)) 
+                raise labscript_error('RS SMHU device {0:s} has \n{1:s}'.format(self.VISA_name,err_string)) 
         
         # note: SMHU has 9 bits in ESR, 
         # so need to ensure last bit (Sweep End) not present when passed
@@ -12,7 +12,7 @@
 from naqslab_devices.SignalGenerator.blacs_tab import SignalGeneratorTab
 from naqslab_devices.SignalGenerator.blacs_worker import SignalGeneratorWorker
 from naqslab_devices.VISA.blacs_worker import VISAWorker
-from labscript import LabscriptError
+from naqslab_devices import labscript_error
 from labscript_utils import dedent
 
 
@@ -46,23 +46,34 @@ class SRS_SG380Tab(SignalGeneratorTab):
         self.amp_limits = conn_props.get('amp_limits',None)
         self.amp_scale_factor = conn_props.get('amp_scale_factor',1)
         self.output = conn_props.get('output','RF')
-        
-        # use labscript_device defined freq limits to set BLACS Tab limits
-        # need to convert from scaled unit to do so
-        self.base_min = {'freq':self.freq_limits[0]/self.scale_factor, 
-                         'amp':self.amp_limits[0]/self.amp_scale_factor}
-                            
-        self.base_max = {'freq':self.freq_limits[1]/self.scale_factor,
-                               'amp':self.amp_limits[1]/self.amp_scale_factor}
+        if isinstance(self.output, str):
+            self.output = [self.output]
+        self.num_outputs = len(self.output)
+        # older connection tables only define the limits of a single output
+        self.output_freq_limits = conn_props.get('output_freq_limits',[self.freq_limits])
+        self.output_amp_limits = conn_props.get('output_amp_limits',[self.amp_limits])
         
         # send properties to worker
         self.worker_init_kwargs = {'output':self.output}
         
         # call parent to finish initialisation of GUI
         SignalGeneratorTab.initialise_GUI(self)
+        
+    def output_limits(self, output):
+        # use labscript_device defined limits to set BLACS Tab limits
+        # need to convert from scaled unit to do so
+        freq_limits = self.output_freq_limits[output]
+        amp_limits = self.output_amp_limits[output]
+        base_min = {'freq':freq_limits[0]/self.scale_factor, 
+                    'amp':amp_limits[0]/self.amp_scale_factor}
+        base_max = {'freq':freq_limits[1]/self.scale_factor,
+                    'amp':amp_limits[1]/self.amp_scale_factor}
+        return base_min, base_max
 
 
 class SRS_SG380Worker(SignalGeneratorWorker):
+    # commands are separated by semicolons, without SCPI path resets
+    batch_separator = ';'
     
     def init(self):
         '''Calls parent init and sends device specific initialization commands'''        
@@ -72,11 +83,11 @@ class SRS_SG380Worker(SignalGeneratorWorker):
             ident_string = self.connection.query('*IDN?')
         except Exception:
             msg = '\'*IDN?\' command did not complete. Is %s connected?'
-            raise LabscriptError(dedent(msg%self.VISA_name)) from None
+            raise labscript_error(dedent(msg%self.VISA_name)) from None
         
         if 'SG38' not in ident_string:
             msg = '%s is not supported by the SRS_SG380 class.'
-            raise LabscriptError(dedent(msg%ident_string))
+            raise labscript_error(dedent(msg%ident_string))
         
         # log which device connected to worker terminal
         print('Connected to \n', ident_string)
@@ -86,21 +97,64 @@ class SRS_SG380Worker(SignalGeneratorWorker):
         self.esr_mask = 60
     
         # define instrument specific read and write strings for Freq & Amp control
-        # may need to extend to other two outputs
+        # frequency is shared by all outputs
         self.freq_write_string = 'FREQ {:.6f} HZ' # in Hz
         self.freq_query_string = 'FREQ?' #SRS_SG380 returns float, in Hz
         
-        # define amplitude string based on which output is selected
+        # amplitude and enable strings depend on which outputs are selected
+        if isinstance(self.output, str):
+            self.output = [self.output]
+        self.num_outputs = len(self.output)
         self.amp_outputs = {'DC':'L','RF':'R','Doubled_RF':'H'}
-        self.amp_write_string = 'AMP'+self.amp_outputs[self.output]+'{:.2f}' # in dBm
-        self.amp_query_string = 'AMP'+self.amp_outputs[self.output]+'? ' # in dBm
-        # define correct output enable command strings
-        self.enable_write_string = 'ENB'+self.amp_outputs[self.output]+'{:1d}'
-        self.enable_query_string = 'ENB'+self.amp_outputs[self.output]+'?'
+        self.amp_write_strings = ['AMP'+self.amp_outputs[out]+'{:.2f}' for out in self.output] # in dBm
+        self.amp_query_strings = ['AMP'+self.amp_outputs[out]+'? ' for out in self.output] # in dBm
+        self.enable_write_strings = ['ENB'+self.amp_outputs[out]+'{:1d}' for out in self.output]
+        self.enable_query_strings = ['ENB'+self.amp_outputs[out]+'?' for out in self.output]
+        
+        # list states advance on each rear panel trigger
+        self.list_start_string = 'LSTI 0;LSTE 1'
+        self.list_stop_string = 'LSTE 0'
         
         # initialize sig-gen now that write/query strings are defined
         SignalGeneratorWorker.init(self)
     
+    def write_strings(self, chan):
+        return (self.freq_write_string, self.amp_write_strings[chan],
+                self.enable_write_strings[chan])
+    
+    def query_strings(self, chan):
+        return (self.freq_query_string, self.amp_query_strings[chan],
+                self.enable_query_strings[chan])
+    
+    # position of each output's amplitude in an LSTP state string
+    list_amp_fields = {'DC':2,'RF':4,'Doubled_RF':13}
+    
+    # states sent per write during a list upload
+    list_states_per_write = 50
+    
+    def program_list(self, list_data):
+        '''Stores the list as SG380 list states.
+        
+        The states are uploaded in bulk, several per write, rather than
+        one write per state. Parameters not set by the list are left 
+        unchanged with 'N'.'''
+        created = self.connection.query('LSTD;LSTC? {:d}'.format(len(list_data)))
+        if int(created) != 1:
+            msg = '%s could not allocate a list of %d states.'
+            raise labscript_error(dedent(msg%(self.VISA_name,len(list_data))))
+        
+        # list amplitudes apply to the output on channel 0
+        amp_field = self.list_amp_fields[self.output[0]]
+        states = []
+        for i, (freq, amp) in enumerate(list_data):
+            state = ['N']*15
+            state[0] = '{:.6f}'.format(freq)
+            state[amp_field] = '{:.2f}'.format(amp)
+            states.append('LSTP {:d},{:s}'.format(i,','.join(state)))
+        n = self.list_states_per_write
+        for i in range(0, len(states), n):
+            self.connection.write(';'.join(states[i:i+n]))
+    
     def freq_parser(self,freq_string):
         '''Frequency Query string parser for SRS_SG380
         freq_string format is float, in Hz
@@ -128,6 +182,6 @@ class SRS_SG380Worker(SignalGeneratorWorker):
                 else:
                     break
             msg = '{0:s} has errors\n	{1:}'
-            raise LabscriptError(dedent(msg.format(self.VISA_name,err_list))) 
+            raise labscript_error(dedent(msg.format(self.VISA_name,err_list))) 
         
         return self.convert_register(esr)
@@ -9,8 +9,10 @@
 #                                                                   #
 #                                                                   #
 #####################################################################
+import numpy as np
+
 from naqslab_devices.SignalGenerator.labscript_device import SignalGenerator
-from labscript import set_passed_properties, LabscriptError
+from labscript import set_passed_properties, LabscriptError, Trigger, config
 from labscript_utils import dedent
 
 __version__ = '0.1.0'
@@ -24,6 +26,9 @@ class RS_SMF100A(SignalGenerator):
     freq_limits = (100e3, 22e9) # set in scaled unit (Hz)
     amp_scale_factor = 1.0 # ensure that the BLACS worker class has same amp_scale_factor
     amp_limits = (-26, 18) # set in scaled unit (dBm) 
+    # hardware list mode, stepped by external trigger
+    supports_list_mode = True
+    max_list_points = 10000
     
 class RS_SMA100B(SignalGenerator):
     description = 'Rhode & Schwarz SMA100B Signal Generator'
@@ -33,6 +38,9 @@ class RS_SMA100B(SignalGenerator):
     freq_limits = (8e3, 20e9) # set in scaled unit (Hz)
     amp_scale_factor = 1.0 # ensure that the BLACS worker class has same amp_scale_factor
     amp_limits = (-145, 35) # set in scaled unit (dBm) 
+    # hardware list mode, stepped by external trigger
+    supports_list_mode = True
+    max_list_points = 10000
     
 class RS_SMHU(SignalGenerator):
     description = 'RS SMHU Signal Generator'
@@ -121,6 +129,9 @@ class E8257N(SignalGenerator):
     freq_limits = (10e6, 40e9) # set in scaled unit (Hz)
     amp_scale_factor = 1.0 # ensure that the BLACS worker class has same amp_scale_factor
     amp_limits = (-105, 20) # set in scaled unit (dBm)
+    # hardware list sweep, stepped by external trigger
+    supports_list_mode = True
+    max_list_points = 1601
     # Output limits depend heavily on frequency
     
 class SRS_SG380(SignalGenerator):
@@ -133,13 +144,21 @@ class SRS_SG380(SignalGenerator):
     amp_scale_factor = 1.0 # ensure that the BLACS worker class has same amp_scale_factor
     # define variable limit
     RF_freq_max = 0
+    # list of stored states, stepped by rear panel trigger
+    supports_list_mode = True
+    max_list_points = 2000
+    # all outputs are driven by the same synthesizer
+    common_frequency = True
+    # width of the pulse that advances the list on the rear panel trigger input
+    trigger_duration = 1e-6
     
     @set_passed_properties(property_names = {
         'connection_table_properties': ['output','freq_limits','amp_limits',
-                                       ]
+                                        'output_freq_limits','output_amp_limits']
         })
-    def __init__(self, name, VISA_name, output='RF'):
-        """Saves the user specified output to use and saves for reading by
+    def __init__(self, name, VISA_name, output='RF', trigger_device=None,
+                 trigger_connection=None):
+        """Saves the user specified outputs to use and saves for reading by
         BLACS_Tab.
         
         Specific models of this series subclass this class.
@@ -147,8 +166,15 @@ class SRS_SG380(SignalGenerator):
         Args:
             name (str): variable name to create labscript_device under
             VISA_name (str): the VISA connection string to the physical device
-            output (str): Selects which output of the SG380 to use. Options are
-                    'DC', 'RF', and 'Doubled_RF'. Defaults to 'RF'.
+            output (str or list): Selects which outputs of the SG380 to use. 
+                    Options are 'DC', 'RF', and 'Doubled_RF'. A list of outputs
+                    connects them to 'channel 0', 'channel 1', etc. in order.
+                    Defaults to 'RF'.
+            trigger_device (:obj:`labscript:labscript.IntermediateDevice`, optional):
+                    Device with a digital output connected to the rear panel
+                    trigger input. Required by :meth:`hop`.
+            trigger_connection (str, optional): Connection of the trigger
+                    on `trigger_device`.
         """
         # set in scaled unit (Hz)
         freq_capabilities = {'DC': (0,62.5e6),
@@ -160,18 +186,97 @@ class SRS_SG380(SignalGenerator):
                          'RF': (-110,16.5), # high depends on frequency
                          'Doubled_RF': (-10,16.5)} # high depends on frequency
         
-        if output in self.outputs:
-            self.output = output
-            self.freq_limits = freq_capabilities[output]
-            self.amp_limits = amp_capabilities[output]
-        else:
-            msg = f'''{output} is not a valid output option.
-            Please select from {self.outputs}
-            '''
-            raise LabscriptError(dedent(msg))
+        outputs = [output] if isinstance(output, str) else list(output)
+        for out in outputs:
+            if out not in self.outputs or outputs.count(out) > 1:
+                msg = f'''{out} is not a valid output option.
+                Please select each output once from {self.outputs}
+                '''
+                raise LabscriptError(dedent(msg))
+        if not outputs:
+            raise LabscriptError(f'{name} must use at least one output.')
+        
+        self.output = output
+        self.allowed_chans = list(range(len(outputs)))
+        self.output_freq_limits = [freq_capabilities[out] for out in outputs]
+        self.output_amp_limits = [amp_capabilities[out] for out in outputs]
+        # limits of channel 0, also used for list mode
+        self.freq_limits = self.output_freq_limits[0]
+        self.amp_limits = self.output_amp_limits[0]
         
         # finish initialization with parent __init__
         SignalGenerator.__init__(self,name,VISA_name)
+        
+        if trigger_device is not None:
+            self.trigger = Trigger(self.name+'_trigger', trigger_device,
+                                   trigger_connection)
+        else:
+            self.trigger = None
+        # (time, frequency, amplitude) of each hop, in base units
+        self.hops = []
+        
+    def hop(self, t, frequency, amplitude=None):
+        """Step the output on 'channel 0' to a new state at time `t`.
+        
+        The states are compiled into the list memory of the instrument and
+        uploaded before the shot. Each hop is then a single trigger pulse,
+        so no communication is needed during the shot. The shot starts in
+        the static state of 'channel 0'.
+        
+        Args:
+            t (float): Time of the hop, in seconds.
+            frequency (float): New frequency, in the base units of the output.
+            amplitude (float, optional): New amplitude, in base units.
+                Defaults to the amplitude of the previous state.
+        """
+        if self.trigger is None:
+            msg = '''{:s} {:s} needs a trigger_device and trigger_connection
+                to hop between states.'''
+            raise LabscriptError(dedent(msg.format(self.description,self.name)))
+        if self.list_freqs is not None:
+            raise LabscriptError(f'{self.name} cannot use both set_list and hop.')
+        if len(self.hops) + 2 > self.max_list_points:
+            msg = '''{:s} {:s} can store at most {:d} states,
+                including the initial state.'''
+            raise LabscriptError(dedent(msg.format(self.description,self.name,
+                                                   self.max_list_points)))
+        self.trigger.trigger(t, self.trigger_duration)
+        self.hops.append((t, frequency, amplitude))
+        
+    def bounds_key(self):
+        return tuple(self.output_freq_limits + self.output_amp_limits)
+    
+    def get_freq_limits(self, channel=0):
+        return self.output_freq_limits[channel]
+    
+    def get_amp_limits(self, channel=0):
+        return self.output_amp_limits[channel]
+    
+    def generate_code(self, hdf5_file):
+        if self.hops and self.list_freqs is not None:
+            raise LabscriptError(f'{self.name} cannot use both set_list and hop.')
+        SignalGenerator.generate_code(self, hdf5_file)
+        if not self.hops:
+            return
+        static_row = hdf5_file['/devices/'+self.name+'/STATIC_DATA'][0]
+        if 'freq0' not in static_row.dtype.names:
+            raise LabscriptError(f'{self.name} must have an output on channel 0 to hop.')
+        
+        # state 0 is the static state, loaded when the list is armed
+        hops = sorted(self.hops, key=lambda hop: hop[0])
+        freqs, _ = self.quantise_freq(np.array([hop[1] for hop in hops]), self)
+        amps = [static_row['amp0']/self.amp_scale_factor]
+        for hop in hops:
+            amps.append(amps[-1] if hop[2] is None else hop[2])
+        amps, _ = self.quantise_amp(np.array(amps[1:]), self)
+        
+        list_dtypes = np.dtype({'names':['freq','amp'],'formats':[np.uint64,np.float32]})
+        list_table = np.zeros(len(hops)+1, dtype=list_dtypes)
+        list_table[0] = (static_row['freq0'], static_row['amp0'])
+        list_table['freq'][1:] = freqs
+        list_table['amp'][1:] = amps
+        hdf5_file['/devices/'+self.name].create_dataset('LIST_DATA',
+                                compression=config.compression,data=list_table)
 
 class SRS_SG382(SRS_SG380):
     description = 'Stanford Research Systems SG382 Signal Generator'
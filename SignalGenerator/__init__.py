@@ -10,13 +10,13 @@
 # the project for the full license.                                 #
 #                                                                   #
 #####################################################################
-from labscript_devices import deprecated_import_alias
+from naqslab_devices import lazy_deprecated_aliases
 
-# For backwards compatibility with old experiment scripts:
-RS_SMF100A = deprecated_import_alias("naqslab_devices.SignalGenerator.Models.RS_SMF100A")
-
-RS_SMHU = deprecated_import_alias("naqslab_devices.SignalGenerator.Models.RS_SMHU")
 
-HP8643A = deprecated_import_alias("naqslab_devices.SignalGenerator.Models.HP8643A")
-
-HP8642A = deprecated_import_alias("naqslab_devices.SignalGenerator.Models.HP8642A")
+# For backwards compatibility with old experiment scripts:
+__getattr__ = lazy_deprecated_aliases(__name__, {
+    'RS_SMF100A': 'naqslab_devices.SignalGenerator.Models.RS_SMF100A',
+    'RS_SMHU': 'naqslab_devices.SignalGenerator.Models.RS_SMHU',
+    'HP8643A': 'naqslab_devices.SignalGenerator.Models.HP8643A',
+    'HP8642A': 'naqslab_devices.SignalGenerator.Models.HP8642A'
+    })
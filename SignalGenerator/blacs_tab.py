@@ -24,6 +24,8 @@ class SignalGeneratorTab(VISATab):
     base_max = {'freq':1057.5,  'amp':20}
     base_step = {'freq':1,    'amp':0.1}
     base_decimals = {'freq':6, 'amp':1}
+    # number of outputs, named 'channel 0', 'channel 1', etc.
+    num_outputs = 1
 
     status_byte_labels = {'bit 7':'bit 7 label', 
                           'bit 6':'bit 6 label',
@@ -41,18 +43,20 @@ class SignalGeneratorTab(VISATab):
         VISATab.__init__(self,*args,**kwargs)
 
     def initialise_GUI(self):
-        # Create the dds channel
+        # Create the dds channels
         dds_prop = {}
-        dds_prop['channel 0'] = {} #HP signal generators only have one output
-        for subchnl in ['freq', 'amp']:
-            dds_prop['channel 0'][subchnl] = {'base_unit':self.base_units[subchnl],
-                                              'min':self.base_min[subchnl],
-                                              'max':self.base_max[subchnl],
-                                              'step':self.base_step[subchnl],
-                                              'decimals':self.base_decimals[subchnl]
-                                              }
-        dds_prop['channel 0']['gate'] = {}
-
+        for i in range(self.num_outputs):
+            chan = 'channel %d'%i
+            base_min, base_max = self.output_limits(i)
+            dds_prop[chan] = {}
+            for subchnl in ['freq', 'amp']:
+                dds_prop[chan][subchnl] = {'base_unit':self.base_units[subchnl],
+                                           'min':base_min[subchnl],
+                                           'max':base_max[subchnl],
+                                           'step':self.base_step[subchnl],
+                                           'decimals':self.base_decimals[subchnl]
+                                           }
+            dds_prop[chan]['gate'] = {}
 
         # Create the output objects
         self.create_dds_outputs(dds_prop)
@@ -69,3 +73,9 @@ class SignalGeneratorTab(VISATab):
         self.supports_remote_value_check(True)
         self.supports_smart_programming(True)
         self.statemachine_timeout_add(10000, self.status_monitor)
+
+    def output_limits(self, output):
+        """Returns the `base_min` and `base_max` dictionaries of an output.
+
+        Over-ride for devices whose outputs have different limits."""
+        return self.base_min, self.base_max
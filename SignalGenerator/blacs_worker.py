@@ -9,10 +9,15 @@
 #                                                                   #
 #                                                                   #
 #####################################################################
+import time
+
 import numpy as np
 
 from naqslab_devices.VISA.blacs_worker import VISAWorker
-from labscript import LabscriptError 
+from naqslab_devices.smart_cache_store import SmartCacheStore
+from naqslab_devices.instrumentation import ShotProfiler
+from naqslab_devices import labscript_error
+from labscript_utils import dedent
 
 import labscript_utils.h5_lock, h5py
 
@@ -36,6 +41,34 @@ class enable_on_off_formatter(str):
         return super().format(s)
 
 
+class SettleTimeModel(object):
+    """Measured time for output parameters to settle after being written.
+
+    Args:
+        measurements (dict, optional): Previously measured settle times,
+            in seconds, keyed by parameter name. Updated in place.
+        calibration_count (int, optional): Number of measurements needed
+            before a parameter is considered calibrated.
+        margin (float, optional): Factor applied to the longest measured
+            settle time.
+    """
+
+    def __init__(self, measurements=None, calibration_count=3, margin=1.5):
+        self.measurements = measurements if measurements is not None else {}
+        self.calibration_count = calibration_count
+        self.margin = margin
+
+    def calibrated(self, param):
+        return len(self.measurements.get(param, [])) >= self.calibration_count
+
+    def record(self, param, settle_time):
+        self.measurements.setdefault(param, []).append(settle_time)
+
+    def wait_time(self, param):
+        """Time to wait after writing `param`, in seconds."""
+        return self.margin*max(self.measurements[param])
+
+
 class SignalGeneratorWorker(VISAWorker):    
 
     # define instrument specific read and write strings for Freq & Amp control
@@ -73,6 +106,32 @@ class SignalGeneratorWorker(VISAWorker):
         return amp
     enable_write_string = ''
     enable_query_string = ''
+    # hardware list mode command strings, left empty if unsupported
+    # list values are formatted with list_freq_format/list_amp_format and
+    # joined with commas before being inserted into the write strings
+    list_freq_write_string = ''
+    list_freq_format = '{:d}'
+    list_amp_write_string = ''
+    list_amp_format = '{:.2f}'
+    list_start_string = ''
+    list_stop_string = ''
+    # query for the number of points in the list, used to check that a list
+    # saved in a previous session is still loaded, empty if unsupported
+    list_length_query_string = ''
+    # query identifying the instrument, empty if unsupported
+    identity_query_string = '*IDN?'
+    # number of outputs, named 'channel 0', 'channel 1', etc.
+    num_outputs = 1
+    # joins commands that are sent in a single write, empty to send separately
+    batch_separator = ''
+    # wait for writes to settle using a measured SettleTimeModel
+    # instead of reading back the new values
+    verify_settle = False
+    settle_timeout = 5.0
+    # time between read-backs while waiting for values to settle
+    settle_poll_interval = 0.01
+    # output parameters, in the order of write_strings and query_strings
+    output_params = ('freq', 'amp', 'gate')
     def enable_parser(self,enable_string):
         '''Output Enable Query string parser.
 
@@ -93,104 +152,378 @@ class SignalGeneratorWorker(VISAWorker):
 
         for chan, d in front_panel.items():
             chan_n = chan.split(' ')[-1]
-            self.smart_cache['STATIC_DATA']['freq'+chan_n] = d['freq']*self.scale_factor
+            self.smart_cache['STATIC_DATA']['freq'+chan_n] = round(d['freq']*self.scale_factor)
             self.smart_cache['STATIC_DATA']['amp'+chan_n] = d['amp']*self.amp_scale_factor
             self.smart_cache['STATIC_DATA']['gate'+chan_n] = d['gate']
 
+    def write_strings(self, chan):
+        '''Frequency, amplitude and enable write strings of an output.
+
+        Over-ride for instruments with more than one output.'''
+        return self.freq_write_string, self.amp_write_string, self.enable_write_string
+
+    def query_strings(self, chan):
+        '''Frequency, amplitude and enable query strings of an output.
+
+        Over-ride for instruments with more than one output.'''
+        return self.freq_query_string, self.amp_query_string, self.enable_query_string
+
+    def write_batch(self, commands):
+        '''Sends a list of commands, joined into a single write if supported.
+
+        Repeated commands, e.g. for a frequency shared by all outputs,
+        are only sent once.'''
+        commands = list(dict.fromkeys(commands))
+        if not commands:
+            return
+        if self.batch_separator:
+            self.connection.write(self.batch_separator.join(commands))
+        else:
+            for command in commands:
+                self.connection.write(command)
+
     def init(self):
         # Call the VISA init to initialise the VISA connection
         VISAWorker.init(self)
 
         # initialize the smart cache
-        static_dtypes = np.dtype({'names':['freq0','amp0','gate0'],
-                                  'formats':[np.uint64,np.float16,bool]})
-        self.smart_cache = {'STATIC_DATA': np.zeros(1, dtype=static_dtypes)[0]}
+        names = []
+        formats = []
+        for i in range(self.num_outputs):
+            names += ['freq%d'%i,'amp%d'%i,'gate%d'%i]
+            formats += [np.uint64,np.float16,bool]
+        static_dtypes = np.dtype({'names':names,'formats':formats})
+        self.smart_cache = {'STATIC_DATA': np.zeros(1, dtype=static_dtypes)[0],
+                            'LIST_DATA': None}
+        self.list_armed = False
+
+        # restore the state of the last session if the instrument still holds
+        # it, otherwise read the static state back from the instrument
+        self.cache_store = SmartCacheStore(self.device_name, self.read_identity())
+        saved = self.cache_store.load()
+        if not self.saved_list_valid(saved.get('LIST_DATA')):
+            saved.pop('LIST_DATA', None)
+        if not self.saved_static_valid(saved.get('STATIC_DATA')):
+            saved.pop('STATIC_DATA', None)
+            current_state = self.check_remote_values()
+            self.update_cache_from_dict(current_state)
+        self.smart_cache.update(saved)
+
+        # settle times measured in previous sessions are restored too
+        if self.verify_settle:
+            self.smart_cache.setdefault('SETTLE_TIMES', {})
+            self.settle_model = SettleTimeModel(self.smart_cache['SETTLE_TIMES'])
+        else:
+            self.settle_model = None
+
+    def read_identity(self):
+        '''Identity of the instrument, which keys the persistent smart cache.
+
+        Falls back to the worker class and VISA address if the instrument
+        has no `identity_query_string`.'''
+        if not self.identity_query_string:
+            return '{:s} {:s}'.format(type(self).__name__, self.VISA_name)
+        try:
+            return self.connection.query(self.identity_query_string).strip()
+        except:
+            msg = '\'{:s}\' command did not complete. Is {:s} connected?'
+            raise labscript_error(dedent(msg.format(self.identity_query_string,
+                                                    self.VISA_name))) from None
+
+    def saved_static_valid(self, static_data):
+        '''Checks a STATIC_DATA row saved in a previous session.
+
+        The saved state is only trusted for instruments with an identity
+        query, and if the frequency of the first output still matches.'''
+        if static_data is None or not self.identity_query_string:
+            return False
+        if static_data.dtype != self.smart_cache['STATIC_DATA'].dtype:
+            return False
+        return self.output_settled(0, 0, static_data['freq0'], {})
+
+    def saved_list_valid(self, list_data):
+        '''Checks a LIST_DATA table saved in a previous session.
+
+        The instrument must still report a list of the same length. Lists
+        are not trusted for instruments without a `list_length_query_string`.'''
+        if list_data is None:
+            return True
+        if not (self.identity_query_string and self.list_length_query_string):
+            return False
+        length = self.connection.query(self.list_length_query_string)
+        return int(float(length)) == len(list_data)
+
+    def save_smart_cache(self):
+        '''Saves the smart cache entries needed to restore the state of the instrument'''
+        entries = {'STATIC_DATA': self.smart_cache['STATIC_DATA'],
+                   'LIST_DATA': self.smart_cache['LIST_DATA']}
+        if self.settle_model is not None:
+            entries['SETTLE_TIMES'] = self.settle_model.measurements
+        self.cache_store.save(entries)
+
+    def read_output(self, chan, k, responses):
+        '''Queries one parameter of an output, in instrument units.
 
-        # set static smart cache to current state
-        current_state = self.check_remote_values()
-        self.update_cache_from_dict(current_state)
+        Args:
+            chan (int): Output number.
+            k (int): Index of the parameter in `output_params`.
+            responses (dict): Responses already received, so queries
+                shared by several parameters are only sent once.
+        '''
+        query = self.query_strings(chan)[k]
+        if query not in responses:
+            responses[query] = self.connection.query(query)
+        # these query strings and parsers depend heavily on device
+        parser = (self.freq_parser, self.amp_parser, self.enable_parser)[k]
+        return parser(responses[query])
 
-    def check_remote_values(self):
-        # Get the currently output values:
+    def check_remote_values(self, touched=None):
+        '''Get the currently output values.
 
-        results = {'channel 0':{}}
+        Args:
+            touched (dict, optional): Maps output numbers to the parameters
+                to query. Other parameters are taken from the smart cache.
+                Defaults to querying everything.
+        '''
+        results = {}
+        responses = {}
+        cache = self.smart_cache['STATIC_DATA']
+        for i in range(self.num_outputs):
+            params = self.output_params if touched is None else touched.get(i, ())
+            values = []
+            for k, param in enumerate(self.output_params):
+                if param in params:
+                    values.append(self.read_output(i, k, responses))
+                else:
+                    values.append(cache[param+str(i)])
+
+            # Convert to base units:
+            results['channel %d'%i] = {'freq':float(values[0])/self.scale_factor,
+                                       'amp':float(values[1])/self.amp_scale_factor,
+                                       'gate':bool(values[2])}
 
-        # these query strings and parsers depend heavily on device
-        freq = self.connection.query(self.freq_query_string)
-        amp = self.connection.query(self.amp_query_string)
-        enable = self.connection.query(self.enable_query_string)
+        return results
 
-        # Convert string to MHz:
-        results['channel 0']['freq'] = self.freq_parser(freq)/self.scale_factor
+    def output_values(self, static_row, chans):
+        '''Splits a STATIC_DATA row into arrays of output values.
 
-        results['channel 0']['amp'] = self.amp_parser(amp)/self.amp_scale_factor
+        Args:
+            static_row (:obj:`numpy:numpy.void`): STATIC_DATA row.
+            chans (list): Outputs to extract.
 
-        results['channel 0']['gate'] = self.enable_parser(enable)
+        Returns:
+            tuple: Frequency, amplitude and gate arrays, indexed like `chans`.
+        '''
+        freqs = np.array([static_row['freq%d'%i] for i in chans], dtype=np.uint64)
+        amps = np.array([static_row['amp%d'%i] for i in chans], dtype=np.float16)
+        gates = np.array([static_row['gate%d'%i] for i in chans], dtype=bool)
+        return freqs, amps, gates
 
-        return results
+    def program_outputs(self, chans, values, changed):
+        '''Writes the changed values of each output in a single batch.
 
-    def program_manual(self,front_panel_values):
-        freq = front_panel_values['channel 0']['freq']
-        amp = front_panel_values['channel 0']['amp']
-        enable = front_panel_values['channel 0']['gate']
+        Args:
+            chans (list): Outputs being programmed.
+            values (tuple): Frequency, amplitude and gate arrays in
+                instrument units.
+            changed (tuple): Boolean arrays flagging which values to write.
+        '''
+        commands = []
+        for j, i in enumerate(chans):
+            freq_write, amp_write, enable_write = self.write_strings(i)
+            if changed[0][j]:
+                commands.append(freq_write.format(values[0][j]))
+            if changed[1][j]:
+                commands.append(amp_write.format(values[1][j]))
+            if changed[2][j]:
+                commands.append(enable_write.format(values[2][j]))
+        self.write_batch(commands)
+        if commands and self.settle_model is not None:
+            self.settle(chans, values, changed)
+
+    def output_settled(self, chan, k, target, responses):
+        '''Checks if the instrument reports the target value of a parameter'''
+        value = self.read_output(chan, k, responses)
+        if k == 0:
+            # within 1 Hz
+            return abs(value - float(target)) < 1
+        elif k == 1:
+            # amplitude cannot be read with the output off
+            return np.isnan(value) or abs(value - float(target)) < 0.06
+        else:
+            return bool(value) == bool(target)
 
-        # program with scale factor
-        fcommand = self.freq_write_string.format(freq*self.scale_factor)
-        self.connection.write(fcommand)
+    def settle(self, chans, values, changed):
+        '''Waits for written values to settle.
 
-        # program with scale factor
-        acommand = self.amp_write_string.format(amp*self.amp_scale_factor)
-        self.connection.write(acommand)
+        Parameters without a calibrated settle time are polled every
+        `settle_poll_interval` until the instrument reports the new value,
+        and the time taken is recorded
+        in the settle time model. Calibrated parameters wait for the
+        modelled time without querying the instrument.
+        '''
+        t0 = time.perf_counter()
+        wait = 0.0
+        pending = {}
+        for k, param in enumerate(self.output_params):
+            if not np.any(changed[k]):
+                continue
+            if self.settle_model.calibrated(param):
+                wait = max(wait, self.settle_model.wait_time(param))
+            else:
+                pending[k] = [(i, values[k][j]) for j, i in enumerate(chans) if changed[k][j]]
+
+        measured = bool(pending)
+        while pending:
+            responses = {}
+            settled = [k for k in pending if all(self.output_settled(i, k, target, responses)
+                                                 for i, target in pending[k])]
+            elapsed = time.perf_counter() - t0
+            for k in settled:
+                self.settle_model.record(self.output_params[k], elapsed)
+                del pending[k]
+            if pending and elapsed > self.settle_timeout:
+                msg = '''{:s} did not settle to the programmed {!s}
+                within {:.1f} s.'''
+                params = [self.output_params[k] for k in pending]
+                raise labscript_error(dedent(msg.format(self.VISA_name,params,
+                                                       self.settle_timeout)))
+            if pending:
+                time.sleep(self.settle_poll_interval)
+        if measured:
+            self.save_smart_cache()
+
+        remaining = wait - (time.perf_counter() - t0)
+        if remaining > 0:
+            time.sleep(remaining)
 
-        # set output state
-        ecommand = self.enable_write_string.format(enable)
-        self.connection.write(ecommand)
+    def program_manual(self,front_panel_values):
+        chans = [int(chan.split(' ')[-1]) for chan in front_panel_values]
+        freqs = np.array([front_panel_values['channel %d'%i]['freq'] for i in chans])
+        amps = np.array([front_panel_values['channel %d'%i]['amp'] for i in chans])
+        gates = np.array([front_panel_values['channel %d'%i]['gate'] for i in chans], dtype=bool)
+        # with scale factor
+        values = (freqs*self.scale_factor, amps*self.amp_scale_factor, gates)
+
+        # only program values that have changed
+        current = self.output_values(self.smart_cache['STATIC_DATA'], chans)
+        changed = (np.round(values[0]) != current[0],
+                   values[1].astype(np.float16) != current[1],
+                   values[2] != current[2])
+        self.program_outputs(chans, values, changed)
 
         # update smart_cache after manual update
-        updated_state = self.check_remote_values()
+        if self.settle_model is not None:
+            # new values were verified or given time to settle
+            self.update_cache_from_dict(front_panel_values)
+            self.save_smart_cache()
+            return self.check_remote_values(touched={})
+        # only read back the parameters that were written
+        touched = {i: [p for k, p in enumerate(self.output_params) if changed[k][j]]
+                   for j, i in enumerate(chans)}
+        updated_state = self.check_remote_values(touched)
         self.update_cache_from_dict(updated_state)
+        self.save_smart_cache()
 
-        return self.check_remote_values()
+        return updated_state
 
-    def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
-        # call parent method to do basic preamble
-        VISAWorker.transition_to_buffered(self,device_name,h5file,initial_values,fresh)
-        data = None
-        # Program static values
-        with h5py.File(h5file,'r') as hdf5_file:
-            group = hdf5_file['/devices/'+device_name]
-            # If there are values to set the unbuffered outputs to, set them now:
-            if 'STATIC_DATA' in group:
-                data = group['STATIC_DATA'][0]
+    def program_list(self, list_data):
+        """Uploads a frequency/amplitude list to the instrument.
 
-        if data is not None:
-
-            if fresh or data != self.smart_cache['STATIC_DATA']:
+        Over-ride if the instrument does not accept the whole list
+        in a single command per parameter.
 
-                # program freq and amplitude as necessary
-                if data['freq0'] != self.smart_cache['STATIC_DATA']['freq0']:
-                    self.connection.write(self.freq_write_string.format(data['freq0']))
-                if data['amp0'] != self.smart_cache['STATIC_DATA']['amp0']:
-                    self.connection.write(self.amp_write_string.format(data['amp0']))
-                if data['gate0'] != self.smart_cache['STATIC_DATA']['gate0']:
-                    self.connection.write(self.enable_write_string.format(data['gate0']))
-
-                # update smart_cache
-                self.smart_cache['STATIC_DATA'] = data
+        Args:
+            list_data (:obj:`numpy:numpy.ndarray`): LIST_DATA table with
+                `freq` and `amp` fields in instrument units.
+        """
+        freqs = ','.join(self.list_freq_format.format(int(f)) for f in list_data['freq'])
+        amps = ','.join(self.list_amp_format.format(a) for a in list_data['amp'])
+        self.connection.write(self.list_freq_write_string.format(freqs))
+        self.connection.write(self.list_amp_write_string.format(amps))
 
-                # Save these values into final_values so the GUI can
-                # be updated at the end of the run to reflect them:
-                final_values = {'channel 0':{}}
+    def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
+        # call parent method to do basic preamble
+        VISAWorker.transition_to_buffered(self,device_name,h5file,initial_values,fresh)
+        with self.profiler.phase('h5_read'):
+            with h5py.File(h5file,'r') as hdf5_file:
+                shot_data = self.read_static_data(hdf5_file['/devices/'+device_name])
 
-                final_values['channel 0']['freq'] = data['freq0']/self.scale_factor
-                final_values['channel 0']['amp'] = data['amp0']/self.amp_scale_factor
-                final_values['channel 0']['gate'] = data['gate0']
+        return self.program_static_data(shot_data,fresh)
 
-            else:
-                final_values = self.initial_values
+    def read_static_data(self, group):
+        '''Reads STATIC_DATA and LIST_DATA, if present, from the device group'''
+        data = None
+        list_data = None
+        # If there are values to set the unbuffered outputs to, set them now:
+        if 'STATIC_DATA' in group:
+            data = group['STATIC_DATA'][0]
+        if 'LIST_DATA' in group:
+            list_data = group['LIST_DATA'][:]
+
+        return data, list_data
+
+    def program_static_data(self, shot_data, fresh):
+        data, list_data = shot_data
+        final_values = self.initial_values
+        if data is not None:
+            cache = self.smart_cache['STATIC_DATA']
+            # outputs that are used in the shot
+            chans = [int(name[4:]) for name in data.dtype.names if name.startswith('freq')]
+            values = self.output_values(data, chans)
+
+            # program freq, amplitude and output state as necessary
+            with self.profiler.phase('diff'):
+                if fresh:
+                    changed = (np.ones(len(chans), dtype=bool),)*3
+                else:
+                    current = self.output_values(cache, chans)
+                    changed = tuple(new != old for new, old in zip(values, current))
+            self.program_outputs(chans, values, changed)
+
+            # update smart_cache
+            for name in data.dtype.names:
+                cache[name] = data[name]
+
+            # Save these values into final_values so the GUI can
+            # be updated at the end of the run to reflect them:
+            final_values = {}
+            for j, i in enumerate(chans):
+                final_values['channel %d'%i] = {'freq':values[0][j]/self.scale_factor,
+                                                'amp':values[1][j]/self.amp_scale_factor,
+                                                'gate':values[2][j]}
+
+        if list_data is not None:
+            if not self.list_start_string:
+                msg = '''{:s} does not support list mode,
+                but LIST_DATA was found in the shot file.'''
+                raise labscript_error(dedent(msg.format(self.VISA_name)))
+
+            # only upload the list if it has changed
+            cached_list = self.smart_cache['LIST_DATA']
+            with self.profiler.phase('diff'):
+                upload = (fresh or cached_list is None or
+                          not np.array_equal(list_data, cached_list))
+            if upload:
+                self.program_list(list_data)
+                self.smart_cache['LIST_DATA'] = list_data
+                self.save_smart_cache()
+
+            # arm the list to step on external triggers
+            self.connection.write(self.list_start_string)
+            self.list_armed = True
 
         return final_values
 
+    def transition_to_manual(self,abort = False):
+        # return to CW operation if a list was armed this shot
+        if self.list_armed:
+            self.connection.write(self.list_stop_string)
+            self.list_armed = False
+        # save the static state programmed for the shot
+        self.save_smart_cache()
+        return VISAWorker.transition_to_manual(self,abort)
+
 
 class MockSignalGeneratorWorker(SignalGeneratorWorker):
     """Mock Signal Generator Class
@@ -202,6 +535,8 @@ class MockSignalGeneratorWorker(SignalGeneratorWorker):
     def init(self):
         # initialize the smart cache
         self.smart_cache = {'STATIC_DATA': {'freq0':0,'amp0':1,'gate0':False}}
+        self.list_armed = False
+        self.profiler = ShotProfiler(enabled=False)
 
     def check_remote_values(self):
         return {'channel 0':self.smart_cache['STATIC_DATA']}
@@ -218,6 +553,9 @@ class MockSignalGeneratorWorker(SignalGeneratorWorker):
     def transition_to_buffered(self,device_name,h5file,initial_values,fresh):
         VISAWorker.transition_to_buffered(self,device_name,h5file,initial_values,fresh)
 
+    def save_smart_cache(self):
+        pass
+
     def clear(self,value):
         pass
 
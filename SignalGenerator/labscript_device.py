@@ -25,6 +25,9 @@ __author__ = ['dihm']
 # in the BLACS subfolder. Update register_classes.py and __init__.py
 # accordingly.
 
+# bounds tables shared by all devices of the same model and configuration
+_bounds_tables = {}
+
 
 class SignalGenerator(VISA):
     description = 'Signal Generator'
@@ -36,6 +39,11 @@ class SignalGenerator(VISA):
     freq_limits = (0,1) # set in scaled unit
     amp_scale_factor = 1.0 # ensure that the BLACS worker class has same amp_scale_factor
     amp_limits = (0,1) # set in scaled unit
+    # hardware list mode capabilities, over-ride in Models.py if supported
+    supports_list_mode = False
+    max_list_points = 0
+    # set if all outputs share a single frequency setting
+    common_frequency = False
 
     @set_passed_properties(property_names = {'connection_table_properties':
             ['scale_factor','amp_scale_factor']})
@@ -46,31 +54,90 @@ class SignalGenerator(VISA):
 
         # set that contains which channels are enabled for each run
         self.enabled_chans = set()
+        # frequency/amplitude list to step through on external triggers
+        self.list_freqs = None
+        self.list_amps = None
+
+    def get_freq_limits(self, channel=0):
+        """Frequency limits of an output, in scaled units.
+
+        Over-ride for devices with more than one output."""
+        return self.freq_limits
+
+    def get_amp_limits(self, channel=0):
+        """Amplitude limits of an output, in scaled units.
+
+        Over-ride for devices with more than one output."""
+        return self.amp_limits
+
+    def bounds_key(self):
+        """Hashable description of the output configuration that sets the limits.
+
+        Over-ride if the limits depend on instance configuration."""
+        return None
+
+    def bounds_table(self):
+        """Precomputed frequency and amplitude bounds of every output.
 
-    def quantise_freq(self,data, device):
+        Computed once per model class and output configuration.
+
+        Returns:
+            dict: Maps channel to (freq_min, freq_max, amp_min, amp_max), in
+            scaled units.
+        """
+        key = (type(self), self.bounds_key())
+        table = _bounds_tables.get(key)
+        if table is None:
+            table = {i: (*self.get_freq_limits(i), *self.get_amp_limits(i))
+                     for i in self.allowed_chans}
+            _bounds_tables[key] = table
+        return table
+
+    def quantise_static(self, dds, channel=0):
+        """Quantise the static frequency and amplitude of an output.
+
+        Scalar counterpart of :meth:`quantise_freq` and :meth:`quantise_amp`
+        that skips timeseries expansion of the static quantities.
+
+        Returns:
+            tuple: Frequency in Hz and amplitude in dBm, in instrument units.
+        """
+        freq_min, freq_max, amp_min, amp_max = self.bounds_table()[channel]
+        freq = int(self.scale_factor*dds.frequency.static_value + 0.5)
+        amp = np.float16(self.amp_scale_factor*dds.amplitude.static_value)
+        if not freq_min <= freq <= freq_max:
+            # raises with the standard message
+            self.quantise_freq(np.array([dds.frequency.static_value]), dds, channel)
+        if not amp_min <= amp <= amp_max:
+            self.quantise_amp(np.array([dds.amplitude.static_value]), dds, channel)
+        return freq, amp
+
+    def quantise_freq(self,data, device, channel=0):
         '''Quantize the frequency in units of Hz and check it's within bounds'''
         # It's faster to add 0.5 then typecast than to round to integers first (device is programmed in Hz):    
         data = np.array((self.scale_factor*data)+0.5, dtype=np.uint64)
+        freq_limits = self.get_freq_limits(channel)
 
         # Ensure that frequencies are within bounds:
-        if any(data < self.freq_limits[0] )  or any(data > self.freq_limits[1] ):
+        if any(data < freq_limits[0] )  or any(data > freq_limits[1] ):
             msg = '''{:s} {:s} can only have frequencies between 
                 {:E}Hz and {:E}Hz, {} given'''.format(device.description, 
-                                        device.name, *self.freq_limits,
+                                        device.name, *freq_limits,
                                         data)
             raise LabscriptError(dedent(msg))
         return data, self.scale_factor
 
-    def quantise_amp(self,data, device):
+    def quantise_amp(self,data, device, channel=0):
         '''Quantize the amplitude in units of dBm and check it's within bounds'''
         # Keep as float since programming often done down to 0.1dBm (device is programmed in dBm):                       
         data = np.array((self.amp_scale_factor*data), dtype=np.float16)
+        amp_limits = self.get_amp_limits(channel)
 
         # Ensure that amplitudes are within bounds:        
-        if any(data < self.amp_limits[0] )  or any(data > self.amp_limits[1] ):
+        if any(data < amp_limits[0] )  or any(data > amp_limits[1] ):
             msg = '''{:s} {:s} can only have amplitudes between 
                 {:.1f} dBm and {:.1f} dBm, {} given'''.format(device.description, 
-                                                device.name,*self.amp_limits,
+                                                device.name,*amp_limits,
                                                 data)
             raise LabscriptError(dedent(msg))
         return data, self.amp_scale_factor
@@ -89,48 +156,91 @@ class SignalGenerator(VISA):
             if channel not in self.enabled_chans:
                 self.enabled_chans.add(channel)
         else:
-            raise LabscriptError(f'Channel {channel} is not a valid option for {self.device.name}')
+            raise LabscriptError(f'Channel {channel} is not a valid option for {self.name}')
+
+    def set_list(self, frequencies, amplitudes):
+        """Program a frequency/amplitude list to step through during the shot.
+
+        The list is uploaded to the instrument once (and only re-uploaded when
+        it changes). The instrument then advances one point for every
+        external trigger it receives, which must be supplied by the user.
+
+        Args:
+            frequencies (array_like): List frequencies, in the base units
+                of the output.
+            amplitudes (array_like or float): List amplitudes, in base units.
+                A scalar is used for every point.
+        """
+        if not self.supports_list_mode:
+            raise LabscriptError(f'{self.description} {self.name} does not support list mode.')
+        frequencies = np.atleast_1d(np.asarray(frequencies, dtype=float))
+        amplitudes = np.asarray(amplitudes, dtype=float)
+        if amplitudes.ndim == 0:
+            amplitudes = np.full(frequencies.shape, amplitudes)
+        if frequencies.ndim != 1 or frequencies.shape != amplitudes.shape:
+            msg = '''{:s} {:s} list frequencies and amplitudes must be
+                one dimensional and of equal length.'''
+            raise LabscriptError(dedent(msg.format(self.description,self.name)))
+        if not 2 <= len(frequencies) <= self.max_list_points:
+            msg = '''{:s} {:s} lists must have between 2 and {:d} points,
+                {:d} given.'''
+            raise LabscriptError(dedent(msg.format(self.description,self.name,
+                                        self.max_list_points,len(frequencies))))
+        self.list_freqs, _ = self.quantise_freq(frequencies, self)
+        self.list_amps, _ = self.quantise_amp(amplitudes, self)
 
     def generate_code(self, hdf5_file):
         if not len(self.child_devices):
             print(f'No outputs attached to {self.name:s}')
             return
+        outputs = {}
         for output in self.child_devices:
             try:
                 prefix, channel = output.connection.split()
                 channel = int(channel)
             except:
                 msg = '''{:s} {:s} has invalid connection string: \'{!s}\'.
-                Format must be \'channel n\' with n equal 0.'''
+                Format must be \'channel n\' with n in {!s}.'''
                 raise LabscriptError(dedent(msg.format(output.description,
-                                            output.name,output.connection)))
-            if channel != 0:
+                                            output.name,output.connection,
+                                            self.allowed_chans)))
+            if channel not in self.allowed_chans or channel in outputs:
                 msg = '''{:s} {:s} has invalid connection string: \'{!s}\'.
-                Format must be \'channel n\' with n equal 0.'''
+                Format must be \'channel n\' with n in {!s}, each used once.'''
                 raise LabscriptError(dedent(msg.format(output.description,
-                                            output.name,output.connection)))
-            dds = output
-        # Call these functions to finalise stuff:
-        ignore = dds.frequency.get_change_times()
-        dds.frequency.make_timeseries([])
-        dds.frequency.expand_timeseries()
-
-        ignore = dds.amplitude.get_change_times()
-        dds.amplitude.make_timeseries([])
-        dds.amplitude.expand_timeseries()
-
-        dds.frequency.raw_output, dds.frequency.scale_factor = self.quantise_freq(dds.frequency.raw_output, dds)
-        dds.amplitude.raw_output, dds.amplitude.scale_factor = self.quantise_amp(dds.amplitude.raw_output, dds)
-        static_dtypes = np.dtype({'names':['freq0','amp0','gate0'],'formats':[np.uint64,np.float16,bool]})
-        static_table = np.zeros(1, dtype=static_dtypes)
-        static_table['freq0'].fill(1)
-        static_table['freq0'] = dds.frequency.raw_output[0]
-        static_table['amp0'].fill(1)
-        static_table['amp0'] = dds.amplitude.raw_output[0]
-        static_table['gate0'].fill(0)
-        static_table['gate0'] = 0 in self.enabled_chans # returns True if channel 0 enabled
+                                            output.name,output.connection,
+                                            self.allowed_chans)))
+            outputs[channel] = output
+
+        # one row holding the static values of every attached output
+        chans = sorted(outputs)
+        names = []
+        formats = []
+        for i in chans:
+            names += ['freq%d'%i,'amp%d'%i,'gate%d'%i]
+            formats += [np.uint64,np.float16,bool]
+        static_dtypes = np.dtype({'names':names,'formats':formats})
+        row = []
+        for i in chans:
+            freq, amp = self.quantise_static(outputs[i], i)
+            row += [freq, amp, i in self.enabled_chans] # True if channel enabled
+        static_table = np.array([tuple(row)], dtype=static_dtypes)
+
+        if self.common_frequency:
+            freqs = [static_table['freq%d'%i][0] for i in chans]
+            if len(set(freqs)) > 1:
+                msg = '''{:s} {:s} outputs share a single frequency setting,
+                but {!s} Hz were requested.'''
+                raise LabscriptError(dedent(msg.format(self.description,
+                                            self.name,freqs)))
         grp = hdf5_file.create_group('/devices/'+self.name)
         grp.create_dataset('STATIC_DATA',compression=config.compression,data=static_table) 
+        if self.list_freqs is not None:
+            list_dtypes = np.dtype({'names':['freq','amp'],'formats':[np.uint64,np.float32]})
+            list_table = np.zeros(len(self.list_freqs), dtype=list_dtypes)
+            list_table['freq'] = self.list_freqs
+            list_table['amp'] = self.list_amps
+            grp.create_dataset('LIST_DATA',compression=config.compression,data=list_table)
         self.set_property('frequency_scale_factor', self.scale_factor, location='device_properties')
         self.set_property('amplitude_scale_factor', self.amp_scale_factor, location='device_properties')
 
@@ -18,69 +18,69 @@ import labscript_devices
 labscript_devices.register_classes(
     'SignalGenerator',
     BLACS_tab='naqslab_devices.SignalGenerator.blacs_tab.SignalGeneratorTab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
 
 labscript_devices.register_classes(
     'RS_SMF100A',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.RS_SMF100A.RS_SMF100ATab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
     
 labscript_devices.register_classes(
     'RS_SMA100B',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.RS_SMA100B.RS_SMA100BTab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
 
 labscript_devices.register_classes(
     'RS_SMHU',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.RS_SMHU.RS_SMHUTab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
     
 labscript_devices.register_classes(
     'HP_8643A',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.HP_8643A.HP_8643ATab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
     
 labscript_devices.register_classes(
     'HP_8642A',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.HP_8642A.HP_8642ATab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
 
 labscript_devices.register_classes(
     'HP_8648A',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.HP_8648.HP_8648ATab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
     
 labscript_devices.register_classes(
     'HP_8648B',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.HP_8648.HP_8648BTab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
     
 labscript_devices.register_classes(
     'HP_8648C',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.HP_8648.HP_8648CTab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
     
 labscript_devices.register_classes(
     'HP_8648D',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.HP_8648.HP_8648DTab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
     
 labscript_devices.register_classes(
     'E8257N',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.KeysightSigGens.E8257NTab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
 
 labscript_devices.register_classes(
     'SRS_SG382',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.SRS_SG380.SRS_SG380Tab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
 
 labscript_devices.register_classes(
     'SRS_SG384',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.SRS_SG380.SRS_SG380Tab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
 
 labscript_devices.register_classes(
     'SRS_SG386',
     BLACS_tab='naqslab_devices.SignalGenerator.BLACS.SRS_SG380.SRS_SG380Tab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.SignalGenerator.runviewer_parser.SignalGeneratorParser')
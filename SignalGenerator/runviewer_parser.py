@@ -0,0 +1,43 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/SignalGenerator/runviewer_parser.py              #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+from naqslab_devices.VISA.runviewer_parser import VISAParser
+
+
+class SignalGeneratorParser(VISAParser):
+    """Shows the static frequency, amplitude and output state of each channel.
+
+    Frequencies and amplitudes are converted back to the units of the
+    output with the scale factors stored in the shot. List mode points are
+    advanced by external triggers, so they are not shown.
+    """
+
+    def get_traces(self, add_trace, clock=None):
+        static_data, device_properties, stop_time = self.get_static_data()
+        if static_data is None:
+            return {}
+        scale = {'freq': device_properties.get('frequency_scale_factor', 1.0),
+                 'amp': device_properties.get('amplitude_scale_factor', 1.0)}
+        fields = static_data.dtype.names
+
+        for channel in self.device.child_list.values():
+            i = int(channel.parent_port.split()[-1])
+            for subchnl in channel.child_list.values():
+                field = '%s%d' % (subchnl.parent_port, i)
+                if subchnl.parent_port in scale and field in fields:
+                    value = static_data[field]/scale[subchnl.parent_port]
+                    add_trace(subchnl.name, self.step(value, stop_time), self.name,
+                              '%s_%s' % (channel.parent_port, subchnl.parent_port))
+            if 'gate%d' % i in fields:
+                add_trace('%s_gate' % channel.name,
+                          self.step(static_data['gate%d' % i], stop_time),
+                          self.name, '%s_gate' % channel.parent_port)
+        return {}
@@ -10,8 +10,10 @@
 # the project for the full license.                                 #
 #                                                                   #
 #####################################################################
-from labscript_devices import deprecated_import_alias
+from naqslab_devices import lazy_deprecated_aliases
 
 
 # For backwards compatibility with old experiment scripts:
-TekScope = deprecated_import_alias("naqslab_devices.TektronixTDS.labscript_device.TDS_Scope")
+__getattr__ = lazy_deprecated_aliases(__name__, {
+    'TekScope': 'naqslab_devices.TektronixTDS.labscript_device.TDS_Scope'
+    })
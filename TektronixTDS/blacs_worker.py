@@ -12,7 +12,7 @@
 import numpy as np
 
 from naqslab_devices.VISA.blacs_worker import VISAWorker
-from labscript import LabscriptError
+from naqslab_devices import labscript_error
 
 import labscript_utils.h5_lock, h5py
 
@@ -41,25 +41,28 @@ class TDS_ScopeWorker(VISAWorker):
             # Scope supported!
             pass
         else:
-            raise LabscriptError('Device {0:s} with VISA name {1:s} not supported!'.format(ident_string,self.VISA_name))  
+            raise labscript_error('Device {0:s} with VISA name {1:s} not supported!'.format(ident_string,self.VISA_name))  
         
         # initialization stuff
         self.connection.write(self.setup_string)
             
     def transition_to_manual(self,abort = False):
         if not abort:         
-            with h5py.File(self.h5_file,'r') as hdf5_file:
+            with self.profiler.phase('h5_read'), h5py.File(self.h5_file,'r') as hdf5_file:
                 try:
                     # get acquisitions table values so we can close the file
-                    acquisitions = hdf5_file['/devices/'+self.device_name+'/ACQUISITIONS'].value
+                    acquisitions = hdf5_file['/devices/'+self.device_name+'/ACQUISITIONS'][()]
                     trigger_time = hdf5_file['/devices/'+self.device_name+'/ACQUISITIONS'].attrs['trigger_time']
                 except:
-                    # No acquisitions!
-                    return True
+                    acquisitions = None
+            if acquisitions is None:
+                # No acquisitions!
+                self.save_timing()
+                return True
             # close lock on h5 to read from scope, it takes a while            
             data = {}
             for connection,label in acquisitions:
-                channel_num = int(connection.split(' ')[-1])
+                channel_num = int(connection.decode('UTF-8').split(' ')[-1])
                 [y0,dy,yoffset] = self.connection.query_ascii_values(self.read_y_parameters_string % channel_num, container=np.array, separator=';')
                 raw_data = self.connection.query_binary_values(self.read_waveform_string,
                 datatype='h', is_big_endian=True, container=np.array)
@@ -74,7 +77,7 @@ class TDS_ScopeWorker(VISAWorker):
             dtypes = np.dtype({'names':['t','values'],'formats':[np.float64,np.float32]})         
             
             # re-open lock on h5file to save data
-            with h5py.File(self.h5_file,'r+') as hdf5_file:
+            with self.profiler.phase('h5_write'), h5py.File(self.h5_file,'r+') as hdf5_file:
                 try:
                     measurements = hdf5_file['/data/traces']
                 except:
@@ -88,7 +91,8 @@ class TDS_ScopeWorker(VISAWorker):
                     measurements.create_dataset(label, data=values)
                     # and save some timing info for reference to labscript time
                     measurements[label].attrs['trigger_time'] = trigger_time
-            
+                
+                self.profiler.save(hdf5_file['/devices/'+self.device_name])
             
         return True
         
@@ -99,7 +103,7 @@ class TDS_ScopeWorker(VISAWorker):
         # if esr is non-zero, read out the error message and report
         if esr != 0:
             errors = self.connection.query('ALLEV?')
-            raise LabscriptError('Tek Scope VISA device {0:s} has Errors in Queue: \n{1:s}'.format(self.VISA_name,errors))
+            raise labscript_error('Tek Scope VISA device {0:s} has Errors in Queue: \n{1:s}'.format(self.VISA_name,errors))
             
         return self.convert_register(esr)
 
@@ -15,4 +15,4 @@ import labscript_devices
 labscript_devices.register_classes(
     'TDS_Scope',
     BLACS_tab='naqslab_devices.TektronixTDS.blacs_tab.TDS_ScopeTab',
-    runviewer_parser='')
+    runviewer_parser='naqslab_devices.TektronixTDS.runviewer_parser.TDS_ScopeParser')
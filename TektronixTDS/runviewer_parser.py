@@ -0,0 +1,17 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/TektronixTDS/runviewer_parser.py                 #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+from naqslab_devices.VISA.runviewer_parser import ScopeParser
+
+
+class TDS_ScopeParser(ScopeParser):
+    """Marks the scope trigger on each acquiring channel."""
+    acquisition_tables = ('ACQUISITIONS',)
@@ -11,8 +11,10 @@
 #                                                                   #
 #####################################################################
 
-from labscript_devices import deprecated_import_alias
+from naqslab_devices import lazy_deprecated_aliases
 
 
 # For backwards compatibility with old experiment scripts:
-VISA = deprecated_import_alias("naqslab_devices.VISA.labscript_device.VISA")
+__getattr__ = lazy_deprecated_aliases(__name__, {
+    'VISA': 'naqslab_devices.VISA.labscript_device.VISA'
+    })
@@ -14,17 +14,19 @@ Boiler plate blacs_tab for VISA instruments.
 
 Defines the common STBstatus.ui widget all devices use to report their current status.
 """
-from labscript import LabscriptError
+from naqslab_devices import labscript_error
      
 from blacs.tab_base_classes import define_state
 from blacs.tab_base_classes import MODE_MANUAL, MODE_TRANSITION_TO_BUFFERED, MODE_TRANSITION_TO_MANUAL, MODE_BUFFERED  
 from blacs.device_base_class import DeviceTab
 from qtutils import UiLoader
+from naqslab_devices.instrumentation import format_statistics
 import os
 
 # Imports for handling icons in STBstatus.ui
 from qtutils.qt import QtCore
 from qtutils.qt import QtGui
+from qtutils.qt import QtWidgets
 
 class VISATab(DeviceTab):
     # Define the Status Byte labels with this dictionary structure
@@ -45,7 +47,7 @@ class VISATab(DeviceTab):
         You then call this parent method to finish initialization.
         """
         if not hasattr(self,'device_worker_class'):
-            raise LabscriptError('BLACS worker not set for device: {0:s}'.format(self))
+            raise labscript_error('BLACS worker not set for device: {0:s}'.format(self))
         DeviceTab.__init__(self,*args,**kwargs)
     
     def initialise_GUI(self):
@@ -70,7 +72,9 @@ class VISATab(DeviceTab):
         self.status_ui.clear_button.clicked.connect(self.send_clear)
         
         # Store the VISA name to be used
-        self.address = str(self.settings['connection_table'].find_by_name(self.settings["device_name"]).BLACS_connection)
+        connection_table = self.settings['connection_table']
+        connection_object = connection_table.find_by_name(self.settings["device_name"])
+        self.address = str(connection_object.BLACS_connection)
         
         # add entries to worker kwargs
         # this allows inheritors to initialize with added entries for their own workers
@@ -81,10 +85,21 @@ class VISATab(DeviceTab):
         self.worker_init_kwargs['device_name'] = self.device_name
 
         # Create and set the primary worker
-        self.create_worker("main_worker",
-                            self.device_worker_class,
-                            {'address':self.address,
-                            })
+        group = connection_object.properties.get('programming_group')
+        if group is None:
+            self.create_worker("main_worker",
+                                self.device_worker_class,
+                                {'address':self.address,
+                                })
+        else:
+            # the group worker hosts the device worker, this one forwards to it
+            port = connection_table.find_by_name(group).properties['port']
+            self.create_worker("main_worker",
+                                'naqslab_devices.VISA.blacs_worker.VISAGroupMemberWorker',
+                                {'group_port':port,
+                                 'worker_class':self.device_worker_class,
+                                 'worker_kwargs':{'address':self.address},
+                                })
         self.primary_worker = "main_worker"       
 
     
@@ -95,7 +110,8 @@ class VISATab(DeviceTab):
         # When called with a queue, this function writes to the queue
         # when the pulseblaster is waiting. This indicates the end of
         # an experimental run.
-        self.status = yield(self.queue_work(self._primary_worker,'check_status'))
+        # the timing statistics come with the status after each shot
+        self.status, stats = yield(self.queue_work(self._primary_worker,'check_status_and_timing'))
 
         for key in self.status_bits:
             if self.status[key]:
@@ -104,6 +120,10 @@ class VISATab(DeviceTab):
                 icon = QtGui.QIcon(':/qtutils/fugue/cross')
             pixmap = icon.pixmap(QtCore.QSize(16,16))
             self.bit_values_widgets[key].setPixmap(pixmap)
+            
+        # show the shot timing statistics on hover
+        if stats:
+            self.status_ui.setToolTip(format_statistics(stats))
         
         
     @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True,True)
@@ -111,3 +131,42 @@ class VISATab(DeviceTab):
         value = self.status_ui.clear_button.isChecked()
         yield(self.queue_work(self._primary_worker,'clear',value))
 
+
+class VISAProgrammingGroupTab(DeviceTab):
+    """Tab of a :obj:`VISAProgrammingGroup <naqslab_devices.VISA.labscript_device.VISAProgrammingGroup>`.
+    
+    Runs the worker that hosts the member workers, and shows how long the
+    group spent reading each shot and programming each member."""
+    
+    def initialise_GUI(self):
+        properties = self.settings['connection_table'].find_by_name(self.device_name).properties
+        self.members = properties['members']
+        
+        self.latency_label = QtWidgets.QLabel('Members: ' + ', '.join(self.members))
+        self.latency_label.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.get_tab_layout().addWidget(self.latency_label)
+        
+        self.create_worker("main_worker",
+                            'naqslab_devices.VISA.blacs_worker.VISAProgrammingGroupWorker',
+                            {'port':properties['port'],
+                             'members':self.members,
+                            })
+        self.primary_worker = "main_worker"
+        
+        self.supports_remote_value_check(False)
+        self.supports_smart_programming(False)
+        self.statemachine_timeout_add(5000, self.status_monitor)
+        
+    @define_state(MODE_MANUAL|MODE_BUFFERED|MODE_TRANSITION_TO_BUFFERED|MODE_TRANSITION_TO_MANUAL,True)
+    def status_monitor(self):
+        # the worker returns the timing once after each shot
+        latency = yield(self.queue_work(self._primary_worker,'check_latency'))
+        if latency:
+            read_time, members = latency
+            lines = ['{:<16s} {:8.1f} ms'.format('shot file read', read_time*1e3),
+                     '{:<16s} {:>8s}    {:>8s}'.format('', 'bus wait', 'program')]
+            for name in self.members:
+                if name in members:
+                    wait, program = members[name]
+                    lines.append('{:<16s} {:8.1f} ms {:8.1f} ms'.format(name, wait*1e3, program*1e3))
+            self.latency_label.setText('\n'.join(lines))
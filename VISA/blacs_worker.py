@@ -16,25 +16,58 @@ Inheritors use the same communication protocol, but override the command syntax.
 """
 from blacs.tab_base_classes import Worker
 
-from labscript import LabscriptError
+from naqslab_devices import labscript_error
 from labscript_utils import dedent
+from naqslab_devices.instrumentation import ShotProfiler, BusTracer
+from naqslab_devices.instrumentation import bus_trace_enabled, default_trace_path
 
+import functools
+import importlib
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+
+import labscript_utils.h5_lock, h5py
 import pyvisa as visa
 
+# authenticates member workers to the programming group worker
+group_authkey = b'naqslab_devices.VISA programming group'
+
 class VISAWorker(Worker):
+    # VISA library to use, empty string selects the default library
+    # set to e.g. 'instruments.yaml@sim' to use pyvisa-sim
+    visa_backend = ''
+    # BusEmulator to use in place of the VISA library, see VISA.bus_emulator
+    bus_emulation = None
+    # BusTracer of the connection, set by init if tracing is enabled
+    tracer = None
+    # shots covered by the timing statistics last sent to the tab
+    reported_shots = 0
         
     def init(self):
         """Initializes basic worker and opens VISA connection to device.
         
         Default connection timeout is 2 seconds"""    
         self.VISA_name = self.address
-        self.resourceMan = visa.ResourceManager()
+        if self.bus_emulation is not None:
+            self.resourceMan = self.bus_emulation
+        else:
+            self.resourceMan = visa.ResourceManager(self.visa_backend)
         try:
             self.connection = self.resourceMan.open_resource(self.VISA_name)
         except visa.VisaIOError:
             msg = '''{:s} not found! Is it connected?'''.format(self.VISA_name)
-            raise LabscriptError(dedent(msg)) from None
+            raise labscript_error(dedent(msg)) from None
         self.connection.timeout = 2000
+        # per-shot timing, see naqslab_devices.instrumentation
+        self.profiler = ShotProfiler()
+        self.profiler.attach_visa(self.connection)
+        if bus_trace_enabled():
+            self.tracer = BusTracer()
+            self.tracer.attach_visa(self.connection)
     
     def check_remote_values(self):
         # over-ride this method if remote value check is supported
@@ -110,9 +143,40 @@ class VISAWorker(Worker):
         # Store some parameters for saving data later
         self.h5_file = h5file
         self.device_name = device_name
+        self.profiler.start_shot()
                 
         return self.final_values
         
+    def read_static_data(self, group):
+        """Reads the data needed to program the device from its h5 group.
+        
+        Over-ride to keep the h5 read separate from the bus writes of
+        :obj:`program_static_data`. This also lets a
+        :obj:`VISAProgrammingGroupWorker` read the shot for all its members
+        at once.
+        
+        Args:
+            group (:obj:`h5py:h5py.Group`): `/devices/<device_name>` group of the shot
+            
+        Returns:
+            Data to pass to :obj:`program_static_data`.
+        """
+        return None
+        
+    def program_static_data(self, data, fresh):
+        """Programs the device with data returned by :obj:`read_static_data`.
+        
+        Must be called after :obj:`transition_to_buffered` preamble has run.
+        
+        Args:
+            data: Return value of :obj:`read_static_data`
+            fresh (bool): Indicates if smart_programming should be refreshed this shot
+            
+        Returns:
+            dict: final_values of the device
+        """
+        return self.initial_values
+        
     def abort_transition_to_buffered(self):
         """Special abort shot configuration code belongs here.
         """
@@ -128,11 +192,322 @@ class VISAWorker(Worker):
         if abort:
             # If we're aborting the run, reset to original value
             self.program_manual(self.initial_values)
+        else:
+            self.save_timing()
         # If we're not aborting the run, stick with buffered value. Nothing to do really!
         # return the current values in the device
         return True
+
+    def save_timing(self):
+        """Finishes the timing record of the shot.
+
+        It is only saved to the shot file if enabled in the labconfig, see
+        :obj:`naqslab_devices.instrumentation`."""
+        self.profiler.write_record(self.h5_file, self.device_name)
+
+    def check_status_and_timing(self):
+        """Checks the status, and gets the timing statistics once after each
+        shot, in a single call from the tab.
+
+        Returns:
+            tuple: Return value of :obj:`check_status`, and the statistics of
+            :obj:`ShotProfiler.statistics() <naqslab_devices.instrumentation.ShotProfiler.statistics>`
+            or None if no shot has finished since the last call.
+        """
+        status = self.check_status()
+        if self.profiler.shots == self.reported_shots:
+            return status, None
+        self.reported_shots = self.profiler.shots
+        return status, self.profiler.statistics()
+        
+    def dump_bus_trace(self, path=None):
+        """Writes the bus trace of the connection to a file.
+        
+        Args:
+            path (str, optional): File to write, see
+                :obj:`BusTracer.dump() <naqslab_devices.instrumentation.BusTracer.dump>`.
+                Defaults to a file named after the device in the
+                naqslab_devices saved configs.
+        
+        Returns:
+            str: Path written, or None if tracing is disabled.
+        """
+        if self.tracer is None:
+            return None
+        if path is None:
+            path = default_trace_path(self.device_name)
+        self.tracer.dump(path)
+        return path
         
     def shutdown(self):
-        """Closes VISA connection to device."""
+        """Closes VISA connection to device, saving the bus trace if enabled."""
+        self.dump_bus_trace()
         self.connection.close()
 
+
+def bus_key(resource_manager, resource_name):
+    """Returns a hashable key identifying the bus a resource is attached to.
+
+    GPIB resources on the same board share a key. All other interfaces
+    (USB, TCPIP, serial) are independent per resource.
+
+    Args:
+        resource_manager (:obj:`pyvisa.ResourceManager`): Manager used to parse
+            the resource name.
+        resource_name (str): VISA resource string or alias.
+
+    Returns:
+        tuple: Bus key.
+    """
+    try:
+        info = resource_manager.resource_info(resource_name)
+    except visa.VisaIOError:
+        # can't be parsed, assume it is on its own bus
+        return ('RSRC', resource_name)
+
+    if info.interface_type == visa.constants.InterfaceType.gpib:
+        return ('GPIB', info.interface_board_number)
+    return ('RSRC', info.resource_name)
+
+
+class VISAProgrammingGroupWorker(Worker):
+    """Hosts the workers of a :obj:`VISAProgrammingGroup <naqslab_devices.VISA.labscript_device.VISAProgrammingGroup>`.
+
+    The member tabs run a :obj:`VISAGroupMemberWorker`, which creates the
+    member's real worker in this process and forwards all work to it.
+    At the start of a shot the group reads the data of every member that
+    implements :obj:`VISAWorker.read_static_data` in a single open of the
+    shot file. Each bus has one thread that runs all work for the
+    instruments on it, so instruments on different buses are programmed
+    concurrently and those sharing a GPIB board take turns.
+    """
+
+    def init(self):
+        self.member_workers = {}
+        # single thread executor of each bus, and the one of each member
+        self.buses = {}
+        self.member_bus = {}
+        self.shot_lock = threading.Lock()
+        self.shot_file = None
+        self.shot_data = {}
+        # seconds spent reading the shot file, and waiting for the bus and
+        # programming each member during the last shot
+        self.read_time = 0.0
+        self.latency = {}
+        self.shots = 0
+        self.reported_shots = 0
+        self.listener = Listener(('localhost', self.port), authkey=group_authkey)
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                # listener closed by shutdown
+                break
+            threading.Thread(target=self.serve_member, args=(connection,),
+                             daemon=True).start()
+
+    def serve_member(self, connection):
+        """Runs the requests of one member worker until it disconnects."""
+        name = None
+        with connection:
+            while True:
+                try:
+                    method, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    if method == 'register':
+                        name = self.add_member(*args)
+                        result = None
+                    else:
+                        result = self.call_member(name, method, args, kwargs)
+                    reply = (True, result)
+                except Exception:
+                    reply = (False, traceback.format_exc())
+                connection.send(reply)
+
+    def add_member(self, device_name, worker_class, worker_kwargs):
+        """Creates and initialises the worker of a member device.
+
+        Returns:
+            str: `device_name`
+        """
+        if device_name not in self.members:
+            msg = '{:s} is not a member of {:s}'.format(device_name, self.device_name)
+            raise labscript_error(msg)
+        if device_name in self.member_workers:
+            # the member tab was restarted
+            self.call_member(device_name, 'shutdown', (), {})
+        module_name, class_name = worker_class.rsplit('.', 1)
+        cls = getattr(importlib.import_module(module_name), class_name)
+        worker = cls.__new__(cls)
+        worker.worker_name = 'main_worker'
+        worker.device_name = device_name
+        worker.logger = logging.getLogger('BLACS.{:s}_main_worker.worker'.format(device_name))
+        for name, value in worker_kwargs.items():
+            setattr(worker, name, value)
+        worker.init()
+        key = bus_key(worker.resourceMan, worker.VISA_name)
+        if key not in self.buses:
+            self.buses[key] = ThreadPoolExecutor(max_workers=1)
+        self.member_bus[device_name] = self.buses[key]
+        self.member_workers[device_name] = worker
+        return device_name
+
+    def call_member(self, device_name, method, args, kwargs):
+        """Runs a worker method of a member on the thread of its bus."""
+        if method == 'transition_to_buffered':
+            # the member's device_name is already known
+            return self.program_member(device_name, *args[1:])
+        worker = self.member_workers[device_name]
+        result = self.member_bus[device_name].submit(getattr(worker, method),
+                                                     *args, **kwargs).result()
+        if method == 'shutdown':
+            del self.member_workers[device_name]
+        return result
+
+    def reads_static_data(self, worker):
+        return type(worker).read_static_data is not VISAWorker.read_static_data
+
+    def read_shot(self, h5file):
+        """Reads the data of the members that support it in one h5 open.
+
+        Later calls for the same shot return the data already read.
+
+        Returns:
+            dict: Return value of each member's `read_static_data`,
+            keyed by device name.
+        """
+        with self.shot_lock:
+            if h5file != self.shot_file:
+                start = time.perf_counter()
+                self.shot_data = {}
+                self.latency = {}
+                with h5py.File(h5file, 'r') as hdf5_file:
+                    devices = hdf5_file['/devices']
+                    for name, worker in self.member_workers.items():
+                        if self.reads_static_data(worker) and name in devices:
+                            self.shot_data[name] = worker.read_static_data(devices[name])
+                self.shot_file = h5file
+                self.read_time = time.perf_counter() - start
+            return self.shot_data
+
+    def program_member(self, device_name, h5file, initial_values, fresh):
+        """Programs a member for the shot from the data read for the group."""
+        worker = self.member_workers[device_name]
+        shot_data = self.read_shot(h5file)
+        if device_name in shot_data:
+            def program():
+                VISAWorker.transition_to_buffered(worker, device_name, h5file,
+                                                  initial_values, fresh)
+                return worker.program_static_data(shot_data[device_name], fresh)
+        else:
+            def program():
+                return worker.transition_to_buffered(device_name, h5file,
+                                                     initial_values, fresh)
+        queued = time.perf_counter()
+        def timed_program():
+            start = time.perf_counter()
+            final_values = program()
+            self.latency[device_name] = (start - queued, time.perf_counter() - start)
+            return final_values
+        return self.member_bus[device_name].submit(timed_program).result()
+
+    def transition_to_buffered(self, device_name, h5file, initial_values, fresh):
+        # read the shot for the members before their requests arrive
+        self.read_shot(h5file)
+        return {}
+
+    def transition_to_manual(self, abort=False):
+        self.shot_file = None
+        self.shot_data = {}
+        if not abort:
+            self.shots += 1
+        return True
+
+    def abort_transition_to_buffered(self):
+        return self.transition_to_manual(True)
+
+    def abort_buffered(self):
+        return self.transition_to_manual(True)
+
+    def program_manual(self, front_panel_values):
+        return {}
+
+    def check_latency(self):
+        """Gets the group timing once after each shot.
+
+        Returns:
+            tuple: Seconds spent reading the shot file, and the seconds each
+            member waited for its bus and spent programming, keyed by device
+            name. None if no shot has finished since the last call.
+        """
+        if self.shots == self.reported_shots:
+            return None
+        self.reported_shots = self.shots
+        return self.read_time, dict(self.latency)
+
+    def shutdown(self):
+        self.listener.close()
+        for name in list(self.member_workers):
+            self.call_member(name, 'shutdown', (), {})
+        for executor in self.buses.values():
+            executor.shutdown()
+
+
+class VISAGroupMemberWorker(Worker):
+    """Worker of a device in a :obj:`VISAProgrammingGroup <naqslab_devices.VISA.labscript_device.VISAProgrammingGroup>`.
+
+    Has the :obj:`VISAProgrammingGroupWorker` create the device's real
+    worker, of class `worker_class` with `worker_kwargs`, and forwards
+    every call from the tab to it.
+    """
+    # seconds to wait for the group worker to start listening
+    connect_timeout = 30
+    connection = None
+
+    def init(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                self.connection = Client(('localhost', self.group_port),
+                                         authkey=group_authkey)
+                break
+            except ConnectionRefusedError:
+                if time.monotonic() > deadline:
+                    msg = '''Programming group of {:s} is not running on
+                        port {:d}.'''.format(self.device_name, self.group_port)
+                    raise labscript_error(dedent(msg)) from None
+                time.sleep(0.5)
+        self.call('register', self.device_name, self.worker_class, self.worker_kwargs)
+
+    def call(self, method, *args, **kwargs):
+        """Runs `method` of the device's worker in the group worker."""
+        try:
+            self.connection.send((method, args, kwargs))
+            success, result = self.connection.recv()
+        except (EOFError, OSError):
+            msg = '''{:s} lost the connection to its programming group.
+                Restart the tab once the group is running.'''.format(self.device_name)
+            raise labscript_error(dedent(msg)) from None
+        if not success:
+            msg = '{:s} failed in its programming group:\n{:s}'
+            raise labscript_error(msg.format(self.device_name, result))
+        return result
+
+    def __getattr__(self, name):
+        # only forward once connected, so that BLACS can set the worker kwargs
+        if name.startswith('_') or self.connection is None:
+            raise AttributeError(name)
+        return functools.partial(self.call, name)
+
+    def shutdown(self):
+        if self.connection is None:
+            return
+        try:
+            self.call('shutdown')
+        finally:
+            self.connection.close()
@@ -0,0 +1,296 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/VISA/bus_emulator.py                             #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Emulated VISA resources with a bus latency and bandwidth model.
+
+A :obj:`BusEmulator` stands in for the :obj:`pyvisa.ResourceManager` of a
+:obj:`VISAWorker <naqslab_devices.VISA.blacs_worker.VISAWorker>`. Set the
+worker's `bus_emulation` attribute to an emulator before `init` is called.
+Each resource it opens replays scripted replies and charges every transfer
+to a clock according to its :obj:`BusModel`.
+
+By default the clock is virtual: nothing sleeps, and the predicted bus time
+accumulates in :attr:`EmulatedResource.elapsed`. With `realtime=True` the
+emulator sleeps for the modelled time instead, so wall-clock measurements
+of a whole shot cycle include the bus costs.
+
+Example::
+
+    emulator = BusEmulator()
+    emulator.add_resource('GPIB0::7::INSTR', LEGACY_GPIB,
+                          {'FROA': 'FR 0080000000.0 HZ',
+                           'APOA': 'AP -010.0 DM'})
+    worker.bus_emulation = emulator
+"""
+import re
+import threading
+import time
+
+import numpy as np
+
+import pyvisa as visa
+from pyvisa import constants, rname
+from pyvisa.highlevel import ResourceInfo
+
+
+class BusModel(object):
+    """Latency and bandwidth model of an instrument bus.
+
+    Args:
+        name (str): Label for the model.
+        write_latency (float): Fixed cost of each write transaction, in seconds.
+        turnaround (float): Time from the end of a query until the instrument
+            starts responding, in seconds. Includes instrument parse time.
+        bytes_per_second (float): Sustained transfer rate.
+        chunk_size (int, optional): Transfer unit of the bus in bytes, e.g. USB
+            packets. Each chunk costs an extra `chunk_latency`.
+        chunk_latency (float, optional): Per chunk overhead, in seconds.
+    """
+
+    def __init__(self, name, write_latency, turnaround, bytes_per_second,
+                 chunk_size=None, chunk_latency=0.0):
+        self.name = name
+        self.write_latency = write_latency
+        self.turnaround = turnaround
+        self.bytes_per_second = bytes_per_second
+        self.chunk_size = chunk_size
+        self.chunk_latency = chunk_latency
+
+    def transfer_time(self, nbytes):
+        """Time to move `nbytes` across the bus, excluding fixed latencies."""
+        t = nbytes/self.bytes_per_second
+        if self.chunk_size:
+            t += -(-nbytes//self.chunk_size)*self.chunk_latency
+        return t
+
+    def write_time(self, nbytes):
+        return self.write_latency + self.transfer_time(nbytes)
+
+    def read_time(self, nbytes):
+        return self.turnaround + self.transfer_time(nbytes)
+
+    def __repr__(self):
+        return 'BusModel({:s})'.format(self.name)
+
+
+# Representative presets. Real values depend heavily on the instrument.
+GPIB = BusModel('GPIB', write_latency=0.5e-3, turnaround=2e-3,
+                bytes_per_second=500e3)
+# older instruments with slow parsers, e.g. HP 8642A
+LEGACY_GPIB = BusModel('LEGACY_GPIB', write_latency=2e-3, turnaround=25e-3,
+                       bytes_per_second=50e3)
+USB_TMC = BusModel('USB_TMC', write_latency=0.25e-3, turnaround=1e-3,
+                   bytes_per_second=8e6, chunk_size=512, chunk_latency=125e-6)
+LAN = BusModel('LAN', write_latency=0.2e-3, turnaround=0.5e-3,
+               bytes_per_second=10e6)
+# 10 bits per byte on the wire
+SERIAL_9600 = BusModel('SERIAL_9600', write_latency=1e-3, turnaround=2e-3,
+                       bytes_per_second=960)
+SERIAL_115200 = BusModel('SERIAL_115200', write_latency=1e-3, turnaround=2e-3,
+                         bytes_per_second=11520)
+
+
+def _timeout_error():
+    return visa.VisaIOError(constants.StatusCode.error_timeout)
+
+
+class EmulatedResource(object):
+    """Emulated message based VISA resource.
+
+    Implements the subset of :obj:`pyvisa.resources.MessageBasedResource`
+    used by the workers.
+
+    Args:
+        resource_name (str): VISA resource name.
+        model (:obj:`BusModel`): Bus model to charge transfers to.
+        replies (dict): Maps query strings (or compiled regular expressions)
+            to replies. A reply can be a str, bytes, a numpy array (sent as an
+            IEEE 488.2 binary block) or a callable taking the query string and
+            returning one of those. Writes that do not match are accepted
+            without a reply.
+        realtime (bool): Sleep for the modelled bus time.
+        lock (:obj:`threading.Lock`, optional): Shared by resources on the same
+            bus so that they cannot transfer simultaneously in realtime mode.
+    """
+
+    def __init__(self, resource_name, model, replies, realtime=False, lock=None):
+        self.resource_name = resource_name
+        self.model = model
+        self.replies = replies
+        self.realtime = realtime
+        self._lock = lock if lock is not None else threading.Lock()
+        # pyvisa attributes used by the workers
+        self.timeout = 2000
+        self.chunk_size = 20*1024
+        self.write_termination = '\r\n'
+        self.read_termination = None
+        self.stb = 0
+        # queued reply and the modelled bus time
+        self._output = None
+        self.elapsed = 0.0
+        self.writes = 0
+        self.reads = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def _charge(self, t):
+        self.elapsed += t
+        if self.realtime:
+            with self._lock:
+                time.sleep(t)
+
+    def _match(self, message):
+        command = message.strip()
+        reply = self.replies.get(command)
+        if reply is None:
+            for key, value in self.replies.items():
+                if isinstance(key, re.Pattern) and key.fullmatch(command):
+                    reply = value
+                    break
+        if callable(reply):
+            reply = reply(command)
+        return reply
+
+    def _encode_reply(self, reply):
+        if isinstance(reply, np.ndarray):
+            data = reply.tobytes()
+            length = str(len(data)).encode()
+            return b'#%d%s%s\n' % (len(length), length, data)
+        if isinstance(reply, str):
+            reply = reply.encode()
+        return reply + b'\n'
+
+    def write_raw(self, message):
+        self.writes += 1
+        self.bytes_written += len(message)
+        self._charge(self.model.write_time(len(message)))
+        reply = self._match(message.decode(errors='replace'))
+        self._output = None if reply is None else self._encode_reply(reply)
+        return len(message)
+
+    def write(self, message, termination=None, encoding=None):
+        term = self.write_termination if termination is None else termination
+        return self.write_raw((message + term).encode())
+
+    def write_binary_values(self, message, values, datatype='f',
+                            is_big_endian=False, termination=None, encoding=None):
+        values = np.asarray(values)
+        data = values.astype(('>' if is_big_endian else '<') + datatype).tobytes()
+        length = str(len(data)).encode()
+        term = self.write_termination if termination is None else termination
+        return self.write_raw(message.encode() + b'#%d%s' % (len(length), length)
+                              + data + term.encode())
+
+    def read_raw(self, size=None):
+        if self._output is None:
+            # instrument did not respond, wait for the timeout
+            self._charge(self.timeout/1000)
+            raise _timeout_error()
+        data, self._output = self._output, None
+        self.reads += 1
+        self.bytes_read += len(data)
+        self._charge(self.model.read_time(len(data)))
+        return data
+
+    def read(self, termination=None, encoding=None):
+        message = self.read_raw().decode()
+        if self.read_termination and message.endswith(self.read_termination):
+            message = message[:-len(self.read_termination)]
+        return message
+
+    def query(self, message, delay=None):
+        self.write(message)
+        return self.read()
+
+    def query_ascii_values(self, message, converter='f', separator=',',
+                           container=list, delay=None):
+        response = self.query(message).strip()
+        convert = {'f': float, 'd': int, 's': str}.get(converter, converter)
+        return container([convert(v) for v in response.split(separator)])
+
+    def query_binary_values(self, message, datatype='f', is_big_endian=False,
+                            container=list, delay=None, header_fmt='ieee',
+                            expect_termination=True, data_points=0, chunk_size=None):
+        self.write(message)
+        block = self.read_raw()
+        ndigits = int(block[1:2])
+        length = int(block[2:2+ndigits])
+        data = block[2+ndigits:2+ndigits+length]
+        values = np.frombuffer(data, dtype=('>' if is_big_endian else '<') + datatype)
+        return values if container is np.array else container(values)
+
+    def read_stb(self):
+        self._charge(self.model.read_time(1))
+        return self.stb
+
+    def clear(self):
+        self._output = None
+        self._charge(self.model.write_latency)
+
+    def close(self):
+        pass
+
+
+class BusEmulator(object):
+    """Stand-in for :obj:`pyvisa.ResourceManager` that opens emulated resources.
+
+    Args:
+        realtime (bool, optional): Sleep for the modelled bus time.
+    """
+
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+        self._definitions = {}
+        self._bus_locks = {}
+        self.resources = {}
+
+    def add_resource(self, resource_name, model, replies):
+        """Defines an instrument that can be opened.
+
+        Args:
+            resource_name (str): VISA resource name.
+            model (:obj:`BusModel`): Bus model for the instrument.
+            replies (dict): Scripted replies, see :obj:`EmulatedResource`.
+        """
+        self._definitions[resource_name] = (model, replies)
+
+    def resource_info(self, resource_name, extended=True):
+        parsed = rname.parse_resource_name(resource_name)
+        board = getattr(parsed, 'board', None)
+        try:
+            board = int(board)
+        except (TypeError, ValueError):
+            board = None
+        return ResourceInfo(parsed.interface_type_const, board,
+                            parsed.resource_class, str(parsed), None)
+
+    def open_resource(self, resource_name):
+        try:
+            model, replies = self._definitions[resource_name]
+        except KeyError:
+            raise visa.VisaIOError(constants.StatusCode.error_resource_not_found) from None
+        # resources on a shared GPIB board share a lock
+        info = self.resource_info(resource_name)
+        if info.interface_type == constants.InterfaceType.gpib:
+            key = ('GPIB', info.interface_board_number)
+        else:
+            key = resource_name
+        lock = self._bus_locks.setdefault(key, threading.Lock())
+        resource = EmulatedResource(resource_name, model, replies,
+                                    self.realtime, lock)
+        self.resources[resource_name] = resource
+        return resource
+
+    @property
+    def elapsed(self):
+        """Total modelled bus time of all opened resources, in seconds."""
+        return sum(r.elapsed for r in self.resources.values())
@@ -45,3 +45,37 @@ class VISA(Device):
         Must be over-ridden."""
         raise LabscriptError('generate_code() must be overridden for {0:s}'.format(self.name))
 
+
+
+class VISAProgrammingGroup(Device):
+    description = 'Group of VISA instruments programmed from one process'
+    allowed_children = []
+    
+    @set_passed_properties(property_names = {
+        "connection_table_properties":["port"]}
+        )
+    def __init__(self, name, members, port=17540, **kwargs):
+        """Programs VISA instruments together at the start of each shot.
+        
+        BLACS hosts the workers of all members in the group's worker
+        process. It reads the shot file once for the whole group and
+        programs instruments on different buses concurrently.
+        
+        Args:
+            name (str): name of device in connectiontable
+            members (list): :obj:`VISA` devices to program together.
+            port (int, optional): Local TCP port the member tabs use to reach
+                the group worker. Must be unique among groups.
+        """
+        Device.__init__(self, name, None, None, **kwargs)
+        self.BLACS_connection = 'localhost:{:d}'.format(port)
+        for member in members:
+            if not isinstance(member, VISA):
+                raise LabscriptError('{:s}: {!s} is not a VISA device'.format(name,member))
+            try:
+                member.set_property('programming_group', name,
+                                    location='connection_table_properties')
+            except LabscriptError:
+                raise LabscriptError('{:s} is already in a programming group'.format(member.name)) from None
+        self.set_property('members', [member.name for member in members],
+                          location='connection_table_properties')
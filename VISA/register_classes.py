@@ -21,3 +21,9 @@ labscript_devices.register_classes(
     BLACS_tab='naqslab_devices.VISA.blacs_tab.VISATab',
     runviewer_parser=''
 )
+
+labscript_devices.register_classes(
+    'VISAProgrammingGroup',
+    BLACS_tab='naqslab_devices.VISA.blacs_tab.VISAProgrammingGroupTab',
+    runviewer_parser=''
+)
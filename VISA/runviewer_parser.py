@@ -0,0 +1,100 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/VISA/runviewer_parser.py                         #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Base runviewer parsers for VISA instruments.
+
+These instruments are programmed once per shot, so their outputs are shown
+as steps spanning the shot. Scopes are shown as markers at their trigger
+times. Only the device group and its small tables are read; acquired traces
+saved to the shot are never loaded.
+"""
+import numpy as np
+import labscript_utils.h5_lock, h5py
+import labscript_utils.properties
+
+
+class VISAParser(object):
+    """Parser for VISA devices without time dependent outputs."""
+
+    def __init__(self, path, device):
+        self.path = path
+        self.name = device.name
+        self.device = device
+
+    def get_stop_time(self, hdf5_file):
+        """Returns the stop time of the shot from the master pseudoclock."""
+        master = hdf5_file['connection table'].attrs['master_pseudoclock']
+        return hdf5_file['devices'][master].attrs['stop_time']
+
+    def step(self, value, stop_time):
+        """Two point trace holding `value` for the whole shot."""
+        return np.array([0, stop_time]), np.array([value, value], dtype=float)
+
+    def get_static_data(self):
+        """Reads the static settings of the shot.
+
+        Returns:
+            tuple: The `STATIC_DATA` row (None if the device has none), the
+            device properties and the stop time of the shot.
+        """
+        with h5py.File(self.path, 'r') as hdf5_file:
+            group = hdf5_file['devices/%s' % self.name]
+            static_data = group['STATIC_DATA'][0] if 'STATIC_DATA' in group else None
+            device_properties = labscript_utils.properties.get(hdf5_file, self.name,
+                                                               'device_properties')
+            stop_time = self.get_stop_time(hdf5_file)
+        return static_data, device_properties, stop_time
+
+    def get_traces(self, add_trace, clock=None):
+        return {}
+
+
+class ScopeParser(VISAParser):
+    """Parser marking when a scope is triggered, on each acquiring channel.
+
+    Subclasses list the datasets of the device group that name the acquiring
+    channels in `acquisition_tables`. Each holds the trigger time as an
+    attribute.
+    """
+    acquisition_tables = ('ACQUISITIONS',)
+    # marker width, the default trigger duration of the scopes
+    trigger_duration = 1e-3
+
+    def marker(self, trigger_times, stop_time):
+        """Trace that is high for `trigger_duration` after each trigger."""
+        times = [0.0]
+        values = [0]
+        for t in sorted(trigger_times):
+            times += [t, t + self.trigger_duration]
+            values += [1, 0]
+        times.append(max(stop_time, times[-1]))
+        values.append(0)
+        return np.array(times), np.array(values)
+
+    def get_traces(self, add_trace, clock=None):
+        connections = set()
+        trigger_times = set()
+        with h5py.File(self.path, 'r') as hdf5_file:
+            group = hdf5_file['devices/%s' % self.name]
+            for table in self.acquisition_tables:
+                if table in group:
+                    # only the connection column is needed
+                    connections.update(c.decode() for c in group[table]['connection'])
+                    trigger_times.add(float(group[table].attrs['trigger_time']))
+            stop_time = self.get_stop_time(hdf5_file)
+
+        if connections:
+            trace = self.marker(trigger_times, stop_time)
+            for channel in self.device.child_list.values():
+                if channel.parent_port in connections:
+                    add_trace(channel.name, trace, self.name, channel.parent_port)
+        return {}
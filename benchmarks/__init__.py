@@ -0,0 +1,30 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/benchmarks/__init__.py                           #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Shot-cycle benchmarks for the BLACS workers using simulated instruments.
+
+VISA instruments are simulated with pyvisa-sim using the definitions in
+`instruments.yaml`. NovaTech DDS devices are emulated on a pseudo-terminal
+by :obj:`novatech_emulator.NovaTechEmulator`.
+
+Run with::
+
+    python -m naqslab_devices.benchmarks.shot_cycle
+
+The import time of the package and worker modules is measured with::
+
+    python -m naqslab_devices.benchmarks.import_time --check
+
+The SR865 stream receiver is benchmarked against a local UDP sender with::
+
+    python -m naqslab_devices.benchmarks.sr865_stream
+"""
@@ -0,0 +1,113 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/benchmarks/import_time.py                        #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Import-time benchmark of the naqslab_devices modules.
+
+Every BLACS worker process imports its worker module in a fresh interpreter,
+so import time adds directly to BLACS startup. Each module is imported in a
+new interpreter several times and the fastest time is reported, along with
+any heavy dependencies that were pulled in.
+
+With `--check`, exits with an error if a module imports a dependency it
+should not need, e.g. if the package import pulls in labscript.
+
+Usage::
+
+    python -m naqslab_devices.benchmarks.import_time [-r REPEATS] [--check]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# dependencies that are expensive to import
+HEAVY = ('labscript', 'labscript_devices', 'h5py', 'pyvisa', 'serial',
+         'qtutils', 'PyQt5', 'PySide2')
+
+# module: heavy dependencies it must not import
+TARGETS = {
+    'naqslab_devices': HEAVY,
+    'naqslab_devices.SignalGenerator': HEAVY,
+    'naqslab_devices.NovaTechDDS': HEAVY,
+    'naqslab_devices.SR865': HEAVY,
+    'naqslab_devices.SR865.settings': HEAVY,
+    'naqslab_devices.smart_cache_store': HEAVY,
+    'naqslab_devices.VISA.blacs_worker': ('labscript', 'labscript_devices'),
+    'naqslab_devices.SignalGenerator.blacs_worker': ('labscript', 'labscript_devices'),
+    'naqslab_devices.KeysightDCSupply.blacs_worker': ('labscript', 'labscript_devices'),
+    'naqslab_devices.SR865.blacs_worker': ('labscript', 'labscript_devices'),
+    'naqslab_devices.KeysightXSeries.blacs_worker': ('labscript', 'labscript_devices'),
+    'naqslab_devices.TektronixTDS.blacs_worker': ('labscript', 'labscript_devices'),
+    'naqslab_devices.NovaTechDDS.blacs_worker': ('labscript', 'labscript_devices'),
+    'naqslab_devices.SignalGenerator.labscript_device': (),
+}
+
+_PROBE = '''
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+t = time.perf_counter() - t0
+print(json.dumps([t, [m for m in {heavy!r} if m in sys.modules]]))
+'''
+
+
+def time_import(module, repeats=5):
+    """Imports `module` in fresh interpreters.
+
+    Returns:
+        tuple: Fastest import time in seconds and the list of heavy
+        dependencies that were imported.
+    """
+    best = None
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, '-c',
+                                 _PROBE.format(module=module, heavy=HEAVY)],
+                                capture_output=True, text=True)
+        if result.returncode:
+            raise RuntimeError('importing {:s} failed:\n{:s}'.format(module,
+                                                                   result.stderr))
+        t, loaded = json.loads(result.stdout.strip().splitlines()[-1])
+        best = t if best is None else min(best, t)
+    return best, loaded
+
+
+def run(repeats=5):
+    results = {}
+    for module, forbidden in TARGETS.items():
+        t, loaded = time_import(module, repeats)
+        results[module] = (t, loaded, [m for m in loaded if m in forbidden])
+    return results
+
+
+def report(results):
+    header = '{:<48s}{:>10s}  {:s}'
+    row = '{:<48s}{:>10.1f}  {:s}'
+    print(header.format('module', 'ms', 'heavy imports'))
+    for module, (t, loaded, bad) in results.items():
+        names = ', '.join(m + ('(!)' if m in bad else '') for m in loaded)
+        print(row.format(module, 1e3*t, names))
+    print('Times are the fastest of several fresh interpreters.')
+    print('(!) marks dependencies the module should not import.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('-r', '--repeats', type=int, default=5,
+                        help='number of fresh interpreters per module')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with an error if a module imports a '
+                             'dependency it should not')
+    args = parser.parse_args()
+    results = run(args.repeats)
+    report(results)
+    if args.check and any(bad for _, _, bad in results.values()):
+        sys.exit(1)
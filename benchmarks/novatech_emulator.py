@@ -0,0 +1,103 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/benchmarks/novatech_emulator.py                  #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Pseudo-terminal emulator of a NovaTech 409B DDS serial interface.
+
+The emulator answers the subset of the serial protocol used by
+:obj:`NovaTech409B_ACWorker <naqslab_devices.NovaTechDDS.blacs_worker.NovaTech409B_ACWorker>`
+and counts the traffic it sees. It is POSIX only.
+"""
+import os
+import select
+import threading
+import tty
+
+
+class NovaTechEmulator(object):
+    """Emulates a NovaTech 409B on a pseudo-terminal.
+
+    Connect to :attr:`port` with pyserial as if it were the real device.
+
+    Args:
+        clk_scale (float, optional): Clock scale of the emulated device.
+    """
+    N_chan = 4
+
+    def __init__(self, clk_scale=1.0):
+        self.clk_scale = clk_scale
+        # output state in device units, freq in 0.1 Hz steps
+        self.freq = [0]*self.N_chan
+        self.amp = [1023]*self.N_chan
+        self.phase = [0]*self.N_chan
+        self.table_lines = 0
+
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.commands = 0
+
+        self._master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self._slave = slave
+        self._running = True
+        self._thread = threading.Thread(target=self._mainloop, daemon=True)
+        self._thread.start()
+
+    def reset_counters(self):
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.commands = 0
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def _mainloop(self):
+        buffer = b''
+        while self._running:
+            ready, _, _ = select.select([self._master], [], [], 0.05)
+            if not ready:
+                continue
+            data = os.read(self._master, 4096)
+            self.bytes_read += len(data)
+            buffer += data
+            while b'\r\n' in buffer:
+                line, buffer = buffer.split(b'\r\n', 1)
+                self.commands += 1
+                response = self._respond(line.strip())
+                os.write(self._master, response)
+                self.bytes_written += len(response)
+
+    def _respond(self, line):
+        if line == b'QUE':
+            lines = [b'%08x %04x %04x 00000000 00000000 000000000000 00000000\r\n'
+                     % (self.freq[i], self.phase[i], self.amp[i])
+                     for i in range(self.N_chan)]
+            return b''.join(lines) + b'OK\r\n'
+
+        cmd, _, args = line.partition(b' ')
+        try:
+            if cmd[:1] == b'F' and len(cmd) == 2:
+                # frequency in MHz
+                self.freq[int(cmd[1:])] = int(float(args)*1e7*self.clk_scale)
+            elif cmd[:1] == b'V' and len(cmd) == 2:
+                self.amp[int(cmd[1:])] = int(args)
+            elif cmd[:1] == b'P' and len(cmd) == 2:
+                self.phase[int(cmd[1:])] = int(args)
+            elif cmd[:1] == b't':
+                self.table_lines += 1
+        except (ValueError, IndexError):
+            return b'?0\r\n'
+        # blank lines, mode and configuration commands are all accepted
+        return b'OK\r\n'
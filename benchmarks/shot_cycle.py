@@ -0,0 +1,292 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/benchmarks/shot_cycle.py                         #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Shot-cycle benchmark of the BLACS workers against simulated instruments.
+
+Each worker is created outside of BLACS, initialised against its simulated
+instrument, then taken through `transition_to_buffered` and
+`transition_to_manual` for a sequence of generated shot files. Shot values
+change every other shot so that both smart cache hits and misses are
+exercised.
+
+Reports, per worker, the time spent in each phase and the bus traffic
+(bytes written, bytes read and query round trips) per shot.
+
+Usage::
+
+    python -m naqslab_devices.benchmarks.shot_cycle [-n SHOTS] [--points N] [--trace DIR]
+
+With `--trace`, the bus transactions of every shot are written as JSON lines
+to `DIR/<device>/shot_NNNN.jsonl`.
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import labscript_utils.h5_lock, h5py
+import labscript_utils.properties
+
+from naqslab_devices.smart_cache_store import SmartCacheStore
+from naqslab_devices.instrumentation import BusTracer
+from naqslab_devices.benchmarks.novatech_emulator import NovaTechEmulator
+
+SIM_TEMPLATE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            'instruments.yaml')
+
+
+class DeviceCase(object):
+    """A worker to benchmark.
+
+    Args:
+        name (str): Device name used in the shot files.
+        worker_class (str): Import path of the worker class.
+        attributes (dict): Worker attributes normally set by BLACS.
+        write_shot (callable): `write_shot(hdf5_file, group, shot)` populates
+            the device group of shot number `shot`.
+    """
+
+    def __init__(self, name, worker_class, attributes, write_shot):
+        self.name = name
+        self.worker_class = worker_class
+        self.attributes = attributes
+        self.write_shot = write_shot
+        self.worker = None
+        self.tracer = None
+        self.times = {'init': [], 'transition_to_buffered': [],
+                      'transition_to_manual': []}
+        self.traffic = []
+
+    def create_worker(self, visa_backend):
+        module_name, class_name = self.worker_class.rsplit('.', 1)
+        module = __import__(module_name, fromlist=[class_name])
+        worker_class = getattr(module, class_name)
+        # bypass the multiprocessing machinery of the BLACS Worker
+        worker = object.__new__(worker_class)
+        worker.device_name = self.name
+        worker.worker_name = 'main_worker'
+        worker.logger = logging.getLogger('benchmark.' + self.name)
+        worker.visa_backend = visa_backend
+        for key, value in self.attributes.items():
+            setattr(worker, key, value)
+        self.worker = worker
+        return worker
+
+
+def static_table(fields, values):
+    """Returns a one row structured array."""
+    dtypes = np.dtype({'names': [f[0] for f in fields],
+                       'formats': [f[1] for f in fields]})
+    table = np.zeros(1, dtype=dtypes)
+    for (name, _), value in zip(fields, values):
+        table[name] = value
+    return table
+
+
+def write_signal_generator(scale_factor):
+    def write_shot(hdf5_file, group, shot):
+        freq = 100e6 + 1e3*(shot//2)
+        group.create_dataset('STATIC_DATA', data=static_table(
+            [('freq0', np.uint64), ('amp0', np.float16), ('gate0', bool)],
+            [freq, -10 + (shot//2) % 2, True]))
+        labscript_utils.properties.set_device_properties(hdf5_file, group.name.split('/')[-1],
+            {'frequency_scale_factor': scale_factor,
+             'amplitude_scale_factor': 1.0})
+    return write_shot
+
+
+def write_dc_supply(hdf5_file, group, shot):
+    group.create_dataset('STATIC_DATA', data=static_table(
+        [('channel 0', np.float16)], [1.0 + 0.5*((shot//2) % 2)]))
+
+
+def write_lock_in(hdf5_file, group, shot):
+    group.create_dataset('STATIC_DATA', data=static_table(
+        [('tau', np.float16), ('tau_i', np.int8), ('sens', np.float16),
+         ('sens_i', np.int8), ('phase', np.float32)],
+        [1e-3, 9, 0.01, 10 + (shot//2) % 2, 0.0]))
+
+
+def write_acquisitions(table_name):
+    def write_shot(hdf5_file, group, shot):
+        name = group.name.split('/')[-1]
+        # labels must be unique across the scopes of a shot
+        table = np.array([(b'Channel 1', name.encode() + b'_ch1')],
+                         dtype=[('connection', 'S256'), ('label', 'S256')])
+        group.create_dataset(table_name, data=table)
+        group[table_name].attrs['trigger_time'] = 0.1
+        labscript_utils.properties.set_device_properties(hdf5_file, name,
+            {'compression': None, 'compression_opts': None, 'shuffle': False})
+    return write_shot
+
+
+def write_novatech(table_lines):
+    def write_shot(hdf5_file, group, shot):
+        fields = [('freq%d' % i, np.uint32) for i in range(2)]
+        fields += [('amp%d' % i, np.uint16) for i in range(2)]
+        fields += [('phase%d' % i, np.uint16) for i in range(2)]
+        table = np.zeros(table_lines, dtype=np.dtype({'names': [f[0] for f in fields],
+                                                      'formats': [f[1] for f in fields]}))
+        table['freq0'] = 800000000 + np.arange(table_lines)*(1 + (shot//2) % 2)
+        table['freq1'] = 900000000
+        table['amp0'] = table['amp1'] = 1023
+        group.create_dataset('TABLE_DATA', data=table)
+
+        fields = [('freq%d' % i, np.uint32) for i in range(2, 4)]
+        fields += [('amp%d' % i, np.uint16) for i in range(2, 4)]
+        fields += [('phase%d' % i, np.uint16) for i in range(2, 4)]
+        group.create_dataset('STATIC_DATA', data=static_table(
+            fields, [700000000 + 10*((shot//2) % 2), 700000000, 1023, 1023, 0, 0]))
+    return write_shot
+
+
+def build_cases(table_lines, novatech_port):
+    visa = {
+        'sma100b': ('naqslab_devices.SignalGenerator.BLACS.RS_SMA100B.RS_SMA100BWorker',
+                    {'address': 'TCPIP0::sim-sma100b::inst0::INSTR'},
+                    write_signal_generator(1e9)),
+        'e8257n': ('naqslab_devices.SignalGenerator.BLACS.KeysightSigGens.KeysightSigGenWorker',
+                   {'address': 'GPIB0::19::INSTR', 'scale_factor': 1e9,
+                    'amp_scale_factor': 1.0},
+                   write_signal_generator(1e9)),
+        'hp8642a': ('naqslab_devices.SignalGenerator.BLACS.HP_8642A.HP_8642AWorker',
+                    # the simulated read-backs are fixed, so settling never verifies
+                    {'address': 'GPIB0::7::INSTR', 'verify_settle': False},
+                    write_signal_generator(1e6)),
+        'e3640a': ('naqslab_devices.KeysightDCSupply.blacs_worker.KeysightDCSupplyWorker',
+                   {'address': 'GPIB0::5::INSTR', 'limited': 'volt', 'range': 'LOW',
+                    'allowed_outputs': [0]},
+                   write_dc_supply),
+        'sr865': ('naqslab_devices.SR865.blacs_worker.SR865Worker',
+                  {'address': 'TCPIP0::sim-sr865::inst0::INSTR'},
+                  write_lock_in),
+        'dsox3034t': ('naqslab_devices.KeysightXSeries.blacs_worker.KeysightXScopeWorker',
+                      {'address': 'USB0::0x2A8D::0x1766::SIM0001::INSTR'},
+                      write_acquisitions('ANALOG_ACQUISITIONS')),
+        'tds2024b': ('naqslab_devices.TektronixTDS.blacs_worker.TDS_ScopeWorker',
+                     {'address': 'USB0::0x0699::0x0363::SIM0002::INSTR'},
+                     write_acquisitions('ACQUISITIONS')),
+    }
+    cases = [DeviceCase('bench_' + name, *args) for name, args in visa.items()]
+    cases.append(DeviceCase('bench_novatech',
+        'naqslab_devices.NovaTechDDS.blacs_worker.NovaTech409B_ACWorker',
+        {'com_port': novatech_port, 'baud_rate': 115200, 'update_mode': 'synchronous',
+         'phase_mode': 'continuous', 'ext_clk': False, 'clk_freq': None, 'kp': 1,
+         'R_option': False, 'clk_scale': 1.0},
+        write_novatech(table_lines)))
+    return cases
+
+
+def write_sim_file(path, points):
+    """Fills in the waveform tokens of the instrument definitions."""
+    block = '#{:d}{:d}'.format(len(str(2*points)), 2*points) + 'AB'*points
+    preamble = '+1,+0,+{:d},+1,+1.0E-06,-5.0E-04,+0,+1.0E-04,+0.0E+00,+32768'.format(points)
+    with open(SIM_TEMPLATE) as f:
+        definitions = f.read()
+    definitions = definitions.replace('@SCOPE_PREAMBLE@', preamble)
+    definitions = definitions.replace('@SCOPE_BLOCK@', block)
+    definitions = definitions.replace('@TDS_BLOCK@', block)
+    with open(path, 'w') as f:
+        f.write(definitions)
+
+
+def write_shot_files(directory, cases, shots):
+    paths = []
+    for shot in range(shots):
+        path = os.path.join(directory, 'shot_{:04d}.h5'.format(shot))
+        with h5py.File(path, 'w') as hdf5_file:
+            devices = hdf5_file.create_group('devices')
+            for case in cases:
+                case.write_shot(hdf5_file, devices.create_group(case.name), shot)
+        paths.append(path)
+    return paths
+
+
+def timed(times, phase, method, *args):
+    t0 = time.perf_counter()
+    result = method(*args)
+    times[phase].append(time.perf_counter() - t0)
+    return result
+
+
+def run(shots=20, points=2000, table_lines=100, trace_dir=None):
+    directory = tempfile.mkdtemp(prefix='naqslab_bench_')
+    # keep benchmark smart caches out of the user's saved configs
+    SmartCacheStore.default_cache_dir = os.path.join(directory, 'smart_cache')
+    sim_file = os.path.join(directory, 'instruments.yaml')
+    write_sim_file(sim_file, points)
+    emulator = NovaTechEmulator()
+    cases = build_cases(table_lines, emulator.port)
+    try:
+        shot_files = write_shot_files(directory, cases, shots)
+        for case in cases:
+            worker = case.create_worker(sim_file + '@sim')
+            timed(case.times, 'init', worker.init)
+            case.tracer = BusTracer()
+            if case.name == 'bench_novatech':
+                case.tracer.attach_serial(worker.connection)
+            else:
+                case.tracer.attach_visa(worker.connection)
+
+            front_panel = worker.check_remote_values()
+            for shot, path in enumerate(shot_files):
+                case.tracer.clear()
+                final_values = timed(case.times, 'transition_to_buffered',
+                                     worker.transition_to_buffered,
+                                     case.name, path, front_panel, shot == 0)
+                timed(case.times, 'transition_to_manual',
+                      worker.transition_to_manual)
+                case.traffic.append(case.tracer.counts())
+                if trace_dir is not None:
+                    case.tracer.dump(os.path.join(trace_dir, case.name,
+                                                  os.path.basename(path)[:-3] + '.jsonl'))
+                if final_values:
+                    front_panel = final_values
+            worker.shutdown()
+    finally:
+        emulator.close()
+        SmartCacheStore.default_cache_dir = None
+        shutil.rmtree(directory, ignore_errors=True)
+    return cases
+
+
+def report(cases):
+    header = '{:<18s}{:>10s}{:>14s}{:>14s}{:>10s}{:>10s}{:>8s}'
+    row = '{:<18s}{:>10.1f}{:>14.2f}{:>14.2f}{:>10.0f}{:>10.0f}{:>8.1f}'
+    print(header.format('device', 'init/ms', 'to_buff/ms', 'to_man/ms',
+                        'B out', 'B in', 'trips'))
+    for case in cases:
+        traffic = np.mean(case.traffic, axis=0)
+        print(row.format(case.name[len('bench_'):],
+                         1e3*case.times['init'][0],
+                         1e3*np.mean(case.times['transition_to_buffered']),
+                         1e3*np.mean(case.times['transition_to_manual']),
+                         *traffic))
+    print('Phase times are means per shot, bus traffic is mean per shot.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('-n', '--shots', type=int, default=20,
+                        help='number of shots to run')
+    parser.add_argument('--points', type=int, default=2000,
+                        help='number of points in simulated scope traces')
+    parser.add_argument('--table-lines', type=int, default=100,
+                        help='number of lines in the NovaTech table')
+    parser.add_argument('--trace', metavar='DIR',
+                        help='directory to write per shot bus traces to')
+    args = parser.parse_args()
+    report(run(args.shots, args.points, args.table_lines, args.trace))
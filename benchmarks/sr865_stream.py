@@ -0,0 +1,154 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/benchmarks/sr865_stream.py                       #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Benchmark of the SR865 stream receiver against a local UDP stand-in.
+
+A :obj:`StreamSender` sends packets in the SR865 stream format to the
+loopback interface at a fixed sample rate, holding a ramp so the received
+data can be checked. Packets can be dropped on purpose to exercise the
+sequence check, either singly or as one run longer than the 8 bit count.
+
+Reports the packets received and lost and whether the unpacked ramp matches
+what was sent.
+
+Usage::
+
+    python -m naqslab_devices.benchmarks.sr865_stream [-t SECONDS] [--rate HZ] [--drop N] [--drop-run N]
+"""
+import argparse
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from naqslab_devices.SR865.streaming import StreamReceiver, header_size
+
+
+class StreamSender(object):
+    """Sends SR865 style stream packets from a background thread.
+
+    Sample `i` holds the value `i` in each of its outputs.
+
+    Args:
+        port (int): UDP port to send to on the loopback interface.
+        rate (float): Samples per second.
+        nvalues (int, optional): Outputs per sample.
+        packet_size (int, optional): Payload bytes per packet.
+        drop_every (int, optional): Skip every n-th packet, 0 to send all.
+        drop_run (int, optional): Number of consecutive packets to skip,
+            starting from packet :obj:`run_start`.
+    """
+    run_start = 100
+
+    def __init__(self, port, rate, nvalues=2, packet_size=1024, drop_every=0,
+                 drop_run=0):
+        self.address = ('127.0.0.1', port)
+        self.rate = rate
+        self.nvalues = nvalues
+        self.packet_size = packet_size
+        self.drop_every = drop_every
+        self.drop_run = drop_run
+        self.samples_per_packet = packet_size//(4*nvalues)
+        self.sent = 0
+        self.dropped = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._running = False
+        self._thread = None
+
+    def packet(self, n):
+        first = n*self.samples_per_packet
+        samples = np.arange(first, first + self.samples_per_packet, dtype='>f4')
+        payload = np.repeat(samples, self.nvalues).tobytes()
+        return struct.pack('>I', n % 256) + payload
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._mainloop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._thread.join()
+        self._socket.close()
+
+    def _mainloop(self):
+        packet_rate = self.rate/self.samples_per_packet
+        start = time.perf_counter()
+        n = 0
+        while self._running:
+            due = int((time.perf_counter() - start)*packet_rate)
+            while n < due:
+                if ((self.drop_every and not (n + 1) % self.drop_every)
+                        or 0 <= n - self.run_start < self.drop_run):
+                    self.dropped += 1
+                else:
+                    self._socket.sendto(self.packet(n), self.address)
+                    self.sent += 1
+                n += 1
+            time.sleep(1e-3)
+
+
+def run(duration=2.0, rate=156250.0, nvalues=2, drop_every=0, drop_run=0):
+    """Streams for `duration` seconds and checks the received data.
+
+    Returns:
+        dict: Benchmark results.
+    """
+    packet_size = 1024
+    nbytes = 1.5*duration*rate*4*nvalues
+    packet_rate = rate*4*nvalues/packet_size
+    receiver = StreamReceiver(0, packet_size, int(np.ceil(nbytes/packet_size)),
+                              packet_rate, host='127.0.0.1')
+    sender = StreamSender(receiver.port, rate, nvalues, packet_size, drop_every,
+                          drop_run)
+    receiver.start()
+    sender.start()
+    time.sleep(duration)
+    sender.stop()
+    receiver.stop()
+
+    t0 = time.perf_counter()
+    values, lost = receiver.unpack(nvalues)
+    unpack_time = time.perf_counter() - t0
+    receiver.close()
+
+    ramp = np.arange(len(values), dtype=np.float32)
+    good = ~np.isnan(values[:, 0])
+    return {'sent': sender.sent,
+            'dropped by sender': sender.dropped,
+            'received': receiver.received,
+            'lost': lost,
+            'overflowed': receiver.overflowed,
+            'samples': len(values),
+            'data intact': bool(np.all(values[good] == ramp[good, None])),
+            'MB/s': receiver.received*(header_size + packet_size)/duration/1e6,
+            'unpack ms': 1e3*unpack_time}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('-t', '--time', type=float, default=2.0,
+                        help='stream duration in seconds')
+    parser.add_argument('--rate', type=float, default=156250.0,
+                        help='samples per second')
+    parser.add_argument('--values', type=int, default=2, choices=(1, 2, 4),
+                        help='outputs per sample')
+    parser.add_argument('--drop', type=int, default=0,
+                        help='drop every n-th packet')
+    parser.add_argument('--drop-run', type=int, default=0,
+                        help='drop a run of n consecutive packets')
+    args = parser.parse_args()
+    for key, value in run(args.time, args.rate, args.values, args.drop,
+                          args.drop_run).items():
+        print('{:<20s}{!s}'.format(key, value))
@@ -0,0 +1,375 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/instrumentation.py                               #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Per-shot timing of BLACS worker transitions.
+
+A :obj:`ShotProfiler` accumulates the time a worker spends in each phase of
+a shot (reading the shot file, diffing against the smart cache, bus writes,
+bus reads and writing results back) along with the bus traffic. Bus phases
+are timed automatically by wrapping the worker's connection; the others are
+marked in the worker with :meth:`ShotProfiler.phase`.
+
+At the end of each shot the record is added to a rolling history from
+which BLACS tabs display summary statistics. Workers that write results to
+the shot file also save the record there, as a one row `TIMING` dataset in
+their device group. Other workers only open the shot file to save it if
+`shot_timing_file` is set, since that costs a write mode open under the
+h5 lock every shot.
+
+A :obj:`BusTracer` keeps a ring buffer of the individual transactions on a
+connection, with the command text, for offline analysis of which commands
+a worker sends and how long the instrument takes to answer them.
+
+Timing records are on by default, while saving them from every worker and
+tracing are off. All are set in the labconfig:
+
+.. code-block:: ini
+
+    [naqslab_devices]
+    shot_timing = False
+    shot_timing_file = True
+    bus_trace = True
+"""
+import json
+import os
+import tempfile
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from labscript_utils.labconfig import LabConfig
+
+phases = ('h5_read', 'diff', 'bus_write', 'bus_read', 'h5_write')
+
+timing_dtype = np.dtype([(name, np.float32) for name in phases + ('total',)]
+                        + [('bytes_written', np.uint64),
+                           ('bytes_read', np.uint64),
+                           ('round_trips', np.uint32)])
+
+
+def _get_flag(option, fallback):
+    """Returns a boolean option of the `naqslab_devices` labconfig section."""
+    try:
+        exp_config = LabConfig()
+    except Exception:
+        return fallback
+    return exp_config.getboolean('naqslab_devices', option, fallback=fallback)
+
+
+def bus_trace_enabled():
+    """Returns True if bus tracing is enabled in the labconfig."""
+    return _get_flag('bus_trace', False)
+
+
+def default_trace_path(device_name):
+    """Returns the path bus traces of a device are dumped to."""
+    try:
+        base = LabConfig().get('DEFAULT', 'app_saved_configs')
+    except Exception:
+        base = tempfile.gettempdir()
+    return os.path.join(base, 'naqslab_devices', 'bus_trace',
+                        device_name + '.jsonl')
+
+
+class ShotProfiler(object):
+    """Accumulates per-phase timing of a worker's shots.
+
+    Args:
+        history (int, optional): Number of shots kept for :meth:`statistics`.
+        enabled (bool, optional): Whether records are kept. Defaults to the
+            labconfig setting.
+        write_file (bool, optional): Whether :meth:`write_record` opens the
+            shot file to save the record. Defaults to the labconfig setting.
+    """
+
+    def __init__(self, history=100, enabled=None, write_file=None):
+        self.enabled = _get_flag('shot_timing', True) if enabled is None else enabled
+        self.write_file = (_get_flag('shot_timing_file', False)
+                           if write_file is None else write_file)
+        self.history = deque(maxlen=history)
+        # shots recorded since the profiler was made
+        self.shots = 0
+        self.active = False
+        self._start = None
+        self._record = np.zeros(1, dtype=timing_dtype)
+        # a read that follows a write completes a round trip
+        self._awaiting_reply = False
+
+    def start_shot(self):
+        """Zeroes the counters at the start of a shot."""
+        self._record = np.zeros(1, dtype=timing_dtype)
+        self._start = time.perf_counter()
+        self._awaiting_reply = False
+        self.active = self.enabled
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager that charges the enclosed time to phase `name`."""
+        if not self.active:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record[name] += time.perf_counter() - t0
+
+    def _count(self, phase, field, nbytes, t0):
+        self._record[phase] += time.perf_counter() - t0
+        self._record[field] += nbytes
+
+    def _wrap_write(self, write):
+        def timed_write(message, *args, **kwargs):
+            if not self.active:
+                return write(message, *args, **kwargs)
+            t0 = time.perf_counter()
+            result = write(message, *args, **kwargs)
+            self._count('bus_write', 'bytes_written', len(message), t0)
+            self._awaiting_reply = True
+            return result
+        return timed_write
+
+    def _wrap_read(self, read):
+        def timed_read(*args, **kwargs):
+            if not self.active:
+                return read(*args, **kwargs)
+            t0 = time.perf_counter()
+            data = read(*args, **kwargs)
+            self._count('bus_read', 'bytes_read', len(data), t0)
+            if self._awaiting_reply:
+                self._record['round_trips'] += 1
+                self._awaiting_reply = False
+            return data
+        return timed_read
+
+    def attach_visa(self, resource):
+        """Times the bus transfers of a pyvisa message based resource.
+
+        All of pyvisa's write and read helpers go through `write_raw`
+        and `_read_raw`, so only those are wrapped.
+        """
+        resource.write_raw = self._wrap_write(resource.write_raw)
+        if hasattr(resource, '_read_raw'):
+            resource._read_raw = self._wrap_read(resource._read_raw)
+        else:
+            resource.read_raw = self._wrap_read(resource.read_raw)
+        if hasattr(resource, 'read_bytes'):
+            resource.read_bytes = self._wrap_read(resource.read_bytes)
+
+    def attach_serial(self, connection):
+        """Times the transfers of a :obj:`serial.Serial` connection.
+
+        `readline` and `readlines` are inherited from :obj:`io.RawIOBase`
+        and call `read`, so only `read` and `write` are wrapped.
+        """
+        connection.write = self._wrap_write(connection.write)
+        connection.read = self._wrap_read(connection.read)
+
+    def finish_shot(self):
+        """Closes the record of the current shot.
+
+        Returns:
+            :obj:`numpy:numpy.ndarray`: One row timing record, or None if
+            no shot was started.
+        """
+        if not self.active:
+            return None
+        self.active = False
+        self._record['total'] = time.perf_counter() - self._start
+        self.history.append(self._record)
+        self.shots += 1
+        return self._record
+
+    def save(self, group):
+        """Finishes the shot and writes its record to the `TIMING` dataset
+        of a device group.
+
+        Args:
+            group (:obj:`h5py:h5py.Group`): `/devices/<device_name>` group
+                of the shot file, opened for writing.
+        """
+        record = self.finish_shot()
+        if record is None:
+            return
+        if 'TIMING' in group:
+            del group['TIMING']
+        group.create_dataset('TIMING', data=record)
+
+    def write_record(self, h5file, device_name):
+        """Finishes the shot of a worker that does not otherwise write to
+        the shot file.
+
+        The shot file is only opened to save the record if `write_file` is
+        set, otherwise the record is only added to the history.
+        """
+        if not self.active:
+            return
+        if not self.write_file:
+            self.finish_shot()
+            return
+        import labscript_utils.h5_lock, h5py
+        with h5py.File(h5file, 'r+') as hdf5_file:
+            self.save(hdf5_file['/devices/'+device_name])
+
+    def statistics(self):
+        """Summarises the shots in the history.
+
+        Returns:
+            dict: Mean and maximum of each field over the history, keyed by
+            field name. Empty if no shots have been recorded.
+        """
+        if not self.history:
+            return {}
+        records = np.concatenate(self.history)
+        return {name: (float(records[name].mean()), float(records[name].max()))
+                for name in timing_dtype.names}
+
+
+def format_statistics(stats):
+    """Formats the output of :meth:`ShotProfiler.statistics` for display."""
+    lines = []
+    for name in phases + ('total',):
+        mean, peak = stats[name]
+        lines.append('{:<10s} {:8.1f} ms (max {:.1f} ms)'.format(name, mean*1e3,
+                                                                peak*1e3))
+    for name in ('bytes_written', 'bytes_read', 'round_trips'):
+        lines.append('{:<10s} {:8.0f}'.format(name.replace('_', ' '),
+                                              stats[name][0]))
+    return '\n'.join(lines)
+
+
+class BusTracer(object):
+    """Ring buffer of the transactions on an instrument connection.
+
+    Each entry holds the wall clock time a transfer started, its direction,
+    the payload size, the time the call took and the start of the payload.
+    Once full, the oldest entries are overwritten.
+
+    Args:
+        length (int, optional): Number of transactions kept.
+        text_length (int, optional): Number of payload bytes kept per entry.
+    """
+    WRITE = 0
+    READ = 1
+
+    def __init__(self, length=10000, text_length=64):
+        self.dtype = np.dtype([('time', np.float64), ('direction', np.uint8),
+                               ('nbytes', np.uint32), ('latency', np.float32),
+                               ('text', 'S%d' % text_length)])
+        self._buffer = np.zeros(length, dtype=self.dtype)
+        self._count = 0
+        # nesting depth of traced calls, e.g. readline calling read
+        self._depth = 0
+
+    def _log(self, direction, data, start, latency):
+        entry = self._buffer[self._count % len(self._buffer)]
+        entry['time'] = start
+        entry['direction'] = direction
+        entry['nbytes'] = len(data)
+        entry['latency'] = latency
+        entry['text'] = bytes(data[:self.dtype['text'].itemsize]).rstrip(b'\r\n')
+        self._count += 1
+
+    def _wrap(self, method, direction):
+        def traced(*args, **kwargs):
+            if self._depth:
+                return method(*args, **kwargs)
+            self._depth += 1
+            start = time.time()
+            t0 = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                self._depth -= 1
+            latency = time.perf_counter() - t0
+            if direction == self.WRITE:
+                data = args[0]
+            elif isinstance(result, list):
+                data = b''.join(result)
+            else:
+                data = result
+            self._log(direction, data, start, latency)
+            return result
+        return traced
+
+    def attach_visa(self, resource):
+        """Traces a pyvisa message based resource."""
+        resource.write_raw = self._wrap(resource.write_raw, self.WRITE)
+        if hasattr(resource, '_read_raw'):
+            resource._read_raw = self._wrap(resource._read_raw, self.READ)
+        else:
+            resource.read_raw = self._wrap(resource.read_raw, self.READ)
+        if hasattr(resource, 'read_bytes'):
+            resource.read_bytes = self._wrap(resource.read_bytes, self.READ)
+
+    def attach_serial(self, connection):
+        """Traces a :obj:`serial.Serial` connection, one entry per line read."""
+        connection.write = self._wrap(connection.write, self.WRITE)
+        for name in ('read', 'readline', 'readlines'):
+            setattr(connection, name,
+                    self._wrap(getattr(connection, name), self.READ))
+
+    def __len__(self):
+        return min(self._count, len(self._buffer))
+
+    def clear(self):
+        self._count = 0
+
+    def records(self):
+        """Returns the buffered transactions, oldest first.
+
+        Returns:
+            :obj:`numpy:numpy.ndarray`: Structured array of transactions.
+        """
+        if self._count <= len(self._buffer):
+            return self._buffer[:self._count].copy()
+        split = self._count % len(self._buffer)
+        return np.concatenate((self._buffer[split:], self._buffer[:split]))
+
+    def counts(self):
+        """Totals of the buffered transactions.
+
+        A round trip is a read that follows a write.
+
+        Returns:
+            tuple: bytes written, bytes read and round trips
+        """
+        records = self.records()
+        reads = records['direction'] == self.READ
+        trips = np.count_nonzero(reads[1:] & ~reads[:-1])
+        return (int(records['nbytes'][~reads].sum()),
+                int(records['nbytes'][reads].sum()), int(trips))
+
+    def dump(self, path):
+        """Writes the buffered transactions to a file.
+
+        Files ending in `.npy` are written as a numpy structured array,
+        anything else as JSON lines.
+
+        Args:
+            path (str): File to write.
+        """
+        records = self.records()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if path.endswith('.npy'):
+            np.save(path, records)
+            return
+        with open(path, 'w') as f:
+            for entry in records:
+                f.write(json.dumps({'time': float(entry['time']),
+                                    'direction': ('write', 'read')[entry['direction']],
+                                    'nbytes': int(entry['nbytes']),
+                                    'latency': float(entry['latency']),
+                                    'text': entry['text'].decode(errors='replace')})
+                        + '\n')
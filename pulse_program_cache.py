@@ -0,0 +1,234 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/pulse_program_cache.py                           #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Content addressed cache of the pulse programs held in PulseBlaster memory.
+
+:obj:`CachedPulseblasterWorker` keys each program it loads by a hash of its
+`PULSE_PROGRAM` table and remembers where it lies in board memory. Line one
+of the header branches to the start of the program for the shot, so a shot
+whose program is still in memory only rewrites the two header lines.
+
+The spinapi writes instructions in order from line zero, so a miss writes
+the new program straight after the header, followed by the most recently
+used programs that fit, in a single upload. Scans alternating between a few
+sequence shapes then only rewrite the header once each shape is loaded. The
+cache is only updated once the upload has been written. Programs are
+relocated by offsetting the line numbers of their `END_LOOP`, `JSR` and
+`BRANCH` instructions.
+"""
+import hashlib
+
+import numpy as np
+
+from labscript_devices.PulseBlaster_No_DDS import PulseblasterNoDDSWorker
+
+STOP = 1
+# spinapi instruction codes that take a line number as data
+END_LOOP = 3
+JSR = 4
+BRANCH = 6
+address_instructions = (END_LOOP, JSR, BRANCH)
+# lines 0 and 1 are the header written every shot
+header_length = 2
+
+
+def program_key(pulse_program):
+    """Returns the content hash of a pulse program table."""
+    data = np.ascontiguousarray(pulse_program)
+    return hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest()
+
+
+def final_flags(pulse_program):
+    """Returns the flags of the instruction that ends a program, a STOP or a
+    BRANCH back to the header. Subroutines may follow it."""
+    ends = (pulse_program['inst'] == STOP) | ((pulse_program['inst'] == BRANCH)
+                                              & (pulse_program['inst_data'] < header_length))
+    return pulse_program['flags'][np.flatnonzero(ends)[0]]
+
+
+def relocate(pulse_program, start):
+    """Returns a copy of a pulse program with its line numbers moved so that
+    it runs from line `start` instead of the line after the header.
+
+    Branches into the header, e.g. back to the WAIT on line 0, are kept.
+    """
+    program = pulse_program.copy()
+    jumps = np.isin(program['inst'], address_instructions)
+    jumps &= program['inst_data'] >= header_length
+    program['inst_data'][jumps] += start - header_length
+    return program
+
+
+class ProgramCache(object):
+    """Tracks the pulse programs held in PulseBlaster memory.
+
+    Args:
+        memory_size (int): Number of instruction lines of the board.
+        size (int): Maximum number of programs held.
+    """
+
+    def __init__(self, memory_size, size):
+        self.memory_size = memory_size
+        self.size = size
+        # (key, start line, program as compiled), most recently used first
+        self.layout = []
+
+    def clear(self):
+        self.layout = []
+
+    def lookup(self, key):
+        """Returns the start line of a program in memory, or None."""
+        for i, (cached_key, start, program) in enumerate(self.layout):
+            if cached_key == key:
+                self.layout.insert(0, self.layout.pop(i))
+                return start
+        return None
+
+    def plan(self, key, pulse_program):
+        """Lays out a new program and the most recently used programs that fit.
+
+        The new program goes straight after the header and the others follow
+        it back to back, up to `size` programs and `memory_size` lines.
+
+        Returns:
+            list: (key, start line, program as compiled) of each program to
+            write, in memory order.
+
+        Raises:
+            ValueError: If the new program does not fit in memory.
+        """
+        available = self.memory_size - header_length
+        if len(pulse_program) > available:
+            raise ValueError('Pulse program of %d instructions exceeds the %d '
+                             'lines of memory' % (len(pulse_program), available))
+        layout = [(key, header_length, pulse_program)]
+        start = header_length + len(pulse_program)
+        for cached_key, _, program in self.layout:
+            if len(layout) == self.size:
+                break
+            if cached_key == key or start + len(program) > self.memory_size:
+                continue
+            layout.append((cached_key, start, program))
+            start += len(program)
+        return layout
+
+    def commit(self, layout):
+        """Records a layout once it has been written to memory."""
+        self.layout = list(layout)
+
+
+class CachedPulseblasterWorker(PulseblasterNoDDSWorker):
+    """PulseBlaster worker that keeps recently used programs in memory."""
+    # instruction lines of the board memory
+    program_memory = 4096
+    program_cache_size = 3
+
+    def init(self):
+        PulseblasterNoDDSWorker.init(self)
+        self.program_cache = ProgramCache(self.program_memory,
+                                          self.program_cache_size)
+        # program that line 1 of the header branches to
+        self.smart_cache['armed'] = None
+
+    def transition_to_buffered(self, device_name, h5file, initial_values, fresh):
+        from spinapi import (pb_start_programming, pb_stop_programming,
+                             pb_inst_pbonly, pb_stop, PULSE_PROGRAM,
+                             CONTINUE, WAIT)
+        import labscript_utils.h5_lock, h5py
+        self.h5file = h5file
+        if self.programming_scheme == 'pb_stop_programming/STOP':
+            # Need to ensure device is stopped before programming - or we wont know what line it's on.
+            pb_stop()
+        with h5py.File(h5file, 'r') as hdf5_file:
+            group = hdf5_file['devices/%s' % device_name]
+
+            # Is this shot using the fixed-duration workaround instead of checking the PulseBlaster's status?
+            self.time_based_stop_workaround = group.attrs.get('time_based_stop_workaround', False)
+            if self.time_based_stop_workaround:
+                self.time_based_shot_duration = (group.attrs['stop_time']
+                                                 + hdf5_file['waits'][:]['timeout'].sum()
+                                                 + group.attrs['time_based_stop_workaround_extra_time'])
+
+            pulse_program = group['PULSE_PROGRAM'][2:]
+
+            # Are there waits in use in this experiment? The monitor waiting for the end
+            # of the experiment will need to know:
+            wait_monitor_exists = bool(hdf5_file['waits'].attrs['wait_monitor_acquisition_device'])
+            waits_in_use = bool(len(hdf5_file['waits']))
+        self.waits_pending = wait_monitor_exists and waits_in_use
+        if waits_in_use and not wait_monitor_exists:
+            # having waits but not a wait monitor means we can't tell when the shot
+            # is over unless the shot ends in a STOP instruction:
+            assert self.programming_scheme == 'pb_stop_programming/STOP'
+
+        # final state of the pulseblaster
+        flags = final_flags(pulse_program)
+
+        if fresh:
+            self.program_cache.clear()
+        key = program_key(pulse_program)
+        start = self.program_cache.lookup(key)
+        layout = None
+        if start is None:
+            layout = self.program_cache.plan(key, pulse_program)
+            start = header_length
+
+        if (layout is not None or self.smart_cache['armed'] != key
+                or self.smart_cache['initial_values'] != initial_values
+                or not self.smart_cache['ready_to_go']):
+            # memory and the header are only known to be good once written
+            self.smart_cache['ready_to_go'] = False
+            self.smart_cache['armed'] = None
+            if layout is not None:
+                self.program_cache.clear()
+            pb_start_programming(PULSE_PROGRAM)
+
+            # flags strings are in order flag 0 first, see the stock worker
+            initial_flags = ''.join('1' if initial_values['flag %d' % i] else '0'
+                                    for i in range(self.num_DO))
+
+            if self.programming_scheme == 'pb_start/BRANCH':
+                # Line zero is a wait on the final state of the program in 'pb_start/BRANCH' mode
+                pb_inst_pbonly(flags, WAIT, 0, 100)
+            else:
+                # Line zero otherwise just contains the initial flags
+                pb_inst_pbonly(initial_flags, CONTINUE, 0, 100)
+
+            # Line one holds the front panel values, then moves on to the program
+            if start == header_length:
+                pb_inst_pbonly(initial_flags, CONTINUE, 0, 100)
+            else:
+                pb_inst_pbonly(initial_flags, BRANCH, start, 100)
+            if layout is not None:
+                for _, program_start, program in layout:
+                    for args in relocate(program, program_start):
+                        pb_inst_pbonly(*args)
+
+            if self.programming_scheme == 'pb_start/BRANCH':
+                pb_stop_programming()
+            elif self.programming_scheme != 'pb_stop_programming/STOP':
+                raise ValueError('invalid programming_scheme %s' % str(self.programming_scheme))
+            # in 'pb_stop_programming/STOP' mode start_run calls pb_stop_programming()
+
+            if layout is not None:
+                self.program_cache.commit(layout)
+            self.smart_cache['ready_to_go'] = True
+            self.smart_cache['initial_values'] = initial_values
+            self.smart_cache['armed'] = key
+
+        elif self.programming_scheme == 'pb_stop_programming/STOP':
+            # be ready to be triggered by pb_stop_programming() even though nothing was written
+            pb_start_programming(PULSE_PROGRAM)
+
+        # Since we are converting from an integer to a binary string, we need to reverse the string!
+        return_flags = str(bin(flags)[2:]).rjust(self.num_DO, '0')[::-1]
+        return {'flag %d' % i: return_flags[i] for i in range(self.num_DO)}
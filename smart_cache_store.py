@@ -0,0 +1,145 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/smart_cache_store.py                             #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Persistent storage of BLACS worker smart caches.
+
+Smart caches normally live only in the worker process, so restarting BLACS
+or a device tab forces a full reprogram of every device on the next shot.
+:obj:`SmartCacheStore` saves smart cache entries to local disk, keyed by
+device name and instrument identity, so that they can be reused after a
+restart. Workers check the restored entries against the instrument with a
+single query before using them.
+
+The cache files are stored in `<app_saved_configs>/naqslab_devices/smart_cache`.
+Persistence can be disabled by adding the following to the labconfig:
+
+.. code-block:: ini
+
+    [naqslab_devices]
+    persistent_smart_cache = False
+"""
+import os
+import pickle
+import tempfile
+
+from labscript_utils.labconfig import LabConfig
+
+# increment when the format of saved caches changes
+_format_version = 1
+
+
+def _get_cache_dir():
+    """Returns the smart cache directory, or None if persistence is disabled."""
+    try:
+        exp_config = LabConfig()
+    except Exception:
+        # no labconfig available, cannot persist
+        return None
+    if not exp_config.getboolean('naqslab_devices', 'persistent_smart_cache',
+                                 fallback=True):
+        return None
+    return os.path.join(exp_config.get('DEFAULT', 'app_saved_configs'),
+                        'naqslab_devices', 'smart_cache')
+
+
+class SmartCacheStore(object):
+    """Saves and restores a worker's smart cache entries.
+
+    Args:
+        device_name (str): Name of the device in the connection table.
+        identity (str): String that uniquely identifies the physical instrument,
+            such as the `*IDN?` response. A saved cache is only restored
+            if the identity matches.
+        cache_dir (str, optional): Directory to store the cache in. Defaults
+            to the labconfig location.
+    """
+
+    # over-rides the labconfig location for all stores when set
+    default_cache_dir = None
+
+    def __init__(self, device_name, identity, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = self.default_cache_dir
+        if cache_dir is None:
+            cache_dir = _get_cache_dir()
+        self.identity = identity
+        self.path = None
+        if cache_dir is not None:
+            self.path = os.path.join(cache_dir, device_name + '.pickle')
+        # serialised form of the last save, used to skip redundant writes
+        self._last_saved = None
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def load(self):
+        """Returns the saved cache entries.
+
+        Returns:
+            dict: Saved smart cache entries. Empty if nothing valid is saved.
+        """
+        if not self.enabled:
+            return {}
+        try:
+            with open(self.path, 'rb') as f:
+                saved = pickle.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f'Ignoring unreadable smart cache {self.path}: {e}')
+            return {}
+
+        if (saved.get('version') != _format_version
+                or saved.get('identity') != self.identity):
+            return {}
+        return saved['data']
+
+    def save(self, entries):
+        """Saves smart cache entries to disk.
+
+        The file is replaced atomically, so a crash during the write
+        leaves the previous cache intact. Failures are reported but not
+        raised since the cache is only an optimisation.
+
+        Args:
+            entries (dict): Smart cache entries to save. Must be picklable.
+        """
+        if not self.enabled:
+            return
+        serialised = pickle.dumps({'version': _format_version,
+                                   'identity': self.identity,
+                                   'data': entries},
+                                  protocol=pickle.HIGHEST_PROTOCOL)
+        if serialised == self._last_saved:
+            return
+        try:
+            cache_dir = os.path.dirname(self.path)
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(serialised)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        except OSError as e:
+            print(f'Could not save smart cache {self.path}: {e}')
+            return
+        self._last_saved = serialised
+
+    def clear(self):
+        """Deletes the saved cache."""
+        self._last_saved = None
+        if self.enabled and os.path.exists(self.path):
+            os.remove(self.path)
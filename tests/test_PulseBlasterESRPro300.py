@@ -0,0 +1,139 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/tests/test_PulseBlasterESRPro300.py              #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Compiles shots with short pulses and pulse trains on a PulseBlasterESRPro300.
+
+Needs a labscript installation with a labconfig and a running zlock server.
+"""
+import numpy as np
+import pytest
+
+import labscript_utils.h5_lock, h5py
+import labscript
+from labscript import DigitalOut, start, stop
+
+from naqslab_devices.PulseBlasterESRPro300.labscript_device import PulseBlasterESRPro300
+from naqslab_devices.PulseBlasterESRPro300.compression import compress
+from naqslab_devices.PulseBlasterESRPro300.runviewer_parser import unroll
+
+
+@pytest.fixture
+def shot(tmp_path):
+    """Connection table of a board with outputs on flags 0, 1 and 2.
+
+    Yields the board, its outputs and the path of the shot file.
+    """
+    path = str(tmp_path/'shot.h5')
+    labscript.labscript_init(path, new=True, overwrite=True)
+    pb = PulseBlasterESRPro300(name='pb', board_number=0,
+                               programming_scheme='pb_start/BRANCH')
+    a = DigitalOut('a', pb.direct_outputs, 'flag 0')
+    b = DigitalOut('b', pb.direct_outputs, 'flag 1')
+    c = DigitalOut('c', pb.direct_outputs, 'flag 2')
+    try:
+        yield pb, a, b, c, path
+    finally:
+        labscript.labscript_cleanup()
+
+
+def read_pulse_program(path):
+    with h5py.File(path, 'r') as f:
+        return f['devices/pb/PULSE_PROGRAM'][:]
+
+
+def executed(pulse_program):
+    """Flags, start time in ns and length in ns of each executed instruction."""
+    rows = pulse_program[unroll(pulse_program)]
+    lengths = rows['length'].copy()
+    long_delays = rows['inst'] == PulseBlasterESRPro300.pb_instructions['LONG_DELAY']
+    lengths[long_delays] *= rows['inst_data'][long_delays]
+    return rows['flags'], np.cumsum(lengths) - lengths, lengths
+
+
+@pytest.mark.parametrize('t', [0.5e-6, 1.004e-6, 2.0101e-6, 3e-3])
+def test_short_pulse(shot, t):
+    pb, a, b, c, path = shot
+    start()
+    pb.short_pulse(a, t, 2)
+    b.go_high(t + 1e-6)
+    b.go_low(t + 2e-6)
+    stop(t + 5e-6)
+
+    flags, starts, lengths = executed(read_pulse_program(path))
+    pulse = np.flatnonzero(flags >> pb.short_pulse_bit == 2)
+    assert len(pulse) == 1
+    pulse = pulse[0]
+    assert flags[pulse] & ((1 << pb.short_pulse_bit) - 1) == 1
+    assert starts[pulse] == pytest.approx(round(t/4e-9)*4, abs=1e-6)
+    assert lengths[pulse] == pytest.approx(pb.short_pulse_hold()*1e9)
+    assert lengths[pulse] >= 1e9/pb.direct_outputs.parent_device.clock_limit
+
+
+def test_short_pulse_after_long_delay(shot):
+    pb, a, b, c, path = shot
+    start()
+    b.go_high(1e-6)
+    b.go_low(2e-6)
+    t = 2e-6 + 3*pb.long_delay
+    pb.short_pulse(a, t, 3)
+    stop(t + 1e-6)
+
+    flags, starts, lengths = executed(read_pulse_program(path))
+    pulse = np.flatnonzero(flags >> pb.short_pulse_bit == 3)
+    assert len(pulse) == 1
+    assert starts[pulse[0]] == pytest.approx(t*1e9)
+
+
+def test_short_pulse_other_flag_high(shot):
+    pb, a, b, c, path = shot
+    start()
+    b.go_high(0.5e-6)
+    pb.short_pulse(a, 1e-6, 2)
+    b.go_low(2e-6)
+    with pytest.raises(labscript.LabscriptError):
+        stop(3e-6)
+
+
+def pulse_train(a, b, c, t, periods):
+    """Alternating pulse pairs, with times accumulated as in an experiment."""
+    for i in range(periods):
+        a.go_high(t)
+        t += 200e-9
+        a.go_low(t)
+        t += 200e-9
+        pulsed, width = (b, 200e-9) if i % 2 else (c, 300e-9)
+        pulsed.go_high(t)
+        t += width
+        pulsed.go_low(t)
+        t += 200e-9
+    return t
+
+
+def test_pulse_train_compression(shot, monkeypatch):
+    pb, a, b, c, path = shot
+    monkeypatch.setattr(pb, 'compress_program', False)
+    start()
+    stop(pulse_train(a, b, c, 1.3e-6, 200) + 1e-6)
+    table = read_pulse_program(path)
+    compressed = compress(table, pb.core_clock_freq)
+    assert len(compressed) < 30
+
+    # the same flags at the same clock cycles, each instruction being
+    # rounded to whole cycles by the board
+    cycles = {}
+    for name, program in [('table', table), ('compressed', compressed)]:
+        flags, starts, lengths = executed(program)
+        lengths = np.round(lengths*pb.core_clock_freq/1e3)
+        changes = np.concatenate(([True], flags[1:] != flags[:-1]))
+        cycles[name] = (flags[changes], (np.cumsum(lengths) - lengths)[changes])
+    np.testing.assert_array_equal(cycles['table'][0], cycles['compressed'][0])
+    np.testing.assert_array_equal(cycles['table'][1], cycles['compressed'][1])
@@ -0,0 +1,131 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/tests/test_pulse_program_cache.py                #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Programs a PulseBlaster worker with a recording spinapi in place of the board.
+"""
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import h5py
+from labscript_devices.PulseBlaster_No_DDS import PulseblasterNoDDSWorker
+
+from naqslab_devices.pulse_program_cache import (CachedPulseblasterWorker,
+                                                 header_length)
+
+pb_dtype = [('flags', np.int32), ('inst', np.int32), ('inst_data', np.int32),
+            ('length', np.float64)]
+initial_values = {'flag %d' % i: 0 for i in range(24)}
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Instructions written to the board, one list per programming session."""
+    writes = []
+    spinapi = types.ModuleType('spinapi')
+    for name, code in dict(PULSE_PROGRAM=0, CONTINUE=0, STOP=1, LOOP=2,
+                           END_LOOP=3, JSR=4, RTS=5, BRANCH=6, WAIT=8).items():
+        setattr(spinapi, name, code)
+    spinapi.pb_start_programming = lambda device: writes.append([])
+    spinapi.pb_stop_programming = lambda: None
+    spinapi.pb_stop = lambda: None
+    spinapi.pb_inst_pbonly = lambda *args: writes[-1].append(args)
+    monkeypatch.setitem(sys.modules, 'spinapi', spinapi)
+    return writes
+
+
+@pytest.fixture
+def worker(monkeypatch, writes):
+    def init(self):
+        self.smart_cache = {'pulse_program': None, 'ready_to_go': False,
+                            'initial_values': None}
+    monkeypatch.setattr(PulseblasterNoDDSWorker, 'init', init)
+    worker = CachedPulseblasterWorker.__new__(CachedPulseblasterWorker)
+    worker.programming_scheme = 'pb_start/BRANCH'
+    worker.num_DO = 24
+    worker.init()
+    return worker
+
+
+def pulse_program(n, loop=False):
+    """A program of `n` flag states that branches back to the header."""
+    rows = [(0, 0, 0, 0.0)]*header_length + [(i, 0, 0, 50.0) for i in range(n)]
+    if loop:
+        rows[header_length] = (1, 2, 5, 50.0)
+        rows[header_length+1] = (2, 3, header_length, 50.0)
+    rows.append((7, 6, 0, 100.0))
+    return np.array(rows, dtype=pb_dtype)
+
+
+def program_shot(worker, path, program, fresh=False):
+    with h5py.File(path, 'w') as f:
+        group = f.create_group('devices/pb')
+        group.create_dataset('PULSE_PROGRAM', data=program)
+        group.attrs['stop_time'] = 1.0
+        waits = f.create_dataset('waits', data=np.zeros(0, dtype=[('timeout', float)]))
+        waits.attrs['wait_monitor_acquisition_device'] = ''
+    worker.transition_to_buffered('pb', path, initial_values, fresh)
+
+
+def test_alternating_programs(worker, writes, tmp_path):
+    path = str(tmp_path/'shot.h5')
+    a, b = pulse_program(40, loop=True), pulse_program(60)
+    program_shot(worker, path, a, fresh=True)
+    program_shot(worker, path, b)
+    # the second miss uploads B and then A again
+    assert len(writes[-1]) == header_length + len(b) + len(a) - 2*header_length
+    memory = writes[-1]
+
+    for program in [a, b, a, b, a]:
+        program_shot(worker, path, program)
+        assert len(writes[-1]) == header_length
+        # line 1 branches to the program, which is still in memory
+        line = writes[-1][1]
+        start = line[2] if line[1] == 6 else header_length
+        resident = memory[start:start+len(program)-header_length]
+        assert [row[0] for row in resident] == list(program['flags'][header_length:])
+        # with its loop moved along with it
+        if program is a:
+            assert resident[1][1:3] == (3, start)
+
+    # the same program again writes nothing
+    count = len(writes)
+    program_shot(worker, path, a)
+    assert len(writes) == count
+
+
+def test_programs_bounded_by_memory(worker, writes, tmp_path):
+    path = str(tmp_path/'shot.h5')
+    worker.program_cache.memory_size = 120
+    a, b = pulse_program(80), pulse_program(60)
+    program_shot(worker, path, a)
+    program_shot(worker, path, b)
+    # A no longer fits after B, so only B is uploaded
+    assert len(writes[-1]) == header_length + len(b) - header_length
+    program_shot(worker, path, a)
+    assert len(writes[-1]) == header_length + len(a) - header_length
+
+
+def test_failed_write(worker, writes, tmp_path, monkeypatch):
+    path = str(tmp_path/'shot.h5')
+    a, b = pulse_program(40), pulse_program(60)
+    program_shot(worker, path, a)
+
+    def fail(*args):
+        raise RuntimeError('write failed')
+    monkeypatch.setattr(sys.modules['spinapi'], 'pb_inst_pbonly', fail)
+    with pytest.raises(RuntimeError):
+        program_shot(worker, path, b)
+    assert worker.program_cache.layout == []
+    assert not worker.smart_cache['ready_to_go']
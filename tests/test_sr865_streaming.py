@@ -0,0 +1,89 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/tests/test_sr865_streaming.py                    #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Unpacks SR865 stream packets placed in the receive buffer by hand.
+"""
+import socket
+import struct
+import time
+
+import numpy as np
+import pytest
+
+from naqslab_devices.SR865.streaming import StreamReceiver
+
+packet_size = 128
+# samples of one value per packet
+per_packet = packet_size//4
+packet_rate = 1000.0
+
+
+@pytest.fixture
+def receiver():
+    receiver = StreamReceiver(0, packet_size, 2000, packet_rate,
+                              host='127.0.0.1')
+    yield receiver
+    receiver.close()
+
+
+def receive(receiver, sent, times):
+    """Stores packets `sent` of a ramp as received at `times`."""
+    slots = receiver._buffer.reshape(receiver.capacity, receiver.slot_size)
+    for i, (n, t) in enumerate(zip(sent, times)):
+        samples = np.arange(n*per_packet, (n + 1)*per_packet, dtype='>f4')
+        slots[i] = np.frombuffer(struct.pack('>I', n % 256) + samples.tobytes(),
+                                 dtype=np.uint8)
+        receiver._times[i] = t
+    receiver.received = len(sent)
+
+
+def check_ramp(values):
+    good = ~np.isnan(values[:, 0])
+    assert np.all(values[good, 0] == np.arange(len(values))[good])
+
+
+def test_long_dropout(receiver):
+    sent = list(range(100)) + list(range(400, 500))
+    receive(receiver, sent, np.array(sent)/packet_rate)
+    values, lost = receiver.unpack(1)
+    assert lost == 300
+    assert len(values) == 500*per_packet
+    check_ramp(values)
+
+
+def test_late_packets(receiver):
+    # the receiving thread stalls for 400 packets, then catches up
+    sent = np.arange(1000)
+    times = sent/packet_rate
+    times[300:700] = np.maximum(times[300:700], 0.7)
+    receive(receiver, sent, times)
+    values, lost = receiver.unpack(1)
+    assert lost == 0
+    check_ramp(values)
+
+
+def test_overflow():
+    receiver = StreamReceiver(0, packet_size, 10, host='127.0.0.1')
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.start()
+    for n in range(15):
+        sender.sendto(struct.pack('>I', n) + bytes(packet_size),
+                      ('127.0.0.1', receiver.port))
+        # the socket buffer of so small a receiver holds few packets
+        time.sleep(0.01)
+    receiver.close()
+    sender.close()
+    assert receiver.received == 10
+    assert receiver.overflowed == 5
+    # the start of the stream is kept
+    counter = receiver.packets()[:, 3]
+    assert list(counter) == list(range(10))
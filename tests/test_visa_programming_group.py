@@ -0,0 +1,151 @@
+#####################################################################
+#                                                                   #
+# /naqslab_devices/tests/test_visa_programming_group.py             #
+#                                                                   #
+# Copyright 2026, David Meyer                                       #
+#                                                                   #
+# This file is part of the naqslab devices extension to the         #
+# labscript_suite. It is licensed under the Simplified BSD License. #
+#                                                                   #
+#                                                                   #
+#####################################################################
+"""
+Programs emulated DC supplies through a programming group worker.
+"""
+import re
+import threading
+
+import numpy as np
+import pytest
+
+import labscript_utils.h5_lock, h5py
+from naqslab_devices.smart_cache_store import SmartCacheStore
+from naqslab_devices.VISA.blacs_worker import (VISAWorker,
+                                               VISAProgrammingGroupWorker,
+                                               VISAGroupMemberWorker)
+from naqslab_devices.VISA.bus_emulator import BusEmulator, GPIB
+
+members = {'ps1': 'GPIB0::5::INSTR', 'ps2': 'GPIB0::6::INSTR',
+           'ps3': 'GPIB1::5::INSTR'}
+worker_class = 'naqslab_devices.KeysightDCSupply.blacs_worker.KeysightDCSupplyWorker'
+
+
+def supply_replies(setpoints):
+    """Replies of an E3631A whose voltage setpoints are kept in `setpoints`."""
+    selected = [1]
+
+    def handle(command):
+        replies = []
+        for part in command.split(';:'):
+            match = re.match(r'INST:NSEL (\d)', part)
+            if match:
+                selected[0] = int(match[1])
+            match = re.match(r'VOLT ([-\d.]+)', part)
+            if match:
+                setpoints[selected[0]] = float(match[1])
+            if part == 'APPL?':
+                replies.append('"{:+.5E},{:+.5E}"'.format(setpoints[selected[0]], 0.1))
+        return ';'.join(replies) if replies else None
+
+    return {'*IDN?': lambda command: 'Agilent,E3631A,0,1',
+            re.compile('.*'): handle}
+
+
+@pytest.fixture
+def setpoints(monkeypatch, tmp_path):
+    monkeypatch.setattr(SmartCacheStore, 'default_cache_dir', str(tmp_path/'cache'))
+    emulator = BusEmulator(realtime=True)
+    setpoints = {}
+    for name, address in members.items():
+        setpoints[name] = {1: 0.0, 2: 0.0, 3: 0.0}
+        emulator.add_resource(address, GPIB, supply_replies(setpoints[name]))
+    # the group hosts the member workers in this process
+    monkeypatch.setattr(VISAWorker, 'bus_emulation', emulator)
+    return setpoints
+
+
+@pytest.fixture
+def group(setpoints):
+    group = VISAProgrammingGroupWorker.__new__(VISAProgrammingGroupWorker)
+    group.device_name = 'group'
+    group.members = list(members)
+    group.port = 0
+    group.init()
+    workers = {}
+    for name, address in members.items():
+        worker = VISAGroupMemberWorker.__new__(VISAGroupMemberWorker)
+        worker.device_name = name
+        worker.group_port = group.listener.address[1]
+        worker.worker_class = worker_class
+        worker.worker_kwargs = {'address': address, 'limited': 'volt',
+                                'allowed_outputs': [1, 2, 3], 'range': None}
+        worker.init()
+        workers[name] = worker
+    yield group, workers
+    for worker in workers.values():
+        worker.shutdown()
+    group.shutdown()
+
+
+def write_shot(path, voltages):
+    dtype = [('channel %d' % i, np.float32) for i in (1, 2, 3)]
+    with h5py.File(path, 'w') as f:
+        for name, volts in voltages.items():
+            f.create_dataset('devices/{:s}/STATIC_DATA'.format(name),
+                             data=np.array([tuple(volts)], dtype=dtype))
+
+
+def test_group_shot(group, setpoints, tmp_path, monkeypatch):
+    group, workers = group
+    assert len(group.buses) == 2
+    path = str(tmp_path/'shot.h5')
+    voltages = {'ps1': (1, 2, 3), 'ps2': (4, 5, 6), 'ps3': (7, 8, 9)}
+    write_shot(path, voltages)
+
+    opens = []
+    File = h5py.File
+    def counting_file(*args, **kwargs):
+        opens.append(args[0])
+        return File(*args, **kwargs)
+    monkeypatch.setattr(h5py, 'File', counting_file)
+
+    # BLACS transitions every tab at once
+    initial = {'channel %d' % i: 0.0 for i in (1, 2, 3)}
+    final = {}
+    def transition(name, worker):
+        final[name] = worker.transition_to_buffered(name, path, initial, False)
+    threads = [threading.Thread(target=transition, args=item)
+               for item in workers.items()]
+    for thread in threads:
+        thread.start()
+    group.transition_to_buffered('group', path, {}, False)
+    for thread in threads:
+        thread.join()
+
+    assert opens == [path]
+    for name, volts in voltages.items():
+        assert setpoints[name] == dict(zip((1, 2, 3), volts))
+        assert final[name]['channel 2'] == pytest.approx(volts[1])
+
+    for worker in workers.values():
+        worker.transition_to_manual()
+    group.transition_to_manual()
+    read_time, latency = group.check_latency()
+    assert sorted(latency) == sorted(members)
+    assert group.check_latency() is None
+
+    # other calls are forwarded to the hosted worker
+    setpoints['ps3'][1] = 2.5
+    assert workers['ps3'].check_remote_values()['channel 1'] == 2.5
+
+
+def test_unknown_member(group):
+    group, workers = group
+    worker = VISAGroupMemberWorker.__new__(VISAGroupMemberWorker)
+    worker.device_name = 'ps4'
+    worker.group_port = group.listener.address[1]
+    worker.worker_class = worker_class
+    worker.worker_kwargs = {'address': 'GPIB0::7::INSTR'}
+    with pytest.raises(Exception, match='not a member'):
+        worker.init()
+    worker.connection.close()